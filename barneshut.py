@@ -0,0 +1,173 @@
+import numpy as np
+from nbody import DirectSum
+
+'''
+Description:
+	Barnes-Hut octree force solver, for clusters of thousands of bodies.
+	A far away group of bodies pulls like a single body at its centre of mass,
+	"far away" meaning that the size of its cell seen from the body is smaller than the opening angle theta.
+	The cost goes from O(N²) to O(N log N), and theta = 0 gives back the direct summation.
+
+	The tree is rebuilt at every force evaluation: bodies are sorted along a Morton (Z-order) curve,
+	so that every cell of the octree is a contiguous slice of the sorted arrays.
+'''
+
+MORTON_BITS = 21 # bits per axis, 3 * 21 = 63 bits fit in an uint64
+
+
+def _spread_bits(values:np.ndarray) -> np.ndarray:
+	'''
+	- Insert two zeros between every bit of "values" (21 bits integers)
+	'''
+	values = values.astype(np.uint64)
+	values = (values | (values << np.uint64(32))) & np.uint64(0x1f00000000ffff)
+	values = (values | (values << np.uint64(16))) & np.uint64(0x1f0000ff0000ff)
+	values = (values | (values << np.uint64(8))) & np.uint64(0x100f00f00f00f00f)
+	values = (values | (values << np.uint64(4))) & np.uint64(0x10c30c30c30c30c3)
+	values = (values | (values << np.uint64(2))) & np.uint64(0x1249249249249249)
+	return values
+
+
+def morton_codes(positions:np.ndarray, lower:np.ndarray, size:float) -> np.ndarray:
+	'''
+	˗ˋˏ ♡ ˎˊ˗
+	- Morton code of every position inside the cube [lower, lower + size]
+	- Sorting the codes puts the bodies of every octree cell next to each other
+	'''
+	cells = (1 << MORTON_BITS) - 1
+	grid = np.clip(((positions - lower) / size * cells).astype(np.int64), 0, cells)
+	return _spread_bits(grid[:, 0]) | (_spread_bits(grid[:, 1]) << np.uint64(1)) | (_spread_bits(grid[:, 2]) << np.uint64(2))
+
+
+class Octree:
+	def __init__(self, positions:np.ndarray, masses:np.ndarray, leaf_size:int=8) -> None:
+		'''
+		˗ˋˏ ♡ ˎˊ˗
+		- Builds the octree of a set of bodies
+
+		:param positions: the positions of the bodies (N, 3)
+		:param masses: the masses of the bodies (N,)
+		:param leaf_size: a cell with this many bodies or less is not split any further
+		'''
+		self.leaf_size = leaf_size
+		lower = positions.min(axis=0)
+		self.size = float((positions.max(axis=0) - lower).max()) or 1.0
+		self.size *= 1 + 1e-9 # so that the highest body stays inside the cube
+
+		codes = morton_codes(positions, lower, self.size)
+		self.order = np.argsort(codes, kind="stable")
+		self.codes = codes[self.order]
+		self.positions = positions[self.order]
+		self.masses = masses[self.order]
+
+		# Cumulative sums give the mass and centre of mass of any slice in O(1)
+		self._mass_sum = np.concatenate(([0.0], np.cumsum(self.masses)))
+		self._moment_sum = np.vstack((np.zeros((1, 3)), np.cumsum(self.positions * self.masses[:, np.newaxis], axis=0)))
+
+		# Nodes, stored as lists then as arrays: slice [start, end), depth, children
+		self.start, self.end, self.level, self.children = [], [], [], []
+		self._build(0, len(masses), 0)
+		self.start = np.array(self.start)
+		self.end = np.array(self.end)
+		self.level = np.array(self.level)
+		self.mass = self._mass_sum[self.end] - self._mass_sum[self.start]
+		with np.errstate(invalid="ignore", divide="ignore"):
+			self.center_of_mass = (self._moment_sum[self.end] - self._moment_sum[self.start]) / self.mass[:, np.newaxis]
+		self.cell_size = self.size / 2.0 ** self.level
+
+	def _build(self, start:int, end:int, level:int) -> int:
+		node = len(self.start)
+		self.start.append(start)
+		self.end.append(end)
+		self.level.append(level)
+		self.children.append(())
+		if end - start <= self.leaf_size or level == MORTON_BITS:
+			return node
+
+		shift = np.uint64(3 * (MORTON_BITS - 1 - level))
+		octants = (self.codes[start:end] >> shift) & np.uint64(7)
+		bounds = start + np.searchsorted(octants, np.arange(9, dtype=np.uint64))
+		self.children[node] = tuple(
+			self._build(int(bounds[octant]), int(bounds[octant + 1]), level + 1)
+			for octant in range(8) if bounds[octant + 1] > bounds[octant]
+		)
+		return node
+
+	def __len__(self) -> int:
+		return len(self.start)
+
+
+class BarnesHut:
+	def __init__(self, theta:float=0.5, leaf_size:int=8) -> None:
+		'''
+		˗ˋˏ ♡ ˎˊ˗
+		- Same interface as nbody.DirectSum, to give to System(solver=...)
+
+		:param theta: opening angle, smaller is more accurate and slower (0 = direct summation)
+		:param leaf_size: maximum number of bodies in a leaf cell, summed directly
+		'''
+		self.theta = theta
+		self.leaf_size = leaf_size
+		self.tree = None
+
+	def accelerations(self, positions:np.ndarray, masses:np.ndarray, G:float, softening:float=0.0) -> np.ndarray:
+		'''
+		˗ˋˏ ♡ ˎˊ˗
+		- Rebuilds the tree at the given positions and walks it for every body at once
+		'''
+		self.tree = tree = Octree(positions, masses, self.leaf_size)
+		self._G = G
+		self._softening2 = softening * softening
+		self._accelerations = np.zeros_like(tree.positions)
+		self._walk(0, np.arange(len(masses)))
+		result = np.empty_like(positions)
+		result[tree.order] = self._accelerations
+		return result
+
+	def _walk(self, node:int, targets:np.ndarray) -> None:
+		'''
+		- Every target body either takes the cell as a whole, or goes down into its children
+		'''
+		tree = self.tree
+		target_positions = tree.positions[targets]
+		separation = tree.center_of_mass[node] - target_positions
+		distance2 = (separation * separation).sum(axis=-1)
+		far = tree.cell_size[node] ** 2 < self.theta ** 2 * distance2
+
+		if far.any():
+			distance2_far = distance2[far] + self._softening2
+			weight = self._G * tree.mass[node] / (distance2_far * np.sqrt(distance2_far))
+			self._accelerations[targets[far]] += separation[far] * weight[:, np.newaxis]
+
+		near = targets[~far]
+		if not len(near):
+			return
+		if not tree.children[node]:
+			# Leaf : direct summation between the near targets and the bodies of the cell
+			start, end = tree.start[node], tree.end[node]
+			separation = tree.positions[np.newaxis, start:end] - tree.positions[near, np.newaxis]
+			distance2 = (separation * separation).sum(axis=-1)
+			if self._softening2:
+				distance2 += self._softening2
+			distance2[distance2 == 0] = np.inf # Avoid division by zero (self-interaction included)
+			weight = self._G * tree.masses[start:end] / (distance2 * np.sqrt(distance2))
+			self._accelerations[near] += np.matmul(weight[:, np.newaxis, :], separation)[:, 0, :]
+			return
+		for child in tree.children[node]:
+			self._walk(child, near)
+
+	def __str__(self) -> str:
+		return f"BarnesHut(theta = {self.theta}, leaf_size = {self.leaf_size})"
+
+
+def force_error(solver, positions:np.ndarray, masses:np.ndarray, G:float=1.0, softening:float=0.0) -> tuple:
+	'''
+	˗ˋˏ ♡ ˎˊ˗
+	- Compares the accelerations of a solver against the direct summation
+
+	:return: (median, maximum) relative error over the bodies
+	'''
+	exact = DirectSum().accelerations(positions, masses, G, softening)
+	approximation = solver.accelerations(positions, masses, G, softening)
+	error = np.linalg.norm(approximation - exact, axis=-1) / np.linalg.norm(exact, axis=-1)
+	return float(np.median(error)), float(error.max())
@@ -0,0 +1,196 @@
+import argparse
+import json
+import math
+import platform
+import subprocess
+import time
+import numpy as np
+import raycasting as rc
+from nbody import Body, System, Vector, DirectSum, kinetic_energy, potential_energy
+from barneshut import BarnesHut
+from integrators import INTEGRATORS
+import kernels
+
+'''
+Description:
+	Reproducible benchmarks, to compare the speed of the engine between two commits.
+
+	forces      : force evaluations per second for direct summation and Barnes-Hut, at several N
+	integrators : wall time and force evaluations per simulated orbit, at the largest dt keeping a fixed energy error
+	              (within a maximum number of steps per orbit, the Euler scheme would need millions)
+	backends    : forces and integrators again with the numba kernels (kernels.py), when numba is installed
+	projection  : points per second through raycast_transform (one by one) and project (batched)
+
+	python benchmarks.py --output before.json
+	python benchmarks.py --output after.json --compare before.json
+
+	Random inputs use fixed seeds, every timing is the best of several repeats.
+'''
+
+
+def rate(function, min_time:float=0.2, repeats:int=3) -> float:
+	'''
+	˗ˋˏ ♡ ˎˊ˗
+	- Calls per second of "function": it is called in a loop for at least "min_time" seconds,
+		"repeats" times, and the best loop counts
+	'''
+	function() # warm-up (caches, lazy imports...)
+	best = 0.0
+	for _ in range(repeats):
+		calls = 0
+		start = time.perf_counter()
+		while True:
+			function()
+			calls += 1
+			elapsed = time.perf_counter() - start
+			if elapsed >= min_time:
+				break
+		best = max(best, calls / elapsed)
+	return best
+
+
+def random_cluster(n:int, seed:int=0) -> tuple:
+	rng = np.random.default_rng(seed)
+	return rng.normal(size=(n, 3)), rng.uniform(0.5, 1.5, size=n)
+
+
+def bench_forces(sizes:tuple, tree_sizes:tuple, min_time:float) -> list:
+	results = []
+	for n in sizes:
+		positions, masses = random_cluster(n)
+		solver = DirectSum()
+		results.append({"solver": "direct", "bodies": n,
+						"evaluations_per_second": rate(lambda: solver.accelerations(positions, masses, 1.0, 0.01), min_time)})
+		if kernels.has_numba():
+			compiled = kernels.NumbaDirectSum()
+			results.append({"solver": "direct-numba", "bodies": n,
+							"evaluations_per_second": rate(lambda: compiled.accelerations(positions, masses, 1.0, 0.01), min_time)})
+	for n in tree_sizes:
+		positions, masses = random_cluster(n)
+		solver = BarnesHut(theta=0.5)
+		results.append({"solver": "barnes-hut", "theta": 0.5, "bodies": n,
+						"evaluations_per_second": rate(lambda: solver.accelerations(positions, masses, 1.0, 0.01), min_time, repeats=1)})
+	return results
+
+
+def kepler_orbit(integrator:str, dt:float, backend:str="numpy") -> System:
+	'''
+	- Two bodies on an eccentric orbit (e = 0.5, semi-major axis 1, G = 1, total mass 1): period 2π
+	'''
+	eccentricity = 0.5
+	speed = math.sqrt((1 + eccentricity) / (1 - eccentricity)) # at periapsis
+	heavy = Body(0.999, 0, (0, 0, 0))
+	light = Body(0.001, 0, (1 - eccentricity, 0, 0), Vector((0, speed, 0)))
+	return System([heavy, light], G=1.0, integrator=integrator, dt=dt, solver=kernels.get_solver(backend))
+
+
+def orbit_energy_error(integrator:str, dt:float, samples:int=64) -> float:
+	'''
+	- Largest relative energy error over one orbit, looked at "samples" times along the orbit
+	'''
+	system = kepler_orbit(integrator, dt)
+	energy = lambda: kinetic_energy(system.velocities, system.masses) + potential_energy(system.positions, system.masses, system.G)
+	start = energy()
+	worst = 0.0
+	steps = int(math.ceil(2 * math.pi / dt))
+	for sample in range(samples):
+		system.step(steps * (sample + 1) // samples - steps * sample // samples)
+		worst = max(worst, float(abs(energy() / start - 1)))
+	return worst
+
+
+def bench_integrators(target_error:float, min_time:float, max_steps:int) -> list:
+	results = []
+	for name in ("euler", "leapfrog", "yoshida4", "rk4"):
+		# Biggest dt (halving from a tenth of the period) whose energy error stays below the target,
+		# without going over max_steps per orbit (a first order scheme can need millions)
+		dt = 2 * math.pi / 10
+		error = orbit_energy_error(name, dt)
+		while error > target_error and 2 * math.pi / (dt / 2) <= max_steps:
+			dt /= 2
+			error = orbit_energy_error(name, dt)
+		steps = int(math.ceil(2 * math.pi / dt))
+		for backend in ("numpy", "numba") if kernels.has_numba() else ("numpy",):
+			orbits_per_second = rate(lambda: kepler_orbit(name, dt, backend).step(steps), min_time, repeats=1)
+			results.append({"integrator": name, "backend": backend, "target_energy_error": target_error, "energy_error": error,
+							"target_reached": bool(error <= target_error), "dt": dt, "steps_per_orbit": steps,
+							"force_evaluations_per_orbit": steps * INTEGRATORS[name].force_evaluations,
+							"seconds_per_orbit": 1 / orbits_per_second})
+	return results
+
+
+def bench_projection(points:int, min_time:float) -> list:
+	rng = np.random.default_rng(0)
+	cloud = rng.normal(scale=100, size=(points, 3))
+	as_tuples = [tuple(point) for point in cloud.tolist()]
+	camera = rc.Camera((17.7, -87, 76), (0.3, 2.3))
+
+	def one_by_one():
+		for point in as_tuples:
+			rc.raycast_transform(camera, point)
+
+	return [
+		{"method": "raycast_transform", "points": points, "points_per_second": points * rate(one_by_one, min_time, repeats=1)},
+		{"method": "project", "points": points, "points_per_second": points * rate(lambda: rc.project(camera, cloud), min_time)},
+	]
+
+
+def environment() -> dict:
+	try:
+		commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+	except (OSError, subprocess.CalledProcessError):
+		commit = None
+	return {"commit": commit, "python": platform.python_version(), "numpy": np.__version__,
+			"machine": platform.machine(), "processor": platform.processor(), "date": time.strftime("%Y-%m-%d %H:%M:%S")}
+
+
+def compare(current:dict, previous:dict) -> None:
+	'''
+	˗ˋˏ ♡ ˎˊ˗
+	- Print the ratio new / old of every matching measure (> 1 is faster for rates, slower for seconds)
+	'''
+	for section, key_fields, measure in (("forces", ("solver", "bodies"), "evaluations_per_second"),
+										 ("integrators", ("integrator", "backend"), "seconds_per_orbit"),
+										 ("projection", ("method", "points"), "points_per_second")):
+		old = {tuple(row.get(field, "numpy") for field in key_fields): row[measure] for row in previous.get(section, [])}
+		for row in current[section]:
+			key = tuple(row.get(field, "numpy") for field in key_fields)
+			if key in old:
+				print(f"{section:12} {' '.join(map(str, key)):28} {measure:24} x{row[measure] / old[key]:.2f}")
+
+
+def main(argv=None) -> dict:
+	parser = argparse.ArgumentParser(description="Benchmark the force kernels, the integrators and the projection.")
+	parser.add_argument("--output", default="benchmarks.json", help="where to write the results (JSON)")
+	parser.add_argument("--compare", default=None, help="a previous results file to compare with")
+	parser.add_argument("--quick", action="store_true", help="smaller sizes and shorter timings, for a smoke test")
+	parser.add_argument("--energy-error", type=float, default=1e-6, help="energy error per orbit targeted by the integrators")
+	args = parser.parse_args(argv)
+
+	min_time = 0.05 if args.quick else 0.3
+	sizes = (2, 3, 10, 100) if args.quick else (2, 3, 10, 100, 1000)
+	tree_sizes = (1000,) if args.quick else (1000, 4000)
+
+	results = environment()
+	results["forces"] = bench_forces(sizes, tree_sizes, min_time)
+	results["integrators"] = bench_integrators(args.energy_error, min_time, 2**12 if args.quick else 2**16)
+	results["projection"] = bench_projection(1000 if args.quick else 10_000, min_time)
+
+	with open(args.output, "w") as file:
+		json.dump(results, file, indent=2)
+	for row in results["forces"]:
+		print(f"forces       {row['solver']:10} N = {row['bodies']:<6} {row['evaluations_per_second']:12.0f} evaluations/s")
+	for row in results["integrators"]:
+		print(f"integrators  {row['integrator'] + ' ' + row['backend']:16} dt = {row['dt']:<10.3g} {row['steps_per_orbit']:8} steps/orbit {row['seconds_per_orbit'] * 1000:10.2f} ms/orbit"
+			  f"   energy error {row['energy_error']:.1e}" + ("" if row["target_reached"] else " (target not reached)"))
+	for row in results["projection"]:
+		print(f"projection   {row['method']:18} {row['points_per_second']:14.0f} points/s")
+
+	if args.compare:
+		with open(args.compare) as file:
+			compare(results, json.load(file))
+	return results
+
+
+if __name__ == "__main__":
+	main()
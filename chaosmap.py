@@ -0,0 +1,251 @@
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+import scenarios
+from ensemble import Ensemble
+from integrators import INTEGRATORS
+
+'''
+Description:
+	Stability maps: a grid of initial conditions (two coordinates of the bodies varied over a range),
+	every point coloured by its largest Lyapunov exponent and by its time to escape.
+
+	The whole grid is one ensemble (see ensemble.py), integrated together with one tangent vector per member.
+	The tangent (δx, δv) follows the variational equations, δx' = δv and δv' = J(x) δx, with J the Jacobian
+	of the accelerations: it rides along the bodies as extra "positions" and "velocities", so any integrator
+	moves it with the linearised version of the very map that moves the state.
+	Every "renormalize" steps its length is added to the sum of log-growths and set back to 1:
+	the Lyapunov exponent is that sum over the time (the tangent mixes positions and velocities, N-body unities
+	such as the ones of figure-eight and pythagorean keep them comparable).
+
+	Chunks of the grid go to a pool of processes. The finished chunks are saved as they come in output + ".part",
+	so a map stopped for any reason starts again where it was with the same command.
+
+	python chaosmap.py --scenario figure-eight --x 2:vx -0.99 -0.87 --y 2:vy -0.93 -0.80 --resolution 200 200
+	                   --dt 1e-3 --duration 20 --output eight.npz --image eight.png
+'''
+
+COORDINATES = {"x": (0, 0), "y": (0, 1), "z": (0, 2), "vx": (1, 0), "vy": (1, 1), "vz": (1, 2)}
+
+
+def variational_accelerations(positions:np.ndarray, tangent:np.ndarray, masses:np.ndarray, G:float, softening:float=0.0) -> tuple:
+	'''
+	˗ˋˏ ♡ ˎˊ˗
+	- The accelerations, and their derivative along the tangent positions: J(x) δx, without building J
+	- δa_i = G Σ mj (δx_j - δx_i - 3 r_ij (r_ij · (δx_j - δx_i)) / r_ij²) / r_ij³
+	- Works on batches like nbody.pairwise_accelerations: positions and tangent (..., N, 3)
+
+	:return: (accelerations, tangent accelerations), both shaped like positions
+	'''
+	# separation[..., i, j] = r_j - r_i
+	separation = positions[..., np.newaxis, :, :] - positions[..., :, np.newaxis, :]
+	offsets = tangent[..., np.newaxis, :, :] - tangent[..., :, np.newaxis, :]
+	distance2 = (separation * separation).sum(axis=-1) + softening * softening
+	with np.errstate(divide="ignore"):
+		inverse2 = np.where(distance2 > 0, 1 / distance2, 0.0)
+	inverse3 = masses[..., np.newaxis, :] * inverse2 * np.sqrt(inverse2)
+	projection = (separation * offsets).sum(axis=-1) * inverse2
+	accelerations = G * (inverse3[..., np.newaxis] * separation).sum(axis=-2)
+	tangent_accelerations = G * (inverse3[..., np.newaxis] * (offsets - 3 * projection[..., np.newaxis] * separation)).sum(axis=-2)
+	return accelerations, tangent_accelerations
+
+
+def parse_axis(text:str) -> tuple:
+	'''
+	- "BODY:COORDINATE" (like "2:vx") as (body, 0 for positions / 1 for velocities, component)
+	'''
+	body, _, coordinate = text.partition(":")
+	if not body.isdigit() or coordinate not in COORDINATES:
+		raise ValueError(f"Bad axis {text!r}, use BODY:COORDINATE with a coordinate among {', '.join(COORDINATES)}")
+	return (int(body),) + COORDINATES[coordinate]
+
+
+def grid(system, x_axis:tuple, y_axis:tuple, x_values:np.ndarray, y_values:np.ndarray) -> tuple:
+	'''
+	˗ˋˏ ♡ ˎˊ˗
+	- The initial states of a grid: copies of the system, two of their coordinates replaced by the grid values
+	- Row-major: member k is the point (k // len(x_values), k % len(x_values))
+
+	:param x_axis: (body, positions 0 / velocities 1, component), see parse_axis
+	:return: (positions (E, N, 3), velocities (E, N, 3))
+	'''
+	members = len(x_values) * len(y_values)
+	state = np.stack((system.positions, system.velocities)) # (2, N, 3)
+	states = np.repeat(state[np.newaxis], members, axis=0)
+	y_grid, x_grid = np.meshgrid(y_values, x_values, indexing="ij")
+	for (body, kind, component), values in ((x_axis, x_grid), (y_axis, y_grid)):
+		states[:, kind, body, component] = values.ravel()
+	return states[:, 0], states[:, 1]
+
+
+def lyapunov(ensemble:Ensemble, duration:float, renormalize:int=10, escape_radius:float=None, check_every:int=10,
+			 seed:int=0) -> dict:
+	'''
+	˗ˋˏ ♡ ˎˊ˗
+	- Largest Lyapunov exponent and time to escape of every member of an ensemble
+
+	:param renormalize: steps between two renormalisations of the tangent vectors
+	:param escape_radius: see Ensemble.run, None for no escape check
+	:param seed: of the initial tangent vector (the same for every member, and for every chunk)
+	:return: {"lyapunov": (E,), "escape_time": (E,) NaN for the members that stayed}
+	'''
+	members, n = ensemble.positions.shape[:2]
+	direction = np.random.default_rng(seed).normal(size=(2, n, 3))
+	direction /= np.sqrt((direction * direction).sum())
+	# the tangent rides along as N more bodies
+	positions = np.concatenate((ensemble.positions, np.broadcast_to(direction[0], (members, n, 3))), axis=1)
+	velocities = np.concatenate((ensemble.velocities, np.broadcast_to(direction[1], (members, n, 3))), axis=1)
+	masses = ensemble.masses
+	integrator = ensemble.integrator
+	integrator.reset()
+
+	def accelerations(state:np.ndarray) -> np.ndarray:
+		return np.concatenate(variational_accelerations(state[:, :n], state[:, n:], masses, ensemble.G, ensemble.softening), axis=1)
+
+	growth = np.zeros(members)
+	escape_time = np.full(members, np.nan)
+	steps = int(np.ceil(duration / ensemble.dt - 1e-9))
+	for step in range(1, steps + 1):
+		integrator.step(positions, velocities, ensemble.dt, accelerations)
+		if step % renormalize == 0 or step == steps:
+			length = np.sqrt((positions[:, n:] ** 2).sum(axis=(1, 2)) + (velocities[:, n:] ** 2).sum(axis=(1, 2)))
+			growth += np.log(length)
+			positions[:, n:] /= length[:, np.newaxis, np.newaxis]
+			velocities[:, n:] /= length[:, np.newaxis, np.newaxis]
+			integrator.reset() # its cached tangent accelerations are not the ones of the new lengths
+		if escape_radius is not None and step % check_every == 0:
+			escaped = ensemble._escapes(positions[:, :n], velocities[:, :n], masses, escape_radius)[0]
+			escape_time[escaped & np.isnan(escape_time)] = ensemble.time + step * ensemble.dt
+	ensemble.time += steps * ensemble.dt
+	return {"lyapunov": growth / (steps * ensemble.dt), "escape_time": escape_time}
+
+
+def _map_chunk(job:tuple) -> tuple:
+	index, ensemble, options = job
+	return index, lyapunov(ensemble, **options)
+
+
+def chaos_map(ensemble:Ensemble, duration:float, renormalize:int=10, escape_radius:float=None, check_every:int=10,
+			  workers:int=None, chunk_size:int=256, progress:str=None, signature:dict=None) -> dict:
+	'''
+	˗ˋˏ ♡ ˎˊ˗
+	- lyapunov over a pool of processes, chunk by chunk, the finished chunks saved as they come
+
+	:param progress: a file keeping the finished chunks (written atomically), None to keep nothing
+	:param signature: the options of the map, a progress file made with other ones is not reused
+	:return: {"lyapunov": (E,), "escape_time": (E,)}
+	'''
+	chunks = ensemble.chunks(chunk_size)
+	results = {"lyapunov": np.full(len(ensemble), np.nan), "escape_time": np.full(len(ensemble), np.nan)}
+	done = np.zeros(len(chunks), dtype=bool)
+	signature = json.dumps(signature or {}, sort_keys=True)
+	if progress and os.path.exists(progress):
+		with np.load(progress) as saved:
+			if str(saved["signature"]) == signature and len(saved["done"]) == len(chunks):
+				done = saved["done"].copy()
+				results = {key: saved[key].copy() for key in results}
+
+	def finished(index:int, result:dict) -> None:
+		start = index * chunk_size
+		for key in results:
+			results[key][start:start + len(result[key])] = result[key]
+		done[index] = True
+		if progress:
+			with open(progress + ".tmp", "wb") as file:
+				np.savez(file, done=done, signature=signature, **results)
+			os.replace(progress + ".tmp", progress)
+
+	options = {"duration": duration, "renormalize": renormalize, "escape_radius": escape_radius, "check_every": check_every}
+	jobs = [(index, chunk, options) for index, chunk in enumerate(chunks) if not done[index]]
+	if workers == 1:
+		for job in jobs:
+			finished(*_map_chunk(job))
+	else:
+		with ProcessPoolExecutor(max_workers=workers) as pool:
+			for future in as_completed([pool.submit(_map_chunk, job) for job in jobs]):
+				finished(*future.result())
+	return results
+
+
+def colorize(values:np.ndarray) -> np.ndarray:
+	'''
+	- A (H, W) map as (H, W, 3) RGB bytes, dark blue (lowest) to yellow (highest), grey for NaN
+	'''
+	anchors = np.array([(48, 18, 59), (40, 110, 200), (30, 180, 140), (170, 220, 50), (250, 230, 40)], dtype=float)
+	finite = np.isfinite(values)
+	low, high = (np.nanmin(values), np.nanmax(values)) if finite.any() else (0.0, 1.0)
+	scaled = np.where(finite, (values - low) / ((high - low) or 1.0), 0.0) * (len(anchors) - 1)
+	below = np.minimum(scaled.astype(int), len(anchors) - 2)
+	alpha = (scaled - below)[..., np.newaxis]
+	rgb = anchors[below] + alpha * (anchors[below + 1] - anchors[below])
+	rgb[~finite] = (128, 128, 128)
+	return rgb.round().astype(np.uint8)
+
+
+def save_image(path:str, values:np.ndarray) -> None:
+	'''
+	- Write a map as an image, the first row of the grid at the bottom (pygame, no window needed)
+	'''
+	import pygame
+	rgb = colorize(values[::-1])
+	pygame.image.save(pygame.surfarray.make_surface(rgb.transpose(1, 0, 2)), path)
+
+
+def main(argv=None) -> dict:
+	parser = argparse.ArgumentParser(description="Map the largest Lyapunov exponent and the escape time over a grid of initial conditions.")
+	parser.add_argument("--scenario", default="figure-eight", help=f"one of {', '.join(scenarios.SCENARIOS)}, or a .json file")
+	parser.add_argument("--x", nargs=3, required=True, metavar=("BODY:COORDINATE", "LOW", "HIGH"), help="first varied coordinate, like 2:vx -1 -0.8")
+	parser.add_argument("--y", nargs=3, required=True, metavar=("BODY:COORDINATE", "LOW", "HIGH"), help="second varied coordinate")
+	parser.add_argument("--resolution", type=int, nargs=2, default=(100, 100), metavar=("NX", "NY"))
+	parser.add_argument("--integrator", default="leapfrog", choices=sorted(INTEGRATORS))
+	parser.add_argument("--dt", type=float, required=True, help="timestep in scenario unities")
+	parser.add_argument("--duration", type=float, required=True, help="simulated time to run")
+	parser.add_argument("--renormalize", type=int, default=10, help="steps between two renormalisations of the tangent vectors")
+	parser.add_argument("--escape-radius", type=float, default=None, help="escape distance (default: 10 times the initial size)")
+	parser.add_argument("--check-every", type=int, default=10, help="steps between two escape checks")
+	parser.add_argument("--workers", type=int, default=None, help="processes (default: one per core)")
+	parser.add_argument("--chunk-size", type=int, default=256, help="grid points per process job")
+	parser.add_argument("--output", default="chaosmap.npz")
+	parser.add_argument("--image", default=None, help="also write the map as an image (.png)")
+	parser.add_argument("--color", choices=("lyapunov", "escape_time"), default="lyapunov", help="the map of the image")
+	args = parser.parse_args(argv)
+
+	try:
+		system = scenarios.load(args.scenario)
+		x_axis, y_axis = parse_axis(args.x[0]), parse_axis(args.y[0])
+		for body, _, _ in (x_axis, y_axis):
+			if body >= len(system):
+				raise ValueError(f"The scenario has {len(system)} bodies, there is no body {body}")
+	except ValueError as error:
+		parser.error(str(error))
+	nx, ny = args.resolution
+	x_values = np.linspace(float(args.x[1]), float(args.x[2]), nx)
+	y_values = np.linspace(float(args.y[1]), float(args.y[2]), ny)
+	positions, velocities = grid(system, x_axis, y_axis, x_values, y_values)
+	ensemble = Ensemble(positions, velocities, system.masses, system.radii, system.G, system.softening, args.integrator, args.dt)
+	escape_radius = args.escape_radius or 10 * (np.ptp(system.positions, axis=0).max() or 1.0)
+
+	# everything that changes the map: a progress file of another map is not reused
+	signature = {key: value for key, value in vars(args).items() if key not in ("workers", "output", "image", "color")}
+	start = time.perf_counter()
+	results = chaos_map(ensemble, args.duration, args.renormalize, escape_radius, args.check_every, args.workers,
+						args.chunk_size, args.output + ".part", signature)
+	wall_time = time.perf_counter() - start
+
+	maps = {key: value.reshape(ny, nx) for key, value in results.items()}
+	np.savez(args.output, **maps, x=x_values, y=y_values, x_axis=args.x[0], y_axis=args.y[0], scenario=args.scenario,
+			 integrator=args.integrator, dt=args.dt, duration=args.duration)
+	os.remove(args.output + ".part")
+	if args.image:
+		save_image(args.image, maps[args.color])
+	escaped = np.count_nonzero(np.isfinite(maps["escape_time"]))
+	print(f"{nx * ny} grid points in {wall_time:.2f} s: Lyapunov exponents from {np.nanmin(maps['lyapunov']):.3g} "
+		  f"to {np.nanmax(maps['lyapunov']):.3g}, {escaped} escapes, written to {args.output}")
+	return maps
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,135 @@
+import os
+import struct
+import zlib
+import numpy as np
+from nbody import Body, System, Vector, DirectSum
+from barneshut import BarnesHut
+import kernels
+from timestep import AdaptiveTimestep
+
+'''
+Description:
+	Checkpoints: the whole state of a run in one small binary file, to stop it and carry on later.
+
+	save(path, system, camera) : writes the file atomically (a crash while saving keeps the previous checkpoint)
+	load(path)                 : gives back (system, camera) ready to go on, bit for bit
+
+	What is saved: the bodies, the simulated time, the integrator and its cached acceleration,
+	the adaptive timestep and its last step, the force solver, and the camera if any.
+	What is not: the conservation monitor (a resumed run takes its reference again, at the resume),
+	the tracers, the collision and event handlers (attached again by whoever resumes), and the rounding
+	residues of a float32 run (integrators.Integrator.compensation, starting again from zero).
+	A float64 run without tracers resumes bit for bit; the rest carries on from the resumed state.
+
+	File format (".ckpt"), little endian:
+		header (128 bytes) : magic b"3BCKPT\0\0", version (uint32), bodies (uint32), flags (uint32),
+		                     integrator, timestep method, solver (16 bytes ASCII each), zeros
+		settings           : time, G, softening, dt, eta, tolerance, dt_min, dt_max, safety, last dt,
+		                     rejected steps, theta, leaf size, camera x, y, z, yaw, pitch  (float64)
+		bodies             : masses (bodies,), radii (bodies,), positions (bodies, 3), velocities (bodies, 3)  (float64)
+		cache              : the cached accelerations (bodies, 3), only with the CACHE flag
+		checksum           : CRC32 of everything before it (uint32)
+'''
+
+MAGIC = b"3BCKPT\0\0"
+VERSION = 1
+HEADER = struct.Struct("<8sIII16s16s16s60x")
+SETTINGS = struct.Struct("<18d")
+
+# flags
+TIMESTEP, CACHE, CAMERA = 1, 2, 4
+
+
+def save(path:str, system:System, camera=None) -> None:
+	'''
+	˗ˋˏ ♡ ˎˊ˗
+	- Write the state of "system" (and "camera") to "path"
+	- The file is written next to it first, then renamed over it: "path" always holds a complete checkpoint
+
+	:param path: the ".ckpt" file
+	:param system: the System to save, not moving while it is saved (hold the lock of a PhysicsWorker)
+	:param camera: anything with x, y, z, yaw and pitch (a raycasting.Camera), or None
+	'''
+	timestep = system.timestep
+	cache = getattr(system.integrator, "cached_acceleration", None)
+	if cache is not None and cache.shape != system.positions.shape:
+		cache = None
+	flags = (TIMESTEP if timestep else 0) | (CACHE if cache is not None else 0) | (CAMERA if camera else 0)
+
+	solver = system.solver
+	if isinstance(solver, BarnesHut):
+		solver_name, theta, leaf_size = "barnes-hut", solver.theta, solver.leaf_size
+	elif isinstance(solver, DirectSum):
+		solver_name, theta, leaf_size = "direct", 0.0, 0
+	elif isinstance(solver, kernels.NumbaDirectSum):
+		solver_name, theta, leaf_size = "numba", 0.0, 0
+	else:
+		raise ValueError(f"Cannot save the force solver {solver}")
+
+	settings = (system.time, system.G, system.softening, system.dt)
+	if timestep:
+		settings += (timestep.eta, timestep.tolerance, timestep.dt_min, timestep.dt_max, timestep.safety,
+					 np.nan if timestep.dt is None else timestep.dt, timestep.rejected)
+	else:
+		settings += (0.0,) * 7
+	settings += (theta, leaf_size)
+	settings += (camera.x, camera.y, camera.z, camera.yaw, camera.pitch) if camera else (0.0,) * 5
+
+	data = HEADER.pack(MAGIC, VERSION, len(system), flags, system.integrator.name.encode(),
+					   (timestep.method if timestep else "").encode(), solver_name.encode())
+	data += SETTINGS.pack(*map(float, settings))
+	for array in (system.masses, system.radii, system.positions, system.velocities) + ((cache,) if cache is not None else ()):
+		data += np.ascontiguousarray(array, dtype="<f8").tobytes()
+	data += struct.pack("<I", zlib.crc32(data))
+
+	temporary = path + ".tmp"
+	with open(temporary, "wb") as file:
+		file.write(data)
+		file.flush()
+		os.fsync(file.fileno())
+	os.replace(temporary, path)
+
+
+def load(path:str) -> tuple:
+	'''
+	˗ˋˏ ♡ ˎˊ˗
+	- Read a checkpoint written by save
+
+	:return: (system, camera) where camera is ((x, y, z), (yaw, pitch)) for raycasting.Camera, or None
+	'''
+	with open(path, "rb") as file:
+		data = file.read()
+	if len(data) < HEADER.size + SETTINGS.size + 4 or data[:len(MAGIC)] != MAGIC:
+		raise ValueError(f"{path} is not a checkpoint file")
+	if struct.unpack("<I", data[-4:])[0] != zlib.crc32(data[:-4]):
+		raise ValueError(f"{path} is damaged (wrong checksum)")
+	magic, version, bodies, flags, integrator, method, solver_name = HEADER.unpack_from(data)
+	if version != VERSION:
+		raise ValueError(f"{path} has version {version}, only version {VERSION} is supported")
+	(time, G, softening, dt, eta, tolerance, dt_min, dt_max, safety, last_dt, rejected,
+	 theta, leaf_size, x, y, z, yaw, pitch) = SETTINGS.unpack_from(data, HEADER.size)
+
+	arrays = np.frombuffer(data, dtype="<f8", offset=HEADER.size + SETTINGS.size, count=(len(data) - HEADER.size - SETTINGS.size - 4) // 8)
+	masses, radii = arrays[:bodies], arrays[bodies:2 * bodies]
+	positions = arrays[2 * bodies:5 * bodies].reshape(bodies, 3)
+	velocities = arrays[5 * bodies:8 * bodies].reshape(bodies, 3)
+
+	timestep = None
+	if flags & TIMESTEP:
+		timestep = AdaptiveTimestep(method.rstrip(b"\0").decode(), eta=eta, tolerance=tolerance, dt_min=dt_min, dt_max=dt_max, safety=safety)
+		timestep.dt = None if np.isnan(last_dt) else last_dt
+		timestep.rejected = int(rejected)
+	solver_name = solver_name.rstrip(b"\0")
+	if solver_name == b"barnes-hut":
+		solver = BarnesHut(theta, int(leaf_size))
+	else:
+		solver = kernels.get_solver("numba" if solver_name == b"numba" else "numpy")
+
+	system = System([Body(mass, R, position, Vector(velocity)) for mass, R, position, velocity in zip(masses, radii, positions, velocities)],
+					G=G, softening=softening, integrator=integrator.rstrip(b"\0").decode(), dt=dt, timestep=timestep, solver=solver)
+	system.time = time
+	if flags & CACHE:
+		# after the bodies were added (adding one resets the integrator)
+		system.integrator.cached_acceleration = arrays[8 * bodies:11 * bodies].reshape(bodies, 3).copy()
+	camera = ((x, y, z), (yaw, pitch)) if flags & CAMERA else None
+	return system, camera
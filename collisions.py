@@ -0,0 +1,168 @@
+import numpy as np
+
+'''
+Description:
+	Collisions between bodies, using their radius R: two bodies touch when they are closer than R1 + R2.
+
+	Broad phase: sort and sweep. The bodies are sorted along the axis they are the most spread on,
+	and only the bodies whose intervals [x - R, x + R] overlap on that axis are candidates,
+	found with one searchsorted instead of a check of all the N² pairs. Small systems (BRUTE_FORCE bodies
+	or less) skip the sort, all their pairs are cheaper to check at once.
+	Narrow phase: the exact distance of the candidates, in one batched call.
+
+	The OUTCOMES of a collision:
+		merge  : perfectly inelastic, one body with the total mass, momentum and volume, at the centre of mass
+		bounce : the normal relative velocity is reversed (times the restitution), the overlap is removed
+		stop   : a Collision exception is raised with the touching pairs, the system is left as it is
+
+	system.collisions = CollisionHandler("merge")
+'''
+
+OUTCOMES = ("merge", "bounce", "stop")
+BRUTE_FORCE = 48 # bodies, below that the sort costs more than it saves
+
+_all_pairs = {}
+
+
+class Collision(RuntimeError):
+	def __init__(self, message:str, pairs:list, time:float) -> None:
+		super().__init__(message)
+		self.pairs = pairs
+		self.time = time
+
+
+def candidate_pairs(positions:np.ndarray, radii:np.ndarray) -> tuple:
+	'''
+	˗ˋˏ ♡ ˎˊ˗
+	- Broad phase: the pairs of bodies that may touch, by sort and sweep along one axis
+
+	:return: (i, j) arrays of indices, i < j, every candidate pair once
+	'''
+	n = len(radii)
+	if n <= BRUTE_FORCE:
+		if n not in _all_pairs:
+			_all_pairs[n] = np.triu_indices(n, 1)
+		return _all_pairs[n]
+	axis = int(np.argmax(positions.var(axis=0)))
+	order = np.argsort(positions[:, axis] - radii)
+	lower = positions[order, axis] - radii[order]
+	upper = positions[order, axis] + radii[order]
+	# the intervals starting after the start of interval k and before its end overlap it
+	ends = np.searchsorted(lower, upper, side="right")
+	counts = np.maximum(ends - np.arange(1, n + 1), 0)
+	first = np.repeat(np.arange(n), counts)
+	second = first + 1 + np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+	first, second = order[first], order[second]
+	return np.minimum(first, second), np.maximum(first, second)
+
+
+def touching_pairs(positions:np.ndarray, radii:np.ndarray) -> tuple:
+	'''
+	˗ˋˏ ♡ ˎˊ˗
+	- Narrow phase: the candidate pairs closer than the sum of their radii
+
+	:return: (i, j) arrays of indices, i < j
+	'''
+	i, j = candidate_pairs(positions, radii)
+	separation = positions[j] - positions[i]
+	touching = (separation * separation).sum(axis=-1) < (radii[i] + radii[j]) ** 2
+	return i[touching], j[touching]
+
+
+class CollisionHandler:
+	def __init__(self, outcome:str="merge", restitution:float=1.0, every:int=1) -> None:
+		'''
+		˗ˋˏ ♡ ˎˊ˗
+		- Looks for touching bodies after the steps of System.advance, and resolves the collisions
+
+		:param outcome: "merge", "bounce" or "stop" (see OUTCOMES)
+		:param restitution: bounce only, 1 for an elastic bounce, 0 for bodies that stay in contact
+		:param every: steps between two checks (1: every step, fast bodies could go through each other otherwise)
+		'''
+		if outcome not in OUTCOMES:
+			raise ValueError(f"Unknown outcome {outcome!r}, choose one of {', '.join(OUTCOMES)}")
+		self.outcome = outcome
+		self.restitution = restitution
+		self.every = every
+		self.events = [] # (time, i, j), the indices of the bodies at that time
+		self._countdown = every
+
+	def after_step(self, system) -> None:
+		'''
+		- Called by System.advance after every step
+		'''
+		self._countdown -= 1
+		if self._countdown > 0:
+			return
+		self._countdown = self.every
+		first, second = touching_pairs(system.positions, system.radii)
+		if len(first):
+			self.resolve(system, first.tolist(), second.tolist())
+
+	def resolve(self, system, first:list, second:list) -> None:
+		'''
+		˗ˋˏ ♡ ˎˊ˗
+		- Apply the outcome to the touching pairs (first[k], second[k])
+		- Merges are chained: if a touches b and b touches c, the three become one body
+		'''
+		pairs = list(zip(first, second))
+		self.events.extend((system.time, i, j) for i, j in pairs)
+		if self.outcome == "stop":
+			raise Collision(", ".join(f"bodies {i} and {j}" for i, j in pairs) + f" collided at t = {system.time:g} s", pairs, system.time)
+
+		if self.outcome == "bounce":
+			for i, j in pairs:
+				self._bounce(system, i, j)
+		else:
+			into = {} # removed body -> the body it was merged into
+			for i, j in pairs:
+				while i in into:
+					i = into[i]
+				while j in into:
+					j = into[j]
+				if i == j:
+					continue
+				i, j = min(i, j), max(i, j)
+				self._merge(system, i, j)
+				into[j] = i
+			for body in [system.bodies[j] for j in sorted(into, reverse=True)]:
+				system.remove(body)
+		system.changed()
+
+	def _merge(self, system, i:int, j:int) -> None:
+		'''
+		- Body j into body i: masses, momenta and volumes add up, at the centre of mass
+		'''
+		masses = system.masses
+		mass = masses[i] + masses[j]
+		weight = masses[j] / mass if mass else 0.5
+		system.positions[i] += weight * (system.positions[j] - system.positions[i])
+		system.velocities[i] += weight * (system.velocities[j] - system.velocities[i])
+		system.radii[i] = np.cbrt(system.radii[i] ** 3 + system.radii[j] ** 3)
+		masses[i] = mass
+
+	def _bounce(self, system, i:int, j:int) -> None:
+		'''
+		- An impulse along the line of centres, and both bodies pushed apart until they just touch
+		'''
+		masses, positions, velocities = system.masses, system.positions, system.velocities
+		separation = positions[j] - positions[i]
+		distance = np.sqrt(separation @ separation)
+		if distance == 0.0:
+			return # no direction to bounce along
+		normal = separation / distance
+		inverse_i = 1 / masses[i] if masses[i] else 0.0
+		inverse_j = 1 / masses[j] if masses[j] else 0.0
+		if not inverse_i + inverse_j:
+			return
+		approach = (velocities[j] - velocities[i]) @ normal
+		if approach < 0: # still getting closer
+			impulse = -(1 + self.restitution) * approach / (inverse_i + inverse_j)
+			velocities[i] -= impulse * inverse_i * normal
+			velocities[j] += impulse * inverse_j * normal
+		overlap = system.radii[i] + system.radii[j] - distance
+		positions[i] -= overlap * inverse_i / (inverse_i + inverse_j) * normal
+		positions[j] += overlap * inverse_j / (inverse_i + inverse_j) * normal
+
+	def __str__(self) -> str:
+		return f"CollisionHandler({self.outcome}, {len(self.events)} collisions)"
@@ -0,0 +1,282 @@
+import argparse
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import scenarios
+from nbody import pairwise_accelerations
+from integrators import INTEGRATORS, get_integrator
+from units import Units
+
+'''
+Description:
+	Ensemble runs: many independent systems (same bodies, slightly different initial conditions)
+	integrated together as one stacked array of shape (members, bodies, 3).
+	One force evaluation moves the whole ensemble, and chunks of the ensemble go to a pool of processes.
+
+	Every member ends in one of the OUTCOMES:
+		survived  : still bound at the end of the run
+		escape    : a body left the system (beyond the escape radius, moving away, unbound)
+		collision : two bodies got closer than the sum of their radii
+	and its final state (at the end, or at the moment of the event) is kept.
+
+	python ensemble.py --scenario figure-eight --members 2000 --sigma 1e-2 --dt 1e-3 --duration 30 --workers 4 --output sweep.npz
+
+	Big ensembles can be stored in float32 (--precision f4): half the memory and bandwidth, and
+	compensated sums for the positions and velocities (see Integrator.drift) keep most of the accuracy.
+	float32 wants numbers close to 1: use it with --units nbody (see units.py), the results are converted back.
+'''
+
+SURVIVED, ESCAPE, COLLISION = 0, 1, 2
+OUTCOMES = ("survived", "escape", "collision")
+
+
+class Ensemble:
+	def __init__(self, positions:np.ndarray, velocities:np.ndarray, masses:np.ndarray, radii:np.ndarray,
+			  G:float, softening:float=0.0, integrator="leapfrog", dt:float=1.0, dtype=np.float64) -> None:
+		'''
+		˗ˋˏ ♡ ˎˊ˗
+		- A stack of independent systems with the same number of bodies
+
+		:param positions: (E, N, 3) positions of every body of every member
+		:param velocities: (E, N, 3) velocities
+		:param masses: (N,) masses shared by all members, or (E, N)
+		:param radii: (N,) radii of the bodies, used for the collisions
+		:param G: the gravitational constant
+		:param softening: Plummer softening length
+		:param integrator: the name of the integrator or an Integrator
+		:param dt: the timestep, the same for every member
+		:param dtype: of the positions, velocities and masses: np.float32 halves the memory of big ensembles
+		'''
+		self.positions = np.array(positions, dtype=dtype)
+		self.velocities = np.array(velocities, dtype=dtype)
+		self.masses = np.broadcast_to(np.asarray(masses, dtype=dtype), self.positions.shape[:-1]).copy()
+		self.radii = np.asarray(radii, dtype=float)
+		self.G = G
+		self.softening = softening
+		self.integrator = get_integrator(integrator)
+		self.dt = dt
+		self.time = 0.0
+
+	@classmethod
+	def perturbed(cls, system, members:int, sigma:float=1e-6, velocity_sigma:float=None, seed:int=None, **options):
+		'''
+		˗ˋˏ ♡ ˎˊ˗
+		- "members" copies of a System, with gaussian perturbations relative to the scale of the system
+		- The first member is the unperturbed system, as a reference
+
+		:param system: the System to copy
+		:param members: the size of the ensemble
+		:param sigma: relative perturbation of the positions (in unities of the size of the system)
+		:param velocity_sigma: relative perturbation of the velocities (default: sigma)
+		:param seed: seed of the random generator, for reproducible sweeps
+		:param options: integrator, dt, softening (default: the ones of the system), dtype
+		'''
+		rng = np.random.default_rng(seed)
+		velocity_sigma = sigma if velocity_sigma is None else velocity_sigma
+		length = np.ptp(system.positions, axis=0).max() or 1.0
+		speed = np.abs(system.velocities).max() or 1.0
+
+		positions = np.repeat(system.positions[np.newaxis], members, axis=0)
+		velocities = np.repeat(system.velocities[np.newaxis], members, axis=0)
+		positions[1:] += rng.normal(scale=sigma * length, size=positions[1:].shape)
+		velocities[1:] += rng.normal(scale=velocity_sigma * speed, size=velocities[1:].shape)
+
+		options.setdefault("integrator", system.integrator.name)
+		options.setdefault("dt", system.dt)
+		options.setdefault("softening", system.softening)
+		return cls(positions, velocities, system.masses, system.radii, system.G, **options)
+
+	def __len__(self) -> int:
+		return len(self.positions)
+
+	def accelerations(self, positions:np.ndarray) -> np.ndarray:
+		return pairwise_accelerations(positions, self._active_masses, self.G, self.softening)
+
+	def chunks(self, size:int) -> list:
+		'''
+		- Split the ensemble into smaller ensembles of at most "size" members
+		'''
+		return [
+			Ensemble(self.positions[start:start + size], self.velocities[start:start + size], self.masses[start:start + size],
+					 self.radii, self.G, self.softening, type(self.integrator)(), self.dt, self.positions.dtype)
+			for start in range(0, len(self), size)
+		]
+
+	def _collisions(self, positions:np.ndarray) -> tuple:
+		'''
+		- For every member, the first pair (i, j) closer than Ri + Rj, or (-1, -1)
+		'''
+		n = positions.shape[1]
+		i, j = np.triu_indices(n, 1)
+		separation = positions[:, j] - positions[:, i]
+		touching = (separation * separation).sum(axis=-1) < (self.radii[i] + self.radii[j]) ** 2
+		hit = touching.any(axis=1)
+		first = touching.argmax(axis=1)
+		return hit, np.where(hit, i[first], -1), np.where(hit, j[first], -1)
+
+	def _escapes(self, positions:np.ndarray, velocities:np.ndarray, masses:np.ndarray, radius:float) -> tuple:
+		'''
+		- For every member, the first body beyond "radius" from the centre of mass of the others,
+			moving away and unbound from them, or -1
+		'''
+		total = masses.sum(axis=1, keepdims=True)
+		others = total - masses # (E, N)
+		center = (masses[..., np.newaxis] * positions).sum(axis=1, keepdims=True)
+		momentum = (masses[..., np.newaxis] * velocities).sum(axis=1, keepdims=True)
+		# position and velocity relative to the centre of mass of the other bodies
+		relative = (positions * total[..., np.newaxis] - center) / others[..., np.newaxis]
+		relative_velocity = (velocities * total[..., np.newaxis] - momentum) / others[..., np.newaxis]
+		distance = np.sqrt((relative * relative).sum(axis=-1))
+		energy = 0.5 * (relative_velocity * relative_velocity).sum(axis=-1) - self.G * total / distance
+		outward = (relative * relative_velocity).sum(axis=-1) > 0
+		escaping = (distance > radius) & outward & (energy > 0)
+		hit = escaping.any(axis=1)
+		return hit, np.where(hit, escaping.argmax(axis=1), -1)
+
+	def run(self, duration:float, escape_radius:float=None, check_every:int=10) -> dict:
+		'''
+		˗ˋˏ ♡ ˎˊ˗
+		- Integrate every member for "duration" with fixed steps of self.dt
+		- Members that escape or collide are taken out of the stack (the others go on faster)
+
+		:param duration: the simulated time
+		:param escape_radius: distance beyond which an unbound body counts as escaped (None: no escape check)
+		:param check_every: look for escapes and collisions every this many steps
+		:return: dictionary of per-member results, see OUTCOMES
+		'''
+		members = len(self)
+		outcome = np.full(members, SURVIVED)
+		event_time = np.full(members, np.nan)
+		bodies = np.full((members, 2), -1)
+		final_positions = self.positions.copy()
+		final_velocities = self.velocities.copy()
+
+		active = np.arange(members)
+		positions, velocities = self.positions.copy(), self.velocities.copy()
+		self._active_masses = self.masses
+		self.integrator.reset()
+
+		steps = int(np.ceil(duration / self.dt - 1e-9))
+		for step in range(1, steps + 1):
+			self.integrator.step(positions, velocities, self.dt, self.accelerations)
+			if step % check_every and step != steps:
+				continue
+
+			now = self.time + step * self.dt
+			done = np.zeros(len(active), dtype=bool)
+			hit, first, second = self._collisions(positions)
+			outcome[active[hit]] = COLLISION
+			bodies[active[hit]] = np.stack((first, second), axis=1)[hit]
+			done |= hit
+			if escape_radius is not None:
+				escaped, body = self._escapes(positions, velocities, self._active_masses, escape_radius)
+				escaped &= ~done
+				outcome[active[escaped]] = ESCAPE
+				bodies[active[escaped], 0] = body[escaped]
+				done |= escaped
+			if not done.any():
+				continue
+
+			event_time[active[done]] = now
+			final_positions[active[done]] = positions[done]
+			final_velocities[active[done]] = velocities[done]
+			keep = ~done
+			active, positions, velocities = active[keep], positions[keep], velocities[keep]
+			self._active_masses = self._active_masses[keep]
+			self.integrator.reset()
+			for name, compensation in self.integrator.compensation.items():
+				self.integrator.compensation[name] = compensation[keep]
+			if not len(active):
+				break
+
+		final_positions[active] = positions
+		final_velocities[active] = velocities
+		self.time += duration
+		return {
+			"outcome": outcome,
+			"event_time": event_time,
+			"bodies": bodies,
+			"final_positions": final_positions,
+			"final_velocities": final_velocities,
+			"initial_positions": self.positions,
+			"initial_velocities": self.velocities,
+		}
+
+
+def _run_chunk(arguments:tuple) -> dict:
+	ensemble, duration, escape_radius, check_every = arguments
+	return ensemble.run(duration, escape_radius, check_every)
+
+
+def run_ensemble(ensemble:Ensemble, duration:float, escape_radius:float=None, check_every:int=10,
+				 workers:int=None, chunk_size:int=256) -> dict:
+	'''
+	˗ˋˏ ♡ ˎˊ˗
+	- Run an ensemble split into chunks over a pool of processes, and gather the results in order
+
+	:param workers: number of processes (None: one per core, 1: everything in this process)
+	:param chunk_size: members per chunk, big enough for NumPy to pay off
+	'''
+	jobs = [(chunk, duration, escape_radius, check_every) for chunk in ensemble.chunks(chunk_size)]
+	if workers == 1:
+		results = [_run_chunk(job) for job in jobs]
+	else:
+		with ProcessPoolExecutor(max_workers=workers) as pool:
+			results = list(pool.map(_run_chunk, jobs))
+	return {key: np.concatenate([result[key] for result in results]) for key in results[0]}
+
+
+def main(argv=None) -> dict:
+	parser = argparse.ArgumentParser(description="Integrate many perturbed copies of a scenario and report how each one ends.")
+	parser.add_argument("--scenario", default="pythagorean", help=f"one of {', '.join(scenarios.SCENARIOS)}, or a .json file")
+	parser.add_argument("--members", type=int, default=1000, help="size of the ensemble")
+	parser.add_argument("--sigma", type=float, default=1e-6, help="relative perturbation of the initial conditions")
+	parser.add_argument("--seed", type=int, default=None)
+	parser.add_argument("--integrator", default="leapfrog", choices=sorted(INTEGRATORS))
+	parser.add_argument("--dt", type=float, required=True, help="timestep in scenario unities")
+	parser.add_argument("--duration", type=float, required=True, help="simulated time to run")
+	parser.add_argument("--escape-radius", type=float, default=None, help="escape distance (default: 10 times the initial size)")
+	parser.add_argument("--check-every", type=int, default=10, help="steps between two escape/collision checks")
+	parser.add_argument("--workers", type=int, default=None, help="processes (default: one per core)")
+	parser.add_argument("--chunk-size", type=int, default=256, help="members per process job")
+	parser.add_argument("--precision", choices=("f8", "f4"), default="f8", help="float64 or float32 states")
+	parser.add_argument("--units", choices=("scenario", "nbody"), default="scenario", help="integrate in scenario unities or in N-body unities (G = 1)")
+	parser.add_argument("--output", default="ensemble.npz")
+	args = parser.parse_args(argv)
+
+	try:
+		system = scenarios.load(args.scenario)
+	except ValueError as error:
+		parser.error(str(error))
+	escape_radius = args.escape_radius or 10 * (np.ptp(system.positions, axis=0).max() or 1.0)
+	dt, duration = args.dt, args.duration
+	units = None
+	if args.units == "nbody":
+		units = Units.natural(system)
+		system = units.to_internal(system)
+		dt, duration = units.to_internal(dt, "time"), units.to_internal(duration, "time")
+		escape_radius = units.to_internal(escape_radius, "length")
+	ensemble = Ensemble.perturbed(system, args.members, args.sigma, seed=args.seed, integrator=args.integrator, dt=dt,
+								  dtype=np.float32 if args.precision == "f4" else np.float64)
+
+	start = time.perf_counter()
+	results = run_ensemble(ensemble, duration, escape_radius, args.check_every, args.workers, args.chunk_size)
+	wall_time = time.perf_counter() - start
+	if units:
+		# back to the unities of the scenario
+		system = units.to_physical(system)
+		results["event_time"] = units.to_physical(results["event_time"], "time")
+		for key in ("positions", "velocities"):
+			dimension = "length" if key == "positions" else "velocity"
+			for state in ("initial", "final"):
+				results[f"{state}_{key}"] = units.to_physical(results[f"{state}_{key}"].astype(float), dimension)
+
+	np.savez(args.output, **results, masses=system.masses, radii=system.radii, G=system.G,
+			 scenario=args.scenario, dt=args.dt, duration=args.duration, outcomes=np.array(OUTCOMES))
+	counts = ", ".join(f"{np.count_nonzero(results['outcome'] == code)} {name}" for code, name in enumerate(OUTCOMES))
+	print(f"{args.members} members in {wall_time:.2f} s: {counts}, written to {args.output}")
+	return results
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,208 @@
+import numpy as np
+
+'''
+Description:
+	Events inside the steps: close approaches, escapes, plane crossings... found with their exact time,
+	so the steps can stay long and nothing happening between two of them is missed.
+
+	Every event is a function of the state g(positions, velocities, masses), one value per candidate (pair or body),
+	and it happens when g goes through zero (in its "direction"). After each step of System.advance,
+	the values at both ends of the step are compared; where one changed sign, the root is found by bisection
+	on the dense output of the step (integrators.HermiteInterpolant): no force evaluation, whatever the integrator.
+	Two roots of the same candidate inside one step cancel out and are not seen, steps must stay shorter than that.
+
+	The EVENTS:
+		close-approach : the separation of a pair is at a minimum (r·v goes from negative to positive), below a distance
+		escape         : a body goes beyond a radius from the centre of mass of the others
+		crossing       : a body goes through a plane (z = 0 by default)
+
+	system.events = EventLocator([CloseApproach(below=1e7), Escape(radius=1e9)])
+	system.advance(3.15e7)
+	system.events.found      [{"event": "close-approach", "time": ..., "bodies": (0, 1), "distance": ...}, ...]
+'''
+
+
+class CloseApproach:
+	name = "close-approach"
+	direction = 1
+
+	def __init__(self, below:float=np.inf, bodies:list=None) -> None:
+		'''
+		˗ˋˏ ♡ ˎˊ˗
+		- The minimum separation of every pair of bodies
+
+		:param below: only report the approaches closer than that
+		:param bodies: the indices of the bodies to watch (default: all of them)
+		'''
+		self.below = below
+		self.bodies = bodies
+
+	def _indices(self, n:int) -> tuple:
+		i, j = np.triu_indices(n if self.bodies is None else len(self.bodies), k=1)
+		if self.bodies is not None:
+			bodies = np.asarray(self.bodies)
+			i, j = bodies[i], bodies[j]
+		return i, j
+
+	def values(self, positions:np.ndarray, velocities:np.ndarray, masses:np.ndarray) -> np.ndarray:
+		i, j = self._indices(len(positions))
+		return ((positions[j] - positions[i]) * (velocities[j] - velocities[i])).sum(axis=-1)
+
+	def report(self, positions:np.ndarray, velocities:np.ndarray, masses:np.ndarray, k:int) -> dict:
+		i, j = self._indices(len(positions))
+		distance = float(np.linalg.norm(positions[j[k]] - positions[i[k]]))
+		if distance >= self.below:
+			return None
+		return {"bodies": (int(i[k]), int(j[k])), "distance": distance}
+
+	def __str__(self) -> str:
+		return f"CloseApproach(below {self.below:g})"
+
+
+class Escape:
+	name = "escape"
+	direction = 1
+
+	def __init__(self, radius:float) -> None:
+		'''
+		˗ˋˏ ♡ ˎˊ˗
+		- A body going beyond "radius" from the centre of mass of the other bodies
+
+		:param radius: the escape radius
+		'''
+		self.radius = radius
+
+	def _relative(self, positions:np.ndarray, velocities:np.ndarray, masses:np.ndarray) -> tuple:
+		'''
+		- Position and velocity of every body relative to the centre of mass of the others
+		- Zeros for a body with no mass around it (alone, or holding all the mass): it never escapes
+		'''
+		masses = masses[:, np.newaxis]
+		total = masses.sum()
+		others = total - masses
+		scale = np.divide(1.0, others, out=np.zeros_like(others, dtype=float), where=others > 0)
+		relative = (positions * total - (masses * positions).sum(axis=0)) * scale
+		relative_velocity = (velocities * total - (masses * velocities).sum(axis=0)) * scale
+		return relative, relative_velocity
+
+	def values(self, positions:np.ndarray, velocities:np.ndarray, masses:np.ndarray) -> np.ndarray:
+		relative = self._relative(positions, velocities, masses)[0]
+		return np.sqrt((relative * relative).sum(axis=-1)) - self.radius # -radius for the zeros: never crossed
+
+	def report(self, positions:np.ndarray, velocities:np.ndarray, masses:np.ndarray, k:int) -> dict:
+		relative_velocity = self._relative(positions, velocities, masses)[1]
+		return {"bodies": (int(k),), "distance": self.radius, "speed": float(np.linalg.norm(relative_velocity[k]))}
+
+	def __str__(self) -> str:
+		return f"Escape(radius {self.radius:g})"
+
+
+class PlaneCrossing:
+	name = "crossing"
+	direction = 0
+
+	def __init__(self, normal:tuple=(0.0, 0.0, 1.0), offset:float=0.0, bodies:list=None) -> None:
+		'''
+		˗ˋˏ ♡ ˎˊ˗
+		- A body going through the plane {x, x·normal = offset}, both ways
+
+		:param normal: the normal of the plane
+		:param offset: its distance to the origin along the normal
+		:param bodies: the indices of the bodies to watch (default: all of them)
+		'''
+		normal = np.asarray(normal, dtype=float)
+		self.normal = normal / np.linalg.norm(normal)
+		self.offset = offset
+		self.bodies = bodies
+
+	def values(self, positions:np.ndarray, velocities:np.ndarray, masses:np.ndarray) -> np.ndarray:
+		if self.bodies is not None:
+			positions = positions[self.bodies]
+		return positions @ self.normal - self.offset
+
+	def report(self, positions:np.ndarray, velocities:np.ndarray, masses:np.ndarray, k:int) -> dict:
+		body = k if self.bodies is None else self.bodies[k]
+		upward = float(velocities[body] @ self.normal) > 0
+		return {"bodies": (int(body),), "direction": 1 if upward else -1}
+
+	def __str__(self) -> str:
+		return f"PlaneCrossing(normal {tuple(self.normal)}, offset {self.offset:g})"
+
+
+EVENTS = {event.name: event for event in (CloseApproach, Escape, PlaneCrossing)}
+
+
+class EventLocator:
+	def __init__(self, events:list, tolerance:float=1e-9) -> None:
+		'''
+		˗ˋˏ ♡ ˎˊ˗
+		- Looks for the events after every step of System.advance, for System(events=...)
+
+		:param events: CloseApproach, Escape, PlaneCrossing... anything with a name, a direction,
+			values(positions, velocities, masses) and report(positions, velocities, masses, k)
+		:param tolerance: the accuracy of the times found, relative to the step
+		'''
+		self.events = list(events)
+		self.tolerance = tolerance
+		self.found = [] # one dictionary per event: "event", "time", "bodies" and what its report adds
+
+	def _crossed(self, direction:int, before:np.ndarray, after:np.ndarray) -> np.ndarray:
+		rising = (before < 0) & (after >= 0)
+		falling = (before > 0) & (after <= 0)
+		if direction > 0:
+			return rising
+		if direction < 0:
+			return falling
+		return rising | falling
+
+	def after_step(self, system) -> list:
+		'''
+		- Called by System.advance_to after every step
+
+		:return: the events found inside that step, in time order
+		'''
+		interpolant = system.interpolant()
+		if interpolant is None:
+			return [] # the bodies changed during the step (merged...)
+		masses = system.masses
+		found = []
+		for event in self.events:
+			before = event.values(interpolant.positions0, interpolant.velocities0, masses)
+			after = event.values(interpolant.positions1, interpolant.velocities1, masses)
+			for k in np.flatnonzero(self._crossed(event.direction, before, after)):
+				time_ = self._locate(event, interpolant, masses, k, before[k])
+				report = event.report(*interpolant(time_), masses, k)
+				if report is not None:
+					found.append({"event": event.name, "time": time_, **report})
+		found.sort(key=lambda report: report["time"])
+		self.found += found
+		return found
+
+	def _locate(self, event, interpolant, masses:np.ndarray, k:int, value:float) -> float:
+		'''
+		- Bisection of the values of candidate "k" along the step, down to tolerance × the step
+		- Done on the fraction of the step s in [0, 1]: the times t0 + s·(t1 - t0) can be too close to tell apart
+			(t0 large, step tiny), s cannot, and it stops anyway after the 64 halvings of a float
+		'''
+		t0, step = interpolant.t0, interpolant.t1 - interpolant.t0
+		low, high = 0.0, 1.0
+		for _ in range(64):
+			if high - low <= self.tolerance:
+				break
+			middle = 0.5 * (low + high)
+			time_ = t0 + middle * step
+			middle_value = event.values(*interpolant(time_), masses)[k]
+			if (middle_value < 0) == (value < 0) and middle_value != 0:
+				low, value = middle, middle_value
+			else:
+				high = middle
+		return t0 + 0.5 * (low + high) * step
+
+	def times(self, name:str=None) -> np.ndarray:
+		'''
+		- The times of the events found, of one kind only if "name" is given
+		'''
+		return np.array([report["time"] for report in self.found if name is None or report["event"] == name])
+
+	def __str__(self) -> str:
+		return f"EventLocator({', '.join(str(event) for event in self.events)}, {len(self.found)} found)"
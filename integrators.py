@@ -0,0 +1,216 @@
+import numpy as np
+
+'''
+Description:
+	Integrators advance positions and velocities (in place) by one step of "dt" seconds.
+	Each one only needs the arrays and a function giving the accelerations at some positions,
+	so they work the same for one system (N, 3) or a whole stack of systems (..., N, 3).
+
+	euler     : semi-implicit Euler, the historical scheme (order 1, symplectic)
+	leapfrog  : kick-drift-kick leapfrog / velocity Verlet (order 2, symplectic)
+	yoshida4  : Yoshida's composition of three leapfrogs (order 4, symplectic)
+	rk4       : classic Runge-Kutta (order 4, not symplectic)
+
+	Positions and velocities stored in float32 are updated with compensated (Kahan) sums, see Integrator.drift.
+
+	Between two steps the state is given by a cubic Hermite interpolant (Integrator.dense_output),
+	built from the positions and velocities at both ends: no force evaluation, whatever the integrator.
+'''
+
+
+class HermiteInterpolant:
+	def __init__(self, t0:float, positions0:np.ndarray, velocities0:np.ndarray,
+				 t1:float, positions1:np.ndarray, velocities1:np.ndarray) -> None:
+		'''
+		˗ˋˏ ♡ ˎˊ˗
+		- The state over one step [t0, t1]: positions are the cubic matching the positions and velocities
+			at both ends, velocities its derivative (error O(dt⁴) on the positions, O(dt³) on the velocities)
+		- The arrays are kept, not copied
+		'''
+		self.t0, self.t1 = t0, t1
+		self.positions0, self.velocities0 = positions0, velocities0
+		self.positions1, self.velocities1 = positions1, velocities1
+
+	def __call__(self, t:float) -> tuple:
+		'''
+		:param t: a time between t0 and t1
+		:return: (positions, velocities) at "t"
+		'''
+		h = self.t1 - self.t0
+		s = (t - self.t0) / h if h else 1.0
+		x0, v0, x1, v1 = self.positions0, self.velocities0 * h, self.positions1, self.velocities1 * h
+		s2, s3 = s * s, s * s * s
+		positions = (2 * s3 - 3 * s2 + 1) * x0 + (s3 - 2 * s2 + s) * v0 + (3 * s2 - 2 * s3) * x1 + (s3 - s2) * v1
+		if not h:
+			return positions, self.velocities1.copy()
+		velocities = ((6 * s2 - 6 * s) * (x0 - x1) + (3 * s2 - 4 * s + 1) * v0 + (3 * s2 - 2 * s) * v1) / h
+		return positions, velocities
+
+	def __str__(self) -> str:
+		return f"HermiteInterpolant([{self.t0}, {self.t1}])"
+
+
+class Integrator:
+	'''
+	˗ˋˏ ♡ ˎˊ˗
+	- Base class of every integrator
+	- "step" updates positions and velocities in place
+	- "reset" must be called when the state is modified from outside,
+		so that cached accelerations are thrown away
+	'''
+	name = None
+	order = 1
+	force_evaluations = 1 # per step
+
+	def __init__(self) -> None:
+		self.reset()
+
+	def reset(self) -> None:
+		self.compensation = {} # rounding errors of the float32 positions and velocities, see drift, they belong to the old state
+
+	def drift(self, positions, increment) -> None:
+		'''
+		- positions += increment, with a compensated (Kahan) sum when the positions are stored in float32:
+			the rounding error of every addition is kept and given back to the next one,
+			so a long run in float32 does not lose the small steps against the big positions
+		'''
+		if positions.dtype == np.float32:
+			self._compensated_add("positions", positions, increment)
+		else:
+			positions += increment
+
+	def kick(self, velocities, increment) -> None:
+		'''
+		- velocities += increment, compensated like drift
+		'''
+		if velocities.dtype == np.float32:
+			self._compensated_add("velocities", velocities, increment)
+		else:
+			velocities += increment
+
+	def _compensated_add(self, name:str, array, increment) -> None:
+		compensation = self.compensation.get(name)
+		if compensation is None or compensation.shape != array.shape:
+			compensation = np.zeros_like(array)
+		increment = increment - compensation
+		total = array + increment
+		self.compensation[name] = (total - array) - increment
+		array[...] = total
+
+	def dense_output(self, t0:float, positions0, velocities0, t1:float, positions1, velocities1) -> HermiteInterpolant:
+		'''
+		- The state between the start and the end of a step, from the states at both ends
+			(the same cubic for every integrator, so sampling between the steps costs no force evaluation)
+		'''
+		return HermiteInterpolant(t0, positions0, velocities0, t1, positions1, velocities1)
+
+	def step(self, positions, velocities, dt:float, acceleration) -> None:
+		'''
+		:param positions: the positions, updated in place
+		:param velocities: the velocities, updated in place
+		:param dt: the timestep (seconds)
+		:param acceleration: a function giving the accelerations at some positions
+		'''
+		raise NotImplementedError
+
+	def __str__(self) -> str:
+		return f"{type(self).__name__}(order {self.order})"
+
+
+class SymplecticEuler(Integrator):
+	'''
+	˗ˋˏ ♡ ˎˊ˗
+	- Velocities first, then positions: what Body.update_velocity + Body.move always did
+	'''
+	name = "euler"
+	order = 1
+
+	def step(self, positions, velocities, dt, acceleration) -> None:
+		self.kick(velocities, acceleration(positions) * dt)
+		self.drift(positions, velocities * dt)
+
+
+class Leapfrog(Integrator):
+	'''
+	˗ˋˏ ♡ ˎˊ˗
+	- Kick (half step) - drift (full step) - kick (half step), a.k.a. velocity Verlet
+	- The acceleration at the end of a step is the one at the start of the next one,
+		so it is kept and a step costs a single force evaluation
+	'''
+	name = "leapfrog"
+	order = 2
+
+	def reset(self) -> None:
+		super().reset()
+		self.cached_acceleration = None
+
+	def step(self, positions, velocities, dt, acceleration) -> None:
+		if self.cached_acceleration is None or self.cached_acceleration.shape != positions.shape:
+			self.cached_acceleration = acceleration(positions)
+		self.kick(velocities, self.cached_acceleration * (dt / 2))
+		self.drift(positions, velocities * dt)
+		self.cached_acceleration = acceleration(positions)
+		self.kick(velocities, self.cached_acceleration * (dt / 2))
+
+
+class Yoshida4(Leapfrog):
+	'''
+	˗ˋˏ ♡ ˎˊ˗
+	- Three leapfrog substeps of w1*dt, w0*dt, w1*dt (w0 is negative!)
+	- The errors of order 2 cancel out, which gives a symplectic 4th order scheme
+		for 3 force evaluations per step
+	'''
+	name = "yoshida4"
+	order = 4
+	force_evaluations = 3
+
+	w1 = 1 / (2 - 2 ** (1 / 3))
+	w0 = -(2 ** (1 / 3)) * w1
+
+	def step(self, positions, velocities, dt, acceleration) -> None:
+		for weight in (self.w1, self.w0, self.w1):
+			Leapfrog.step(self, positions, velocities, weight * dt, acceleration)
+
+
+class RK4(Integrator):
+	'''
+	˗ˋˏ ♡ ˎˊ˗
+	- The classic 4th order Runge-Kutta on (positions, velocities)
+	- Very accurate on short runs, but its energy error drifts (it is not symplectic)
+	'''
+	name = "rk4"
+	order = 4
+	force_evaluations = 4
+
+	def step(self, positions, velocities, dt, acceleration) -> None:
+		x0, v0 = positions.copy(), velocities.copy()
+
+		k1_x, k1_v = v0, acceleration(x0)
+		k2_x = v0 + k1_v * (dt / 2)
+		k2_v = acceleration(x0 + k1_x * (dt / 2))
+		k3_x = v0 + k2_v * (dt / 2)
+		k3_v = acceleration(x0 + k2_x * (dt / 2))
+		k4_x = v0 + k3_v * dt
+		k4_v = acceleration(x0 + k3_x * dt)
+
+		self.drift(positions, (k1_x + 2 * k2_x + 2 * k3_x + k4_x) * (dt / 6))
+		self.kick(velocities, (k1_v + 2 * k2_v + 2 * k3_v + k4_v) * (dt / 6))
+
+
+INTEGRATORS = {integrator.name: integrator for integrator in (SymplecticEuler, Leapfrog, Yoshida4, RK4)}
+INTEGRATORS["verlet"] = Leapfrog
+
+
+def get_integrator(integrator) -> Integrator:
+	'''
+	˗ˋˏ ♡ ˎˊ˗
+	- Return an integrator instance from its name (or give back the instance it is given)
+
+	:param integrator: a name of INTEGRATORS, or an Integrator
+	'''
+	if isinstance(integrator, Integrator):
+		return integrator
+	try:
+		return INTEGRATORS[integrator]()
+	except KeyError:
+		raise ValueError(f"Unknown integrator {integrator!r}, choose one of: {', '.join(INTEGRATORS)}") from None
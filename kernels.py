@@ -0,0 +1,116 @@
+import warnings
+import numpy as np
+from nbody import DirectSum
+from integrators import SymplecticEuler, Leapfrog, Yoshida4
+
+'''
+Description:
+	Optional compiled backend (numba), for the small-N / huge-step-count regime of a three-body run:
+	there NumPy spends more time creating temporaries than computing.
+
+	NumbaDirectSum is a force solver like nbody.DirectSum, plus a fused stepping loop:
+	for euler, leapfrog and yoshida4, the n steps of System.step run in one compiled call
+	(forces + kick + drift, the old gravitational_force + update_velocity + move), without a single allocation.
+	From PARALLEL_BODIES bodies on, the force loop runs in parallel over the bodies.
+
+	numba is optional: without it get_solver("numba") warns and gives back the NumPy solver.
+	It is only imported by the first NumbaDirectSum (the compiled loops are in numba_kernels.py),
+	so importing this module, or anything using it, stays fast for the runs that do not use it.
+
+	system = System(bodies, solver=kernels.get_solver("numba"))
+'''
+
+BACKENDS = ("numpy", "numba")
+PARALLEL_BODIES = 256 # below that, the threads cost more than they save
+
+
+def _kernels():
+	'''
+	- The compiled loops, numba imported the first time only
+	'''
+	import numba_kernels
+	return numba_kernels
+
+
+def has_numba() -> bool:
+	'''
+	- Whether the numba backend works here (numba is imported to know it: installed is not enough, it may be broken)
+	'''
+	try:
+		_kernels()
+	except ImportError:
+		return False
+	return True
+
+
+class NumbaDirectSum:
+	def __init__(self, parallel:bool=None) -> None:
+		'''
+		˗ˋˏ ♡ ˎˊ˗
+		- Same interface as nbody.DirectSum, compiled with numba
+
+		:param parallel: parallel force loop, None to decide from the number of bodies (see PARALLEL_BODIES)
+		'''
+		try:
+			_kernels()
+		except ImportError as error:
+			raise ImportError(f"NumbaDirectSum needs a working numba (pip install numba): {error}") from error
+		self.parallel = parallel
+		self._scratch = np.zeros((0, 3))
+
+	def _parallel(self, bodies:int) -> bool:
+		return bodies >= PARALLEL_BODIES if self.parallel is None else self.parallel
+
+	def accelerations(self, positions:np.ndarray, masses:np.ndarray, G:float, softening:float=0.0) -> np.ndarray:
+		if positions.ndim != 2:
+			raise ValueError("NumbaDirectSum works on one system (N, 3), use nbody.DirectSum for batches")
+		out = np.empty_like(positions, dtype=float)
+		_kernels().forces(np.ascontiguousarray(positions, dtype=float), np.ascontiguousarray(masses, dtype=float),
+				G, softening * softening, out, self._parallel(len(masses)))
+		return out
+
+	def fused_step(self, system, n:int, dt:float) -> bool:
+		'''
+		˗ˋˏ ♡ ˎˊ˗
+		- Called by System.step: make the "n" steps in one compiled call if the integrator is one of ours
+
+		:return: False if it could not (another integrator), System.step then does the steps itself
+		'''
+		integrator = system.integrator
+		positions, velocities, masses = system.positions, system.velocities, system.masses
+		parallel = self._parallel(len(masses))
+		softening2 = system.softening * system.softening
+		if type(integrator) is SymplecticEuler:
+			if self._scratch.shape != positions.shape:
+				self._scratch = np.zeros_like(positions)
+			_kernels().euler_steps(positions, velocities, masses, system.G, softening2, dt, n, self._scratch, parallel)
+			return True
+		if type(integrator) in (Leapfrog, Yoshida4):
+			weights = (1.0,) if type(integrator) is Leapfrog else (Yoshida4.w1, Yoshida4.w0, Yoshida4.w1)
+			if integrator.cached_acceleration is None or integrator.cached_acceleration.shape != positions.shape:
+				integrator.cached_acceleration = self.accelerations(positions, masses, system.G, system.softening)
+			_kernels().leapfrog_steps(positions, velocities, masses, system.G, softening2, dt, np.array(weights), n,
+							integrator.cached_acceleration, parallel)
+			return True
+		return False
+
+	def __str__(self) -> str:
+		return f"NumbaDirectSum(parallel = {self.parallel})"
+
+
+def get_solver(backend:str="numpy", parallel:bool=None):
+	'''
+	˗ˋˏ ♡ ˎˊ˗
+	- The direct summation solver of a backend, falling back to NumPy when numba is not installed (or does not import)
+
+	:param backend: "numpy" or "numba"
+	:param parallel: numba only, see NumbaDirectSum
+	'''
+	if backend not in BACKENDS:
+		raise ValueError(f"Unknown backend {backend!r}, choose one of: {', '.join(BACKENDS)}")
+	if backend == "numba":
+		try:
+			return NumbaDirectSum(parallel)
+		except ImportError as error:
+			warnings.warn(f"{error}, the NumPy backend is used instead", RuntimeWarning, stacklevel=2)
+	return DirectSum()
@@ -1,8 +1,18 @@
-import math
+import argparse
 import time
-import pygame
-from pygame.locals import *
+import numpy as np
 import raycasting as rc
+from nbody import Vector, Body, System
+from timestep import AdaptiveTimestep
+from monitor import ConservationMonitor
+from collisions import CollisionHandler
+from kernels import get_solver
+from recorder import TrailBuffer, Replay
+from physics_worker import PhysicsWorker
+from profiling import Profiler
+from prediction import Predictor
+from tracers import TestParticles
+import checkpoint
 
 '''
      ♡ ☆  .♡‧₊˚  ☆ .♡ ‧₊ ♡‧₊ ☆ .♡˚ 
@@ -21,6 +31,7 @@ Description:
 	It allows users to visualize the effects of gravity and orbital motion.
 	Users can manipulate the camera to explore the simulation
 	and observe how celestial bodies interact based on their mass, position, and velocity.
+	Importing it opens nothing: the window is created by main(), when it is run (python main.py).
 '''
 
 
@@ -28,185 +39,35 @@ Description:
 For future versions:
 ---> Adding a third body !!!! otherwise it's not a 3-body problem ╮( ˘ ､ ˘ )╭
 ---> Sizes of bodies adapted to their distance from the player's camera
----> Trajectories of bodies
----> Short predictions by AI
 '''
 
-# Initialization
-pygame.init()
-pygame.font.init()
-font1 = pygame.font.SysFont('Comic Sans MS', 30)
-pygame.mouse.set_visible(False)
-
-### setting mouse in the middle of the screen !!!
-screen_info = pygame.display.Info()
-screen_width, screen_height = screen_info.current_w, screen_info.current_h
-screen = pygame.display.set_mode((screen_width, screen_height), pygame.FULLSCREEN)
-pygame.mouse.set_pos(screen_width // 2, screen_height // 2)
-###
-
 screen_dims = (800, 600) # PAY ATTENTION : if you want to change it then do it in the two files
 
-screen = pygame.display.set_mode(screen_dims)
-
-axes = rc._3d_axis() # BUG (ᗒᗣᗕ)՞
+# Ends of the world axes (x, y then z), drawn as three long lines
+world_axis_ends = np.array([(-100,.1,.1), (100,.1,.1), (.1,-100,.1), (.1,100,.1), (.1,.1,-50), (.1,.1,50)])
 
 # Unities : second, meters, meters by seconds (づ￣ ³￣)づ
-simulation_speed = 50
+simulation_speed = 12_000 # simulated seconds per real second
+physics_rate = 240 # physics ticks per real second, whatever the frame rate (see physics_worker.py)
+refresh_rate = 60 # frames per second of the window
+integrator = "leapfrog" # see integrators.py : euler, leapfrog, yoshida4, rk4
+dt = 50 # longest step (seconds), the leapfrog stays accurate with large steps
+eta = 0.01 # steps get shorter when bodies pass close to each other, see timestep.py
+backend = "numpy" # "numba" compiles the force and stepping loops (if numba is installed), see kernels.py
+softening = 0 # meters, smooths the force when two bodies almost touch
+monitor_every = 500 # steps between two checks of the energy and momenta, see monitor.py
+drift_tolerance = 1e-6 # beyond this relative drift the steps get smaller (and a warning is printed)
+collisions = "merge" # when two bodies touch : "merge" into one, or "bounce", see collisions.py
 scale = 1/1_000_000 # to represent real distances of bodies to scale
+trail_length = 2000 # positions kept per body for the trajectories (a few orbits, drawn as polylines, see trails.py)
+trail_interval = 5_000 # simulated seconds between two positions of a trajectory
+prediction_horizon = 0 # simulated seconds drawn ahead of the bodies (2_500_000 is about a lunar month), 0 for no prediction
+prediction_dt = 500 # step of the prediction, coarser than the real one (see prediction.py)
+tracers = 0 # massless debris orbiting the Earth (20_000 makes a nice ring), they feel the bodies but pull on nothing (see tracers.py)
+replay_file = None # a ".traj" file written by simulate.py, to watch a recorded run instead of simulating it (←/→ to jump)
 G = 6.67430e-11
 
 
-class Stopwatch:
-	def __init__(self) -> None:
-		'''
-		˗ˋˏ ♡ ˎˊ˗
-		- Stopwatch is used to measure time between one moment and another
-		- To use it, call "start" before the first moment then call stop after the second moment
-		- The unity "yearno" is 1/(2*10E6) second(s), it is used to measure fast computation time
-		- To desactive the print display, just give the "stop()" function a Boolean value "False"
-
-		 ∧,,,∧   ~ ┏━━━━━━━━━━━━━━━━━━━━━━━━┓
-		( ̳• · • ̳)  ~ ♡  You're purrfect   ♡
-		/       づ ~┗━━━━━━━━━━━━━━━━━━━━━━━━┛
-		'''
-	def start(self) -> None:
-		self.time_at_start = time.perf_counter()
-
-	def stop(self, debbug = True) -> None:
-		num = time.perf_counter()-self.time_at_start
-		scale_time = -int(math.floor(math.log10(abs(num)))) + 1
-		yearno = num/2E-06
-		if debbug:
-			print("Time passed:", round(num, scale_time), "second(s), or", round(yearno, 3), "yearno")
-
-
-# Initializing the stopwatch
-stopwatch = Stopwatch()
-
-
-class Vector:
-	def __init__(self, ijk:tuple) -> None:
-		'''
-		˗ˋˏ ♡ ˎˊ˗
-		- As it says, this class is made to create a vector object,
-			which will speed up the calculations, because numpy is slower... (´∩｀。)
-		
-		:param ijk: the components of the vector
-
-		(づ￣ ³￣)づ	i
-		(づ￣ ³￣)づ	j
-		(づ￣ ³￣)づ	k
-		'''
-		self.i = ijk[0]
-		self.j = ijk[1]
-		self.k = ijk[2]
-
-	def __add__(self, other): # other, is another vector
-		return Vector((self.i+other.i, self.j+other.j, self.k+other.k))
-	
-	def __mul__(self, scalar):
-		return Vector((self.i * scalar, self.j * scalar, self.k * scalar))
-		
-	def __str__(self) -> str: # ===> called when print is used on the object
-		return f"Vector({self.i}, {self.j}, {self.k})"
-
-class Body:
-	def __init__(self, mass:float, R:float, position:tuple, velocity_vector = Vector((0, 0, 0))) -> None:
-		'''
-		˗ˋˏ ♡ ˎˊ˗
-
-		:param mass: the mass of the body
-		:param R: the body radius
-		:param position: the original position of the body
-		:param velocity_vector: the original speed vector of the body
-
-		(๑˃̵ᴗ˂̵)و it will flyyyyyyy
-		'''
-		self.mass = mass
-		self.R = R
-		self.x = position[0]
-		self.y = position[1]
-		self.z = position[2]
-		self.velocity_vector = velocity_vector
-
-	def move(self) -> None:
-		'''
-		˗ˋˏ ♡ ˎˊ˗
-		- Add velocity_vector of the object to his own position
-		'''
-		self.x += self.velocity_vector.i
-		self.y += self.velocity_vector.j
-		self.z += self.velocity_vector.k
-
-	def gravitational_force(self, other) -> Vector:
-		'''
-		˗ˋˏ ♡ ˎˊ˗
-		- Computes the gravitational force between 2 objects
-		- This part was very complicated (눈_눈)
-		
-		Drop a thought and it will faaall DOOOOOoOooooown...
-		'''
-		distance_ = distance(self, other)
-		if distance_ == 0:
-			return Vector((0, 0, 0)) # Avoid division by zero
-		
-		# Calculating the magnitude (intensity) of the gravitational force between each object
-		force_magnitude = G * self.mass * other.mass / (distance_ ** 2) # Newton's law of universal gravitation
-		
-		# Calculate the relative position of "self" with respect to "other"
-		relative_position = (self.x - other.x, self.y - other.y, self.z - other.z)
-		
-		# Calculate the Euclidean distance to normalize the relative position vector
-		magnitude = -(relative_position[0]**2 + relative_position[1]**2 + relative_position[2]**2) ** 0.5
-		
-		# Calculate the components of the force in each direction using the normalized vector
-		force_x = (relative_position[0] / magnitude) * force_magnitude
-		force_y = (relative_position[1] / magnitude) * force_magnitude
-		force_z = (relative_position[2] / magnitude) * force_magnitude
-
-		# Return a vector representing the gravitational force in three dimensions
-		return Vector((force_x, force_y, force_z))
-	
-	
-	def update_velocity(self, force: Vector):
-		'''
-		˗ˋˏ ♡ ˎˊ˗
-		- Use gravitational force to get the acceleration of the object and then update the velocity
-		- Formula is F = m * a
-		'''
-		acceleration = force * (1/self.mass)  # a = F/m
-		self.velocity_vector = self.velocity_vector + acceleration
-
-
-	def __str__(self) -> str:
-		return (
-			f"Body(\n"
-			f"  mass = {self.mass},\n"
-			f"  R = {self.R},\n"
-			f"  position = ({self.x}, {self.y}, {self.z}),\n"
-			f"  velocity_vector = {self.velocity_vector}\n"
-			f")"
-		)
-
-
-'''
-     /|、♡
-    (` - 7
-     |、⁻〵
-     じしˍ,)/
-'''
-
-def distance(body_a:Body, body_b:Body) -> float:
-	'''
-    ˗ˋˏ ♡ ˎˊ˗
-	- Return the distance between two 3d points
-	:param body_a: the first body
-	:param body_b: the second one
-	'''
-	# (눈_눈) Bruh : This formula computes the "Euclidean distance" between two points in 3D space. (눈_눈)
-	return ((body_a.x-body_b.x)**2 + (body_a.y-body_b.y)**2 + (body_a.z-body_b.z)**2)**0.5
-
 ''' εїз
 		A bug is flying in my room
 		Looping again in the rain of my toughts		εїз
@@ -217,180 +78,313 @@ def distance(body_a:Body, body_b:Body) -> float:
 										- Me
 '''
 
-# Initializing two body : Earth and Moon; The data for the bodies are taken from the Internet
-Earth = Body(5.972e24, 6_371_000, (0, 0, 0), Vector((0, 0, 0)))
-Moon = Body(7.342e22, 1_737_000, (0, 384_400_000, 0), Vector((1023, 0, 0)))
-
-# Initializing player's camera
-player = rc.Camera((17.7, -87, 76), (0, 2.3))
-
-# # Dictionary to store the state of keys for player control
-keys = {"z":False, # move forward
-		"s":False, # move backward
-		"q":False, # move left
-		"d":False, # move right
-		" ":False, # move upward
-		"sh ":False} # move downward
-
-# trajectory = [] # TODO
-
-time_ = 0
-running = 1
-while running:
-	stopwatch.start()
-	time_+=1
-	for evenement in pygame.event.get():
-		if evenement.type == QUIT or (evenement.type == KEYDOWN and (evenement.key == K_ESCAPE)):
-			running = False
-		if evenement.type == KEYDOWN: 
-			if evenement.key == pygame.K_z:
-				keys["z"] = True
-			if evenement.key == pygame.K_s:
-				keys["s"] = True
-			if evenement.key == pygame.K_q:
-				keys["q"] = True
-			if evenement.key == pygame.K_d:
-				keys["d"] = True
-			if evenement.key == pygame.K_SPACE:
-				keys[" "] = True
-			if evenement.key == pygame.K_LSHIFT:
-				keys["sh "] = True
-		if evenement.type == KEYUP:
-			if evenement.key == pygame.K_z:
-				keys["z"] = False
-			if evenement.key == pygame.K_s:
-				keys["s"] = False
-			if evenement.key == pygame.K_q:
-				keys["q"] = False
-			if evenement.key == pygame.K_d:
-				keys["d"] = False
-			if evenement.key == pygame.K_SPACE:
-				keys[" "] = False
-			if evenement.key == pygame.K_LSHIFT:
-				keys["sh "] = False
-
-	if keys["z"]: # move forward
-		player.move((0, 0.1, 0))
-	elif keys["s"]: # move backward
-		player.move((0, -0.1, 0))
-	elif keys["q"]: # move left
-		player.move((-0.1, 0, 0))
-	elif keys["d"]: # move right
-		player.move((0.1, 0, 0))
-	elif keys[" "] and not keys["sh "]: # move upward
-		player.move((0, 0, 0.1))
-	elif keys[" "] and keys["sh "]: # move downward
-		player.move((0, 0, -0.1))
-
-	# Get the current position of the mouse cursor (⌐■_■)
-	mouse_pos = pygame.mouse.get_pos()
-
-	# Calculate the pointer's position relative to the center of the screen
-	pointer_pos = (mouse_pos[0]-screen_dims[0]/2, mouse_pos[1]-screen_dims[1]/2)
-
-	# Check if the pointer is not centered (i.e., if it's moved from the center)
-	if pointer_pos[0] or pointer_pos[1]:
-		# Set the mouse position back to the center of the screen
-		pygame.mouse.set_pos(screen_dims[0] // 2 - pointer_pos[0]/2, screen_dims[1] // 2 - pointer_pos[1]/2)
-		# Move the player based on the pointer's position, adjusting the rotation
-		sensibility = 0.001 # sensitivity of the movement
-		player.move(rotation2=(-pointer_pos[0]*sensibility, -pointer_pos[1]*sensibility))
-	
-
-	screen.fill((255,255,255))
-
-	
-	# Calculate the position of the Earth in the player's view using raycasting
-	body1_pos = rc.raycast_transform(player, (Earth.x*scale, Earth.y*scale, Earth.z*scale)) # BUG: bad raycasting, see the raycasting file
-	if body1_pos:
-		# If the position is visible by the player, draw the Earth as a circle on the screen
-		pygame.draw.circle(screen, (0,0,0), body1_pos, Earth.R*scale)
-	
-	# Calculate the position of the Moon in the player's view using raycasting
-	body2_pos = rc.raycast_transform(player, (Moon.x*scale, Moon.y*scale, Moon.z*scale)) # BUG: bad raycasting, see the raycasting file (눈_눈)
-	if body2_pos:
-		# TODO: ( -_･) ︻デ═一 ▸ Calculate the adjusted radius for the Moon based on its distance from the player
-		# radius = scale*rc.adjusted_radius(Moon.R, (Moon.x*scale, Moon.y*scale, Moon.z*scale), player)
-		# print(radius, rc.adjusted_radius(Moon.R, (Moon.x*scale, Moon.y*scale, Moon.z*scale), player))
-		
-		# If the position is visible by the player, draw the Moon as a circle on the screen
-		pygame.draw.circle(screen, (0,0,0), body2_pos, Moon.R*scale)
-
-	# Render 3D axes based on the player's orientation (pitch (radian) and yaw (radian))
-	axes_x_y_z = axes.render(player.pitch, 0, player.yaw) # BUG: bad raycasting, see the raycasting file (눈_눈)
-	pygame.draw.line(screen, (255, 0, 0), (screen_dims[0]/2, screen_dims[1]/2), axes_x_y_z[0]) # Draw the X-axis in red
-	pygame.draw.line(screen, (0, 255, 0), (screen_dims[0]/2, screen_dims[1]/2), axes_x_y_z[1]) # Draw the Y-axis in green
-	pygame.draw.line(screen, (0, 0, 255), (screen_dims[0]/2, screen_dims[1]/2), axes_x_y_z[2]) # Draw the Z-axis in blue
-	
-
-	# Calculate the positions of endpoints of another 3d-axis using raycasting
-	x_axis_a = rc.raycast_transform(player, (-100,.1,.1))
-	x_axis_b = rc.raycast_transform(player, (100,.1,.1))
-	if x_axis_a and x_axis_b:
-		pygame.draw.line(screen, (255, 100,100), x_axis_a, x_axis_b)
-
-	y_axis_a = rc.raycast_transform(player, (.1,-100,.1))
-	y_axis_b = rc.raycast_transform(player, (.1,100,.1))
-	if y_axis_a and y_axis_b:
-		pygame.draw.line(screen, (100, 255,100), y_axis_a, y_axis_b)
-
-	z_axis_a = rc.raycast_transform(player, (.1,.1,-50))
-	z_axis_b = rc.raycast_transform(player, (.1,.1,50))
-	if z_axis_a and z_axis_b:
-		pygame.draw.line(screen, (100, 100,255), z_axis_a, z_axis_b)
-	
 
+def build_parser() -> argparse.ArgumentParser:
+	parser = argparse.ArgumentParser(description="Interactive 3-body simulation.")
+	parser.add_argument("--profile", action="store_true", help="show the timings of every phase of the frame on screen")
+	parser.add_argument("--profile-output", default=None, help="write the timings to this JSON file when the window closes")
+	parser.add_argument("--checkpoint", default=None, help="save the simulation (bodies, time, camera) to this file regularly and when the window closes")
+	parser.add_argument("--checkpoint-every", type=float, default=60, help="real seconds between two checkpoints")
+	parser.add_argument("--resume", default=None, help="start from a checkpoint instead of the Earth and the Moon (its bodies, time, integrator, timestep, solver and camera; the monitor and the tracers start again)")
+	parser.add_argument("--telemetry", type=int, default=None, metavar="PORT", help="serve live snapshots of the simulation on this local port (see telemetry.py)")
+	return parser
+
+
+def make_system(args) -> tuple:
 	'''
-	TODO: ( -_･) ︻デ═一 ▸ trajectory
-	for i in trajectory:
-		pos = rc.raycast_transform(player, (i[0]+player.x, i[1]+player.y, i[2]+player.z))
-		if pos:
-			pygame.draw.circle(screen, (0,255,0), pos, 1)'''
-
-	# Run the simulation for a number of iterations based on the simulation speed (つ▀¯▀)つ
-	for _ in range(simulation_speed):
-		# Calculate the gravitational force exerted on the Moon by the Earth
-		force_on_moon = Moon.gravitational_force(Earth)
-
-		# Calculate the gravitational force exerted on the Earth by the Moon
-		force_on_earth = Earth.gravitational_force(Moon)
-		
-		# Update the Moon's velocity based on the calculated gravitational force
-		Moon.update_velocity(force_on_moon)
-
-		# Update the Earth's velocity based on the calculated gravitational force
-		Earth.update_velocity(force_on_earth)
-
-		# Move the Moon to its new position based on the updated velocity
-		Moon.move()
-
-		# Move the Earth to its new position based on the updated velocity
-		Earth.move()
-
-	# Every 70 time steps, render text to display the player's yaw and pitch
-	if time_%70==0:
-		# Create a text surface displaying the player's yaw, rounded to 2 decimal places
-		text=font1.render(f"yaw: {round(player.yaw, 2)}", True, (0,0,0))
-		rect = text.get_rect()
-		rect.center=(screen_dims[0]-100, 25)
-		screen.blit(text, rect)
-
-		# Create a text surface displaying the player's pitch, rounded to 2 decimal places
-		text2=font1.render(f"pitch: {round(player.pitch, 2)}", True, (0,0,0))
-		rect2 = text2.get_rect()
-		rect2.center=(screen_dims[0]-100, 50)
-		screen.blit(text2, rect2)
-
-		# Update the display
-		pygame.display.flip()
+	˗ˋˏ ♡ ˎˊ˗
+	- The System to show: the Earth and the Moon, the one of a checkpoint, or the bodies of a recorded run
 
+	:return: (system, camera state of the checkpoint or None, Replay or None)
 	'''
-	TODO: ( -_･) ︻デ═一 ▸ trajectory
-	if time_%1000==0:
-		if body2_pos:
-			trajectory.append((Moon.x, Moon.y, Moon.z))
-		if len(trajectory)>20:
-			trajectory.pop(0)'''
-	
-	stopwatch.stop()
-pygame.quit()
+	camera_state = None
+	if args.resume:
+		# Carrying on a saved run : the bodies come from the checkpoint (see checkpoint.py)
+		system, camera_state = checkpoint.load(args.resume)
+	else:
+		# Initializing two body : Earth and Moon; The data for the bodies are taken from the Internet
+		Earth = Body(5.972e24, 6_371_000, (0, 0, 0), Vector((0, 0, 0)))
+		Moon = Body(7.342e22, 1_737_000, (0, 384_400_000, 0), Vector((1023, 0, 0)))
+
+		# Every body lives in the arrays of one System, add as many as you want (⌐■_■)
+		system = System([Earth, Moon], G=G, softening=softening, integrator=integrator, dt=dt,
+						timestep=AdaptiveTimestep("encounter", eta=eta, dt_max=dt), solver=get_solver(backend))
+
+	# Energy and momenta are watched, the steps shrink if they drift (the bigger dt the better, as long as it stays right)
+	system.monitor = ConservationMonitor(monitor_every, drift_tolerance, action="shrink")
+	system.collisions = CollisionHandler(collisions)
+	if tracers:
+		system.tracers = TestParticles.ring(system, 0, tracers, 120_000_000, 350_000_000, thickness=2_000_000, seed=0)
+
+	# Watching a recorded run : the bodies come from the file, their positions too
+	replay = None
+	if replay_file:
+		replay = Replay(replay_file)
+		system = System([Body(mass, R, (0, 0, 0)) for mass, R in zip(replay.masses, replay.radii)], G=G)
+		system.time = replay.start_time
+	return system, camera_state, replay
+
+
+def main(argv=None) -> None:
+	# pygame and what draws with it are only imported here: importing this file opens no window and loads no pygame
+	import pygame
+	from trails import TrailRenderer, draw_points
+
+	# Command line options
+	args = build_parser().parse_args(argv)
+
+	# Timings of every phase of the frame, (almost) free when disabled
+	profiler = Profiler(enabled=args.profile or bool(args.profile_output))
+	system, camera_state, replay = make_system(args)
+
+	# Initialization
+	pygame.init()
+	pygame.font.init()
+	font1 = pygame.font.SysFont('Comic Sans MS', 30)
+	pygame.mouse.set_visible(False)
+	screen = pygame.display.set_mode(screen_dims)
+	pygame.mouse.set_pos(screen_dims[0] // 2, screen_dims[1] // 2) # the mouse starts in the middle of the window
+
+	axes = rc._3d_axis() # BUG (ᗒᗣᗕ)՞
+
+	# The last positions of every body, drawn as trajectories
+	trails = TrailBuffer(trail_length, len(system), trail_interval)
+	trail_renderer = TrailRenderer(color=(0,255,0), background=(255,255,255))
+	ghost_renderer = TrailRenderer(color=(170,170,255), background=(255,255,255), fade=1.0) # the predicted paths
+
+	# Initializing player's camera
+	player = rc.Camera((17.7, -87, 76), (0, 2.3))
+	if camera_state:
+		player = rc.Camera(*camera_state)
+
+	# # Dictionary to store the state of keys for player control
+	keys = {"z":False, # move forward
+			"s":False, # move backward
+			"q":False, # move left
+			"d":False, # move right
+			" ":False, # move upward
+			"sh ":False} # move downward
+
+	# The physics runs in its own thread at a fixed rate, the window only draws what it publishes
+	worker = None
+	telemetry = None
+	predictor = None
+	if not replay:
+		if args.telemetry is not None:
+			from telemetry import TelemetryServer # asyncio, for this option only
+			telemetry = TelemetryServer(port=args.telemetry).start()
+		worker = PhysicsWorker(system, simulation_speed, physics_rate, profiler=profiler, telemetry=telemetry)
+		worker.start()
+		if prediction_horizon:
+			# The path ahead, integrated in another thread from the snapshots of the worker
+			predictor = Predictor(system, worker.latest, prediction_horizon, prediction_dt).start()
+	clock = pygame.time.Clock()
+	overlay = [] # text surfaces of the profiler overlay
+	font2 = pygame.font.SysFont('Comic Sans MS', 14)
+	last_checkpoint = time.perf_counter()
+
+	# Static layer, drawn again only when the camera moves, and the rectangles drawn over it in the last frame
+	background = pygame.Surface(screen_dims).convert()
+	background_view = None
+	dirty = []
+	drift_text = (None, None)
+
+	time_ = 0
+	running = 1
+	while running:
+		frame_start = time.perf_counter()
+		profiler.lap()
+		time_+=1
+		for evenement in pygame.event.get():
+			if evenement.type == pygame.QUIT or (evenement.type == pygame.KEYDOWN and (evenement.key == pygame.K_ESCAPE)):
+				running = False
+			if evenement.type == pygame.KEYDOWN: 
+				if evenement.key == pygame.K_z:
+					keys["z"] = True
+				if evenement.key == pygame.K_s:
+					keys["s"] = True
+				if evenement.key == pygame.K_q:
+					keys["q"] = True
+				if evenement.key == pygame.K_d:
+					keys["d"] = True
+				if evenement.key == pygame.K_SPACE:
+					keys[" "] = True
+				if evenement.key == pygame.K_LSHIFT:
+					keys["sh "] = True
+				if replay and evenement.key in (pygame.K_LEFT, pygame.K_RIGHT):
+					# Jump a twentieth of the recorded run backward or forward
+					jump = (replay.end_time - replay.start_time) / 20
+					system.time += jump if evenement.key == pygame.K_RIGHT else -jump
+					trails.clear()
+			if evenement.type == pygame.KEYUP:
+				if evenement.key == pygame.K_z:
+					keys["z"] = False
+				if evenement.key == pygame.K_s:
+					keys["s"] = False
+				if evenement.key == pygame.K_q:
+					keys["q"] = False
+				if evenement.key == pygame.K_d:
+					keys["d"] = False
+				if evenement.key == pygame.K_SPACE:
+					keys[" "] = False
+				if evenement.key == pygame.K_LSHIFT:
+					keys["sh "] = False
+
+		if keys["z"]: # move forward
+			player.move((0, 0.1, 0))
+		elif keys["s"]: # move backward
+			player.move((0, -0.1, 0))
+		elif keys["q"]: # move left
+			player.move((-0.1, 0, 0))
+		elif keys["d"]: # move right
+			player.move((0.1, 0, 0))
+		elif keys[" "] and not keys["sh "]: # move upward
+			player.move((0, 0, 0.1))
+		elif keys[" "] and keys["sh "]: # move downward
+			player.move((0, 0, -0.1))
+
+		# Get the current position of the mouse cursor (⌐■_■)
+		mouse_pos = pygame.mouse.get_pos()
+
+		# Calculate the pointer's position relative to the center of the screen
+		pointer_pos = (mouse_pos[0]-screen_dims[0]/2, mouse_pos[1]-screen_dims[1]/2)
+
+		# Check if the pointer is not centered (i.e., if it's moved from the center)
+		if pointer_pos[0] or pointer_pos[1]:
+			# Set the mouse position back to the center of the screen
+			pygame.mouse.set_pos(screen_dims[0] // 2 - pointer_pos[0]/2, screen_dims[1] // 2 - pointer_pos[1]/2)
+			# Move the player based on the pointer's position, adjusting the rotation
+			sensibility = 0.001 # sensitivity of the movement
+			player.move(rotation2=(-pointer_pos[0]*sensibility, -pointer_pos[1]*sensibility))
+		profiler.lap("events")
+
+		# The state to draw (つ▀¯▀)つ : interpolated between the two last physics ticks, or read from the recorded run
+		if replay:
+			system.time = min(max(system.time + simulation_speed*clock.get_time()/1000, replay.start_time), replay.end_time)
+			sim_time = system.time
+			positions, velocities = replay.state_at(sim_time)
+		else:
+			sim_time, positions, velocities = worker.interpolated()
+		if trails.positions.shape[1] != len(positions): # two bodies merged, see collisions.py
+			trails = TrailBuffer(trail_length, len(positions), trail_interval)
+		trails.append(sim_time, positions)
+		profiler.lap("state")
+
+		# The static layer (background, axes, yaw/pitch) only changes with the camera: drawn again only then
+		view = (player.x, player.y, player.z, player.yaw, player.pitch)
+		full_redraw = view != background_view
+		if full_redraw:
+			axes_x_y_z = axes.render(player.pitch, 0, player.yaw) # BUG: bad raycasting, see the raycasting file (눈_눈)
+			axis_pos, axis_visible = rc.project(player, world_axis_ends)
+		bodies_pos, bodies_visible = rc.project(player, positions*scale) # BUG: bad raycasting, see the raycasting file (눈_눈)
+		profiler.lap("projection")
+
+		if full_redraw:
+			background.fill((255,255,255))
+
+			# Render 3D axes based on the player's orientation (pitch (radian) and yaw (radian))
+			pygame.draw.line(background, (255, 0, 0), (screen_dims[0]/2, screen_dims[1]/2), axes_x_y_z[0]) # Draw the X-axis in red
+			pygame.draw.line(background, (0, 255, 0), (screen_dims[0]/2, screen_dims[1]/2), axes_x_y_z[1]) # Draw the Y-axis in green
+			pygame.draw.line(background, (0, 0, 255), (screen_dims[0]/2, screen_dims[1]/2), axes_x_y_z[2]) # Draw the Z-axis in blue
+
+			# Draw another 3d-axis between the projected endpoints
+			for a, b, color in ((0, 1, (255, 100,100)), (2, 3, (100, 255,100)), (4, 5, (100, 100,255))):
+				if axis_visible[a] and axis_visible[b]:
+					pygame.draw.line(background, color, axis_pos[a], axis_pos[b])
+
+			# Render text to display the player's yaw and pitch
+			# Create a text surface displaying the player's yaw, rounded to 2 decimal places
+			text=font1.render(f"yaw: {round(player.yaw, 2)}", True, (0,0,0))
+			rect = text.get_rect()
+			rect.center=(screen_dims[0]-100, 25)
+			background.blit(text, rect)
+
+			# Create a text surface displaying the player's pitch, rounded to 2 decimal places
+			text2=font1.render(f"pitch: {round(player.pitch, 2)}", True, (0,0,0))
+			rect2 = text2.get_rect()
+			rect2.center=(screen_dims[0]-100, 50)
+			background.blit(text2, rect2)
+
+			screen.blit(background, (0, 0))
+			background_view = view
+		else:
+			# Only wipe what moved since the last frame
+			for rect in dirty:
+				screen.blit(background, rect, rect)
+
+		# Everything below moves: the rectangles drawn are kept, for the display update and the next wipe
+		drawn = []
+
+		# Trajectories of the bodies ( -_･) ︻デ═一 ▸ one projection for all of them, a few lines per body
+		trail_rects = trail_renderer.draw(screen, player, trails, scale, screen_dims)
+		if trail_rects:
+			drawn.append(trail_rects[0].unionall(trail_rects[1:])) # one rectangle, the pieces overlap a lot
+
+		# The tracers, a cloud of single pixels
+		if worker and tracers:
+			tracer_rect = draw_points(screen, player, worker.tracers(), scale, (150,150,150), screen_dims)
+			if tracer_rect:
+				drawn.append(tracer_rect)
+
+		# Where the bodies are going ┈➤ the last path the predictor published, fading with the time ahead
+		if predictor:
+			ghost_rects = ghost_renderer.draw(screen, player, predictor, scale, screen_dims)
+			if ghost_rects:
+				drawn.append(ghost_rects[0].unionall(ghost_rects[1:]))
+
+		# Draw every body visible in the player's view
+		for body_pos, visible, R in zip(bodies_pos.tolist(), bodies_visible, system.radii):
+			if visible:
+				# TODO: ( -_･) ︻デ═一 ▸ Calculate the adjusted radius for the body based on its distance from the player
+				# radius = scale*rc.adjusted_radius(R, body_position*scale, player)
+
+				# If the position is visible by the player, draw the body as a circle on the screen
+				drawn.append(pygame.draw.circle(screen, (0,0,0), body_pos, R*scale))
+
+		# Drift of the energy since the last reference, see monitor.py (rendered again only when it changes)
+		if system.monitor:
+			drift = f"energy drift: {system.monitor.drift['energy']:.1e}"
+			if drift != drift_text[0]:
+				drift_text = (drift, font2.render(drift, True, (120,120,120)))
+			drawn.append(screen.blit(drift_text[1], (10, screen_dims[1]-25)))
+
+		# Profiler overlay, its text is rendered again twice a second only
+		if args.profile:
+			if time_%(refresh_rate//2)==0:
+				overlay = [font2.render(line, True, (120,120,120)) for line in profiler.overlay_lines()]
+			for i, line in enumerate(overlay):
+				drawn.append(screen.blit(line, (10, 10 + 16*i)))
+		profiler.lap("drawing")
+
+		# Update the display, every frame : the physics does not wait for it anymore
+		# (only the rectangles that changed, unless the camera moved)
+		if full_redraw:
+			pygame.display.flip()
+		else:
+			pygame.display.update(dirty + drawn)
+		dirty = drawn
+		profiler.lap("flip")
+		profiler.record("frame", time.perf_counter() - frame_start) # the work of the frame, without the wait of clock.tick
+
+		# Save the run from time to time (the worker waits a moment, the file is written atomically)
+		if args.checkpoint and worker and frame_start - last_checkpoint >= args.checkpoint_every:
+			with worker.lock:
+				checkpoint.save(args.checkpoint, system, player)
+			last_checkpoint = frame_start
+
+		clock.tick(refresh_rate)
+	if predictor:
+		predictor.stop()
+	if worker:
+		worker.stop()
+		if args.checkpoint:
+			checkpoint.save(args.checkpoint, system, player)
+	if telemetry:
+		telemetry.stop()
+	if args.profile_output:
+		profiler.dump(args.profile_output)
+	pygame.quit()
+
+
+if __name__ == "__main__":
+	main()
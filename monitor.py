@@ -0,0 +1,172 @@
+import sys
+import warnings
+import numpy as np
+import nbody
+from nbody import kinetic_energy, potential_energy
+
+'''
+Description:
+	Watches the quantities the exact dynamics conserves, to know when a timestep is too big.
+
+	energy           : kinetic + potential, its relative drift |E - E0| / |E0|
+	momentum         : Σ m v, its drift compared to Σ m |v|
+	angular momentum : Σ m r × v, its drift compared to Σ m |r| |v|
+
+	The potential energy comes from the force pass itself: before a check the monitor asks the solver
+	(nbody.DirectSum) to keep the potentials of its evaluations, and with the leapfrog family
+	the last evaluation of a step is at the final positions, so nothing is computed twice.
+	Other integrators and solvers fall back to a separate potential_energy.
+
+	system.monitor = ConservationMonitor(every=100, tolerance=1e-6, action="shrink")
+'''
+
+
+class DriftWarning(RuntimeWarning):
+	pass
+
+
+ACTIONS = ("warn", "shrink", "raise")
+
+
+def _outside_stacklevel() -> int:
+	'''
+	- The stacklevel for a warnings.warn of the caller: the first frame out of monitor.py and nbody.py,
+		the code calling System.advance rather than the monitor itself
+	'''
+	frame, level = sys._getframe(1), 1 # the function calling warnings.warn is level 1
+	while frame is not None and frame.f_code.co_filename in (__file__, nbody.__file__):
+		frame, level = frame.f_back, level + 1
+	return level
+
+
+def momenta(positions:np.ndarray, velocities:np.ndarray, masses:np.ndarray) -> tuple:
+	'''
+	:return: (linear momentum (3,), angular momentum (3,)) of the bodies about the origin
+	'''
+	momentum = masses[:, np.newaxis] * velocities
+	return momentum.sum(axis=0), np.cross(positions, momentum).sum(axis=0)
+
+
+class ConservationMonitor:
+	def __init__(self, every:int=100, tolerance:float=1e-6, action:str="warn", shrink:float=0.5) -> None:
+		'''
+		˗ˋˏ ♡ ˎˊ˗
+		- Checks the conserved quantities every "every" steps of System.advance,
+			and reacts when one of them drifted more than "tolerance"
+
+		:param every: steps between two checks
+		:param tolerance: largest accepted relative drift
+		:param action: "warn" (a DriftWarning), "shrink" (a warning, and smaller steps from now on)
+			or "raise" (a DriftWarning raised as an exception); the warning is given once per reference,
+			until reset (a body added or moved by hand)
+		:param shrink: factor applied to the step size (or to eta / the tolerance of an adaptive timestep)
+		'''
+		if action not in ACTIONS:
+			raise ValueError(f"Unknown action {action!r}, choose one of {', '.join(ACTIONS)}")
+		self.every = every
+		self.tolerance = tolerance
+		self.action = action
+		self.shrink = shrink
+		self.checks = 0
+		self.adjustments = 0
+		self.worst = {"energy": 0.0, "momentum": 0.0, "angular_momentum": 0.0}
+		self.reset()
+
+	def reset(self) -> None:
+		'''
+		- Forget the reference values, the next check takes new ones (after a body was added or moved by hand)
+		'''
+		self.reference = None
+		self.drift = {"energy": 0.0, "momentum": 0.0, "angular_momentum": 0.0}
+		self._countdown = 1
+		self._warned = False
+
+	def steps_before_check(self) -> int:
+		'''
+		- Steps left until the next check, the last one included (System.advance batches the ones before it)
+		'''
+		return self._countdown
+
+	def after_step(self, system, steps:int=1) -> None:
+		'''
+		- Called by System.advance after every step, or every batch of "steps" steps
+		'''
+		self._countdown -= steps
+		if self._countdown <= 0:
+			self._countdown = self.every
+			self.check(system)
+		system.solver.track_potential = self._countdown == 1 # the next step keeps its potentials for the check
+
+	def measure(self, system) -> tuple:
+		'''
+		˗ˋˏ ♡ ˎˊ˗
+		- Energy, momentum and angular momentum of the system, with the scales the drifts are compared to
+
+		:return: (energy, momentum (3,), angular momentum (3,), momentum scale, angular momentum scale)
+		'''
+		positions, velocities, masses = system.positions, system.velocities, system.masses
+		solver = system.solver
+		kept = getattr(solver, "potential_positions", None)
+		if kept is not None and kept.shape == positions.shape and np.array_equal(kept, positions):
+			potential = 0.5 * float(masses @ solver.potential)
+		else:
+			potential = float(potential_energy(positions, masses, system.G, system.softening))
+		energy = float(kinetic_energy(velocities, masses)) + potential
+
+		momentum, angular_momentum = momenta(positions, velocities, masses)
+		speeds = np.sqrt((velocities * velocities).sum(axis=-1))
+		distances = np.sqrt((positions * positions).sum(axis=-1))
+		return energy, momentum, angular_momentum, float(masses @ speeds), float(masses @ (distances * speeds))
+
+	def check(self, system) -> dict:
+		'''
+		˗ˋˏ ♡ ˎˊ˗
+		- Compare the system to the reference values and react if it drifted too much
+
+		:return: the relative drifts
+		'''
+		energy, momentum, angular_momentum, momentum_scale, angular_scale = self.measure(system)
+		self.checks += 1
+		if self.reference is None:
+			self.reference = (energy, momentum, angular_momentum)
+			return self.drift
+		energy0, momentum0, angular_momentum0 = self.reference
+
+		self.drift = {
+			"energy": abs(energy - energy0) / abs(energy0) if energy0 else abs(energy),
+			"momentum": float(np.linalg.norm(momentum - momentum0)) / momentum_scale if momentum_scale else 0.0,
+			"angular_momentum": float(np.linalg.norm(angular_momentum - angular_momentum0)) / angular_scale if angular_scale else 0.0,
+		}
+		for name, drift in self.drift.items():
+			self.worst[name] = max(self.worst[name], drift)
+
+		drifted = [name for name, drift in self.drift.items() if drift > self.tolerance]
+		if drifted:
+			self._react(system, drifted)
+		return self.drift
+
+	def _react(self, system, drifted:list) -> None:
+		message = ", ".join(f"{name} drifted by {self.drift[name]:.2e}" for name in drifted) + f" at t = {system.time:g} s"
+		if self.action == "raise":
+			raise DriftWarning(message)
+		if self.action == "shrink":
+			timestep = system.timestep
+			if timestep is None:
+				system.dt *= self.shrink
+				message += f", dt is now {system.dt:g}"
+			elif timestep.method == "encounter":
+				timestep.eta *= self.shrink
+				message += f", eta is now {timestep.eta:g}"
+			else:
+				timestep.tolerance *= self.shrink ** (system.integrator.order + 1)
+				message += f", the tolerance is now {timestep.tolerance:g}"
+			self.adjustments += 1
+			# The drift so far cannot be undone, only the new one counts from here
+			self.reference = None
+			self._countdown = 1
+		if not self._warned:
+			self._warned = True
+			warnings.warn(message, DriftWarning, stacklevel=_outside_stacklevel())
+
+	def __str__(self) -> str:
+		return ", ".join(f"{name} {drift:.2e}" for name, drift in self.drift.items())
@@ -0,0 +1,546 @@
+import numpy as np
+from integrators import get_integrator
+
+'''
+Description:
+	Structure-of-arrays N-body engine.
+	All masses, radii, positions and velocities of a System live in contiguous NumPy arrays,
+	and every pairwise acceleration is computed in one batched call, whatever the number of bodies.
+	Body and Vector are kept as small views over that state, so the old Earth/Moon setups still work.
+'''
+
+# Unities : second, meters, meters by seconds (づ￣ ³￣)づ
+G = 6.67430e-11
+
+
+def pairwise_accelerations(positions:np.ndarray, masses:np.ndarray, G:float=G, softening:float=0.0, potential:bool=False) -> np.ndarray:
+	'''
+	˗ˋˏ ♡ ˎˊ˗
+	- Computes the acceleration of every body due to every other body, all at once
+	- Works on any leading batch dimensions: positions (..., N, 3), masses (..., N) or (N,)
+	- Coincident bodies (distance 0) exert no force on each other, like the old gravitational_force
+
+	:param positions: the positions of the bodies
+	:param masses: the masses of the bodies
+	:param G: the gravitational constant
+	:param softening: Plummer softening length, 0 for pure Newtonian gravity
+	:param potential: also return the potential -G Σ mj / rij of every body, from the same distances
+	:return: the accelerations, same shape as positions (and the potentials, shape (..., N))
+	'''
+	# separation[..., i, j] = r_j - r_i
+	separation = positions[..., np.newaxis, :, :] - positions[..., :, np.newaxis, :]
+	distance2 = (separation * separation).sum(axis=-1)
+	if softening:
+		distance2 += softening * softening
+	distance2[distance2 == 0] = np.inf # Avoid division by zero (self-interaction included)
+	distance = np.sqrt(distance2)
+	weight = masses[..., np.newaxis, :] / (distance2 * distance)
+	# sum over j of weight[i, j] * separation[i, j], as one matrix product per body
+	accelerations = G * np.matmul(weight[..., np.newaxis, :], separation)[..., 0, :]
+	if not potential:
+		return accelerations
+	return accelerations, -G * (masses[..., np.newaxis, :] / distance).sum(axis=-1)
+
+
+def kinetic_energy(velocities:np.ndarray, masses:np.ndarray) -> np.ndarray:
+	'''
+	- Sum of m v² / 2, over the bodies (works on batches like pairwise_accelerations)
+	'''
+	return 0.5 * (masses * (velocities * velocities).sum(axis=-1)).sum(axis=-1)
+
+
+def potential_energy(positions:np.ndarray, masses:np.ndarray, G:float=G, softening:float=0.0) -> np.ndarray:
+	'''
+	- Sum of -G mi mj / rij, over every pair of bodies (works on batches like pairwise_accelerations)
+	'''
+	n = positions.shape[-2]
+	i, j = np.triu_indices(n, 1)
+	separation = positions[..., j, :] - positions[..., i, :]
+	distance = np.sqrt((separation * separation).sum(axis=-1) + softening * softening)
+	masses = np.broadcast_to(masses, positions.shape[:-1])
+	return -G * (masses[..., i] * masses[..., j] / distance).sum(axis=-1)
+
+
+class DirectSum:
+	'''
+	˗ˋˏ ♡ ˎˊ˗
+	- The force solver of a System: every pair of bodies, exactly, in O(N²)
+	- Any object with the same "accelerations" method can replace it (see barneshut.py)
+	- With track_potential, every evaluation also keeps the potential of every body
+		(and the positions it belongs to), for monitor.ConservationMonitor
+	'''
+	track_potential = False
+	potential = None
+	potential_positions = None
+
+	def accelerations(self, positions:np.ndarray, masses:np.ndarray, G:float, softening:float=0.0) -> np.ndarray:
+		if not self.track_potential:
+			return pairwise_accelerations(positions, masses, G, softening)
+		accelerations, self.potential = pairwise_accelerations(positions, masses, G, softening, potential=True)
+		self.potential_positions = positions.copy()
+		return accelerations
+
+	def __str__(self) -> str:
+		return "DirectSum()"
+
+
+class Vector:
+	def __init__(self, ijk:tuple) -> None:
+		'''
+		˗ˋˏ ♡ ˎˊ˗
+		- As it says, this class is made to create a vector object
+		- The components are stored in a small NumPy array, which can be a view on a row of a System
+			(Body.position, Body.velocity_vector): writing through it tells the System (System.changed)
+
+		:param ijk: the components of the vector
+
+		(づ￣ ³￣)づ	i
+		(づ￣ ³￣)づ	j
+		(づ￣ ³￣)づ	k
+		'''
+		self._data = np.array(ijk, dtype=float)
+		self._changed = None
+
+	@classmethod
+	def view(cls, row:np.ndarray, changed=None):
+		'''
+		- Build a Vector sharing its memory with "row" (no copy)
+		- "changed" is called after every write through the vector
+		'''
+		vector = cls.__new__(cls)
+		vector._data = row
+		vector._changed = changed
+		return vector
+
+	def _written(self) -> None:
+		if self._changed is not None:
+			self._changed()
+
+	@property
+	def i(self) -> float:
+		return self._data[0]
+
+	@i.setter
+	def i(self, value:float) -> None:
+		self._data[0] = value
+		self._written()
+
+	@property
+	def j(self) -> float:
+		return self._data[1]
+
+	@j.setter
+	def j(self, value:float) -> None:
+		self._data[1] = value
+		self._written()
+
+	@property
+	def k(self) -> float:
+		return self._data[2]
+
+	@k.setter
+	def k(self, value:float) -> None:
+		self._data[2] = value
+		self._written()
+
+	def __add__(self, other): # other, is another vector
+		return Vector(self._data + other._data)
+
+	def __mul__(self, scalar):
+		return Vector(self._data * scalar)
+
+	def __getitem__(self, index):
+		return self._data[index]
+
+	def __setitem__(self, index, value) -> None:
+		self._data[index] = value
+		self._written()
+
+	def __iter__(self):
+		return iter(self._data.tolist())
+
+	def __array__(self, dtype=None, copy=None):
+		return np.asarray(self._data, dtype=dtype)
+
+	def __str__(self) -> str: # ===> called when print is used on the object
+		return f"Vector({self.i}, {self.j}, {self.k})"
+
+
+class Body:
+	def __init__(self, mass:float, R:float, position:tuple, velocity_vector = Vector((0, 0, 0))) -> None:
+		'''
+		˗ˋˏ ♡ ˎˊ˗
+		- A body is a view on one row of a System
+		- A body created on its own gets its own little one-body System,
+			and moves into the arrays of another System when it is added to it
+
+		:param mass: the mass of the body
+		:param R: the body radius
+		:param position: the original position of the body
+		:param velocity_vector: the original speed vector of the body
+
+		(๑˃̵ᴗ˂̵)و it will flyyyyyyy
+		'''
+		self._system = None
+		self._index = 0
+		System().add(self, mass, R, position, tuple(velocity_vector))
+
+	# --- views on the arrays of the system ---
+
+	@property
+	def system(self):
+		return self._system
+
+	@property
+	def mass(self) -> float:
+		return self._system.masses[self._index]
+
+	@mass.setter
+	def mass(self, value:float) -> None:
+		self._system.masses[self._index] = value
+		self._system.changed()
+
+	@property
+	def R(self) -> float:
+		return self._system.radii[self._index]
+
+	@R.setter
+	def R(self, value:float) -> None:
+		self._system.radii[self._index] = value
+
+	@property
+	def position(self) -> Vector:
+		return Vector.view(self._system.positions[self._index], self._system.changed)
+
+	@position.setter
+	def position(self, value:tuple) -> None:
+		self._system.positions[self._index] = value
+		self._system.changed()
+
+	@property
+	def x(self) -> float:
+		return self._system.positions[self._index, 0]
+
+	@x.setter
+	def x(self, value:float) -> None:
+		self._system.positions[self._index, 0] = value
+		self._system.changed()
+
+	@property
+	def y(self) -> float:
+		return self._system.positions[self._index, 1]
+
+	@y.setter
+	def y(self, value:float) -> None:
+		self._system.positions[self._index, 1] = value
+		self._system.changed()
+
+	@property
+	def z(self) -> float:
+		return self._system.positions[self._index, 2]
+
+	@z.setter
+	def z(self, value:float) -> None:
+		self._system.positions[self._index, 2] = value
+		self._system.changed()
+
+	@property
+	def velocity_vector(self) -> Vector:
+		return Vector.view(self._system.velocities[self._index], self._system.changed)
+
+	@velocity_vector.setter
+	def velocity_vector(self, value:Vector) -> None:
+		self._system.velocities[self._index] = tuple(value)
+		self._system.changed()
+
+	# --- the old per-object API, still handy for one-off computations ---
+
+	def move(self, dt:float=1.0) -> None:
+		'''
+		˗ˋˏ ♡ ˎˊ˗
+		- Add velocity_vector of the object (times dt) to his own position
+		'''
+		self._system.positions[self._index] += self._system.velocities[self._index] * dt
+		self._system.changed()
+
+	def gravitational_force(self, other) -> Vector:
+		'''
+		˗ˋˏ ♡ ˎˊ˗
+		- Computes the gravitational force exerted on self by other
+		- For many bodies, prefer System.accelerations which does everything in one go
+
+		Drop a thought and it will faaall DOOOOOoOooooown...
+		'''
+		relative_position = np.subtract(other.position, self.position)
+		distance_ = float(np.sqrt(relative_position @ relative_position))
+		if distance_ == 0:
+			return Vector((0, 0, 0)) # Avoid division by zero
+
+		# Newton's law of universal gravitation, pointing from self towards other
+		force_magnitude = self._system.G * self.mass * other.mass / (distance_ ** 2)
+		return Vector(relative_position / distance_ * force_magnitude)
+
+	def update_velocity(self, force:Vector, dt:float=1.0) -> None:
+		'''
+		˗ˋˏ ♡ ˎˊ˗
+		- Use gravitational force to get the acceleration of the object and then update the velocity
+		- Formula is F = m * a
+		'''
+		self._system.velocities[self._index] += np.asarray(force) * (dt / self.mass) # a = F/m
+		self._system.changed()
+
+	def __str__(self) -> str:
+		return (
+			f"Body(\n"
+			f"  mass = {self.mass},\n"
+			f"  R = {self.R},\n"
+			f"  position = ({self.x}, {self.y}, {self.z}),\n"
+			f"  velocity_vector = {self.velocity_vector}\n"
+			f")"
+		)
+
+
+class System:
+	def __init__(self, bodies:tuple=(), G:float=G, softening:float=0.0, integrator="euler", dt:float=1.0, timestep=None, solver=None, monitor=None, collisions=None, tracers=None, events=None) -> None:
+		'''
+		˗ˋˏ ♡ ˎˊ˗
+		- Holds the whole state of the simulation as contiguous arrays:
+			masses (N,), radii (N,), positions (N, 3), velocities (N, 3)
+		- Row "i" of every array belongs to self.bodies[i]
+
+		:param bodies: the bodies to put in the system (they become views on it)
+		:param G: the gravitational constant
+		:param softening: Plummer softening length used by the force computation
+		:param integrator: the name of the integrator (see integrators.INTEGRATORS) or an Integrator
+		:param dt: the default timestep (seconds)
+		:param timestep: an adaptive controller (see timestep.AdaptiveTimestep) used by advance, None for fixed steps of dt
+		:param solver: the force solver, DirectSum by default (see barneshut.BarnesHut for large N)
+		:param monitor: checks energy and momenta after the steps of advance (see monitor.ConservationMonitor)
+		:param collisions: looks for touching bodies after the steps of advance (see collisions.CollisionHandler)
+		:param tracers: massless test particles moved with the bodies (see tracers.TestParticles)
+		:param events: looks for close approaches, escapes, plane crossings... inside the steps of advance (see events.EventLocator)
+		'''
+		self.G = G
+		self.softening = softening
+		self.integrator = integrator
+		self.dt = dt
+		self.timestep = timestep
+		self.solver = DirectSum() if solver is None else solver
+		self.monitor = None
+		self.collisions = collisions
+		self._tracers = tracers
+		self.events = events
+		self.dense = False # keep the state at the start of the last step of advance, see interpolant
+		self.previous = None # (time, positions, velocities) at the start of the last step of advance
+		self.time = 0.0
+		self.steps = 0 # taken by advance, see telemetry.py
+		self.revision = 0 # counts the changes made from outside the integration, see prediction.py
+		self.masses = np.zeros(0)
+		self.radii = np.zeros(0)
+		self.positions = np.zeros((0, 3))
+		self.velocities = np.zeros((0, 3))
+		self.bodies = []
+		for body in bodies:
+			self.add(body)
+		self.monitor = monitor
+
+	def add(self, body:Body, mass:float=None, R:float=None, position:tuple=None, velocity:tuple=None) -> Body:
+		'''
+		- Append a body to the system; its current values are copied into the arrays
+		- The optional values override the ones of the body (used by Body.__init__)
+		'''
+		if body._system is not None:
+			mass = body.mass if mass is None else mass
+			R = body.R if R is None else R
+			position = np.array(body.position) if position is None else position
+			velocity = body.velocity_vector._data.copy() if velocity is None else velocity
+			body._system._detach(body)
+
+		self.masses = np.append(self.masses, mass)
+		self.radii = np.append(self.radii, R)
+		self.positions = np.vstack((self.positions, np.asarray(position, dtype=float).reshape(1, 3)))
+		self.velocities = np.vstack((self.velocities, np.asarray(velocity, dtype=float).reshape(1, 3)))
+		body._system = self
+		body._index = len(self.bodies)
+		self.bodies.append(body)
+		self.changed()
+		return body
+
+	def remove(self, body:Body) -> Body:
+		'''
+		- Take a body out of the system, it keeps its values in a one-body System of its own (like a new Body)
+		'''
+		if body._system is not self:
+			raise ValueError(f"{body} is not in this system")
+		System(G=self.G).add(body)
+		return body
+
+	def _detach(self, body:Body) -> None:
+		'''
+		- Forget a body without touching the others' rows order
+		'''
+		keep = np.arange(len(self.bodies)) != body._index
+		self.masses = self.masses[keep]
+		self.radii = self.radii[keep]
+		self.positions = self.positions[keep]
+		self.velocities = self.velocities[keep]
+		self.bodies.pop(body._index)
+		for index, other in enumerate(self.bodies):
+			other._index = index
+		body._system = None
+		self.changed()
+
+	@property
+	def integrator(self):
+		return self._integrator
+
+	@integrator.setter
+	def integrator(self, integrator) -> None:
+		self._integrator = get_integrator(integrator)
+
+	@property
+	def tracers(self):
+		return self._tracers
+
+	@tracers.setter
+	def tracers(self, tracers) -> None:
+		self._tracers = tracers
+		self.changed() # the steps are not made by the same integrator anymore
+
+	def changed(self) -> None:
+		'''
+		- Called whenever the state is modified from outside the integration loop
+		'''
+		self.revision += 1
+		self.previous = None
+		self._integrator.reset()
+		if self.monitor:
+			self.monitor.reset()
+
+	def accelerations(self, positions:np.ndarray=None) -> np.ndarray:
+		'''
+		˗ˋˏ ♡ ˎˊ˗
+		- Acceleration of every body, computed by the force solver in one batched call
+
+		:param positions: positions to evaluate at (default: the current ones)
+		'''
+		if positions is None:
+			positions = self.positions
+		return self.solver.accelerations(positions, self.masses, self.G, self.softening)
+
+	def step(self, n:int=1, dt:float=None) -> None:
+		'''
+		˗ˋˏ ♡ ˎˊ˗
+		- Advance the whole system by "n" steps of "dt" seconds (default: self.dt)
+		- The scheme is the one of self.integrator
+		- A solver with a "fused_step" (kernels.NumbaDirectSum) may do the n steps in one compiled call
+		- With tracers, the bodies and the tracers make their steps together (see tracers.TestParticles.step)
+		'''
+		dt = self.dt if dt is None else dt
+		fused_step = getattr(self.solver, "fused_step", None)
+		if self.tracers:
+			self.tracers.step(self, n, dt)
+			self._integrator.reset() # it did not make these steps, its cached accelerations are old
+		elif fused_step is None or not fused_step(self, n, dt):
+			positions, velocities = self.positions, self.velocities
+			for _ in range(n):
+				self._integrator.step(positions, velocities, dt, self.accelerations)
+		self.time += n * dt
+
+	def advance(self, duration:float) -> int:
+		'''
+		˗ˋˏ ♡ ˎˊ˗
+		- Advance the system by exactly "duration" seconds
+		- Steps are chosen by self.timestep if there is one, otherwise they are self.dt long;
+			the last step is shortened to land right on time
+
+		:return: the number of steps taken
+		'''
+		return self.advance_to(self.time + duration)
+
+	def advance_to(self, end:float, land:bool=True) -> int:
+		'''
+		- Same as advance, up to the simulated time "end": the same "end" always gives the same steps,
+			which is what makes a run resumed from a checkpoint identical to the one it continues
+		- With land=False the steps are never shortened: the system stops at the end of the step
+			that goes past "end", and the state at "end" is given by self.interpolant()
+		'''
+		steps = 0
+		keep = self.dense or self.events
+		while end - self.time > 1e-12 * max(abs(end), 1.0):
+			remaining = end - self.time if land else np.inf
+			if keep:
+				previous = (self.time, self.positions.copy(), self.velocities.copy())
+			n = 1
+			if self.timestep is None:
+				n = self._whole_steps(end - self.time)
+				self.step(n, min(self.dt, remaining))
+			else:
+				self.timestep.step(self, remaining)
+			steps += n
+			self.steps += n
+			if keep:
+				self.previous = previous
+			if self.events:
+				self.events.after_step(self)
+			if self.collisions:
+				self.collisions.after_step(self)
+			if self.monitor:
+				self.monitor.after_step(self, n)
+		if land and steps:
+			self.time = end # landed within rounding of "end": exactly on it, so a run resumed from here starts on the same time
+		return steps
+
+	def _whole_steps(self, remaining:float) -> int:
+		'''
+		- How many fixed steps of dt advance_to makes in one call of step (one compiled loop with kernels.NumbaDirectSum):
+			one at a time with dense output, events or collisions, which look at every step,
+			and never past the step of the next check of the monitor
+		'''
+		if self.dense or self.events or self.collisions or remaining < 2 * self.dt:
+			return 1
+		n = int(remaining // self.dt)
+		if self.monitor:
+			n = min(n, max(self.monitor.steps_before_check() - 1, 1)) # the checked step is made alone, see monitor.py
+		return n
+
+	def interpolant(self):
+		'''
+		˗ˋˏ ♡ ˎˊ˗
+		- The state anywhere inside the last step of advance, without any force evaluation
+			(self.dense or self.events must be set for the start of the step to be kept)
+
+		:return: an integrators.HermiteInterpolant, called with a time it gives (positions, velocities),
+			valid until the next step; None when there is no last step or the bodies changed since
+		'''
+		if self.previous is None or self.previous[1].shape != self.positions.shape:
+			return None
+		t0, positions0, velocities0 = self.previous
+		return self._integrator.dense_output(t0, positions0, velocities0, self.time, self.positions, self.velocities)
+
+	def __len__(self) -> int:
+		return len(self.bodies)
+
+	def __iter__(self):
+		return iter(self.bodies)
+
+	def __str__(self) -> str:
+		return f"System({len(self)} bodies, time = {self.time} s)"
+
+
+'''
+     /|、♡
+    (` - 7
+     |、⁻〵
+     じしˍ,)/
+'''
+
+def distance(body_a:Body, body_b:Body) -> float:
+	'''
+    ˗ˋˏ ♡ ˎˊ˗
+	- Return the distance between two 3d points
+	:param body_a: the first body
+	:param body_b: the second one
+	'''
+	# (눈_눈) Bruh : This formula computes the "Euclidean distance" between two points in 3D space. (눈_눈)
+	return ((body_a.x-body_b.x)**2 + (body_a.y-body_b.y)**2 + (body_a.z-body_b.z)**2)**0.5
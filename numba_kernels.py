@@ -0,0 +1,96 @@
+import numpy as np
+import numba
+
+'''
+Description:
+	The compiled loops of kernels.NumbaDirectSum, in a module of their own:
+	numba takes a good part of a second to import, and only the runs asking for the numba backend pay for it
+	(kernels.py imports this module the first time a NumbaDirectSum is created).
+'''
+
+
+@numba.njit(cache=True)
+def accelerations(positions, masses, G, softening2, out):
+	'''
+	- Every pair once (i < j), both bodies updated: half the work of the parallel version
+	'''
+	n = len(masses)
+	out[:] = 0.0
+	for i in range(n):
+		for j in range(i + 1, n):
+			dx = positions[j, 0] - positions[i, 0]
+			dy = positions[j, 1] - positions[i, 1]
+			dz = positions[j, 2] - positions[i, 2]
+			distance2 = dx * dx + dy * dy + dz * dz + softening2
+			if distance2 == 0.0:
+				continue # coincident bodies, no force (like pairwise_accelerations)
+			inverse3 = G / (distance2 * np.sqrt(distance2))
+			out[i, 0] += masses[j] * inverse3 * dx
+			out[i, 1] += masses[j] * inverse3 * dy
+			out[i, 2] += masses[j] * inverse3 * dz
+			out[j, 0] -= masses[i] * inverse3 * dx
+			out[j, 1] -= masses[i] * inverse3 * dy
+			out[j, 2] -= masses[i] * inverse3 * dz
+
+
+@numba.njit(cache=True, parallel=True)
+def accelerations_parallel(positions, masses, G, softening2, out):
+	'''
+	- One body per thread, every other body summed: no two threads write the same row
+	'''
+	n = len(masses)
+	for i in numba.prange(n):
+		ax = ay = az = 0.0
+		for j in range(n):
+			dx = positions[j, 0] - positions[i, 0]
+			dy = positions[j, 1] - positions[i, 1]
+			dz = positions[j, 2] - positions[i, 2]
+			distance2 = dx * dx + dy * dy + dz * dz + softening2
+			if j == i or distance2 == 0.0:
+				continue
+			inverse3 = masses[j] / (distance2 * np.sqrt(distance2))
+			ax += inverse3 * dx
+			ay += inverse3 * dy
+			az += inverse3 * dz
+		out[i, 0] = G * ax
+		out[i, 1] = G * ay
+		out[i, 2] = G * az
+
+
+@numba.njit(cache=True)
+def forces(positions, masses, G, softening2, out, parallel):
+	if parallel:
+		accelerations_parallel(positions, masses, G, softening2, out)
+	else:
+		accelerations(positions, masses, G, softening2, out)
+
+
+@numba.njit(cache=True)
+def euler_steps(positions, velocities, masses, G, softening2, dt, steps, acceleration, parallel):
+	n = len(masses)
+	for _ in range(steps):
+		forces(positions, masses, G, softening2, acceleration, parallel)
+		for i in range(n):
+			for k in range(3):
+				velocities[i, k] += acceleration[i, k] * dt
+				positions[i, k] += velocities[i, k] * dt
+
+
+@numba.njit(cache=True)
+def leapfrog_steps(positions, velocities, masses, G, softening2, dt, weights, steps, acceleration, parallel):
+	'''
+	- "acceleration" holds the acceleration at the current positions, and still does at the end
+	- weights (1.0,) is the leapfrog, (w1, w0, w1) Yoshida's composition
+	'''
+	n = len(masses)
+	for _ in range(steps):
+		for weight in weights:
+			h = weight * dt
+			for i in range(n):
+				for k in range(3):
+					velocities[i, k] += acceleration[i, k] * (h / 2)
+					positions[i, k] += velocities[i, k] * h
+			forces(positions, masses, G, softening2, acceleration, parallel)
+			for i in range(n):
+				for k in range(3):
+					velocities[i, k] += acceleration[i, k] * (h / 2)
@@ -0,0 +1,168 @@
+import threading
+import time
+import numpy as np
+from profiling import Profiler
+from integrators import HermiteInterpolant
+
+'''
+Description:
+	The physics in its own thread, at a fixed rate, whatever the renderer is doing.
+
+	Every tick the worker advances the System by the same amount of simulated time,
+	then publishes a snapshot of the state. The renderer never touches the System while it moves:
+	it reads the two latest snapshots and draws the state interpolated between them
+	(the cubic through their positions and velocities, see integrators.HermiteInterpolant),
+	at the refresh rate of the display.
+	A slow frame never stalls the integration, and a heavy integration never freezes the window.
+'''
+
+
+class Snapshot:
+	def __init__(self, bodies:int) -> None:
+		'''
+		˗ˋˏ ♡ ˎˊ˗
+		- The state of the System at one tick
+
+		:param bodies: number of bodies
+		'''
+		self.time = 0.0 # simulated time
+		self.wall_time = 0.0 # time.perf_counter() when it was taken
+		self.positions = np.zeros((bodies, 3))
+		self.velocities = np.zeros((bodies, 3))
+		self.tracers = np.zeros((0, 3)) # positions of the test particles, see tracers.py
+
+	def fill(self, system, wall_time:float) -> None:
+		if self.positions.shape != system.positions.shape:
+			self.positions = np.empty_like(system.positions)
+			self.velocities = np.empty_like(system.velocities)
+		self.time = system.time
+		self.wall_time = wall_time
+		self.positions[...] = system.positions
+		self.velocities[...] = system.velocities
+		if system.tracers:
+			if self.tracers.shape != system.tracers.positions.shape:
+				self.tracers = np.empty_like(system.tracers.positions)
+			self.tracers[...] = system.tracers.positions
+
+
+class PhysicsWorker(threading.Thread):
+	def __init__(self, system, speed:float, tick_rate:float=240.0, max_catch_up:int=5, profiler:Profiler=None, telemetry=None) -> None:
+		'''
+		˗ˋˏ ♡ ˎˊ˗
+		- A thread advancing "system" by speed / tick_rate simulated seconds, tick_rate times per second
+
+		:param system: the System to integrate (only touch it inside "with worker.lock:")
+		:param speed: simulated seconds per real second
+		:param tick_rate: physics ticks per real second
+		:param max_catch_up: ticks run back-to-back at most when late, then the worker lets time slip
+		:param profiler: times every tick under the "physics" phase and counts the "steps"
+		:param telemetry: a telemetry.TelemetryServer, given the System after every tick (it keeps its own rate)
+		'''
+		super().__init__(name="physics", daemon=True)
+		self.system = system
+		self.speed = speed
+		self.tick_rate = tick_rate
+		self.max_catch_up = max_catch_up
+		self.lock = threading.Lock() # held while the System moves
+		self._snapshot_lock = threading.Lock() # held while the snapshots are swapped or read
+		self._running = threading.Event()
+		self._running.set()
+		self._stopped = threading.Event()
+		self.ticks = 0
+		self.steps = 0
+		self.profiler = Profiler(enabled=False) if profiler is None else profiler
+		self.telemetry = telemetry
+
+		# Double buffer: "current" and "previous" are read by the renderer, "spare" is written by the worker
+		now = time.perf_counter()
+		self._previous, self._current, self._spare = (Snapshot(len(system)) for _ in range(3))
+		self._previous.fill(system, now)
+		self._current.fill(system, now)
+
+	@property
+	def tick(self) -> float:
+		return 1 / self.tick_rate
+
+	def run(self) -> None:
+		next_tick = time.perf_counter()
+		while not self._stopped.is_set():
+			if not self._running.wait(timeout=0.1):
+				next_tick = time.perf_counter()
+				continue
+
+			late = 0
+			while time.perf_counter() >= next_tick and late < self.max_catch_up:
+				with self.lock, self.profiler.phase("physics"):
+					steps = self.system.advance(self.speed * self.tick)
+					self._spare.fill(self.system, next_tick + self.tick)
+					if self.telemetry:
+						self.telemetry.publish(self.system)
+				self.steps += steps
+				self.profiler.count("steps", steps)
+				self._publish()
+				self.ticks += 1
+				next_tick += self.tick
+				late += 1
+			if late == self.max_catch_up:
+				next_tick = time.perf_counter() # too slow for real time, drop the backlog
+			time.sleep(max(0.0, next_tick - time.perf_counter()))
+
+	def _publish(self) -> None:
+		with self._snapshot_lock:
+			self._previous, self._current, self._spare = self._current, self._spare, self._previous
+
+	def snapshots(self) -> tuple:
+		'''
+		- Copies of the two latest snapshots (previous, current), safe to use anywhere
+		'''
+		with self._snapshot_lock:
+			previous, current = self._previous, self._current
+			return (previous.time, previous.wall_time, previous.positions.copy(), previous.velocities.copy()), \
+				(current.time, current.wall_time, current.positions.copy(), current.velocities.copy())
+
+	def latest(self) -> tuple:
+		'''
+		- (simulated time, positions, velocities) of the latest snapshot, copies (see prediction.Predictor)
+		'''
+		with self._snapshot_lock:
+			current = self._current
+			return current.time, current.positions.copy(), current.velocities.copy()
+
+	def tracers(self) -> np.ndarray:
+		'''
+		- A copy of the tracers positions of the latest snapshot (not interpolated, they are only points)
+		'''
+		with self._snapshot_lock:
+			return self._current.tracers.copy()
+
+	def interpolated(self, now:float=None) -> tuple:
+		'''
+		˗ˋˏ ♡ ˎˊ˗
+		- The state to draw at wall time "now": one tick in the past, so that it always lies
+			between the two latest snapshots and the motion is smooth
+
+		:return: (simulated time, positions, velocities)
+		'''
+		now = time.perf_counter() if now is None else now
+		(time_a, wall_a, positions_a, velocities_a), (time_b, wall_b, positions_b, velocities_b) = self.snapshots()
+		if wall_b <= wall_a or positions_a.shape != positions_b.shape or not self._running.is_set():
+			return time_b, positions_b, velocities_b
+		alpha = min(max((now - self.tick - wall_a) / (wall_b - wall_a), 0.0), 1.0)
+		time_ = time_a + alpha * (time_b - time_a)
+		return (time_, *HermiteInterpolant(time_a, positions_a, velocities_a, time_b, positions_b, velocities_b)(time_))
+
+	def pause(self) -> None:
+		self._running.clear()
+
+	def resume(self) -> None:
+		self._running.set()
+
+	@property
+	def paused(self) -> bool:
+		return not self._running.is_set()
+
+	def stop(self, timeout:float=1.0) -> None:
+		self._stopped.set()
+		self._running.set()
+		if self.is_alive():
+			self.join(timeout)
@@ -0,0 +1,138 @@
+import threading
+import time
+import numpy as np
+from nbody import Vector, Body, System
+
+'''
+Description:
+	Lookahead: where the bodies are going, drawn ahead of them as ghost trails.
+
+	A Predictor thread integrates a copy of the state ahead of the real run, over "horizon" simulated seconds,
+	with a cheaper integrator (bigger fixed steps, no adaptive timestep, no monitor).
+	The predicted path is kept and only extended as the real run moves on: the samples left behind are dropped,
+	and new ones are integrated at the far end. It is thrown away and started again from the real state only when
+	the real run left it (further than "tolerance" from where it was predicted to be) or when a body changed
+	(added, removed, moved by hand, merged: System.revision).
+
+	It never takes the lock of the physics worker: it reads the snapshots the worker publishes for the renderer,
+	and the renderer reads the latest path the predictor published, never one being built.
+
+	predictor = Predictor(system, worker.latest, horizon=2.5e6, dt=500).start()
+	trail_renderer.draw(screen, camera, predictor, scale)      (a Predictor can be drawn like a TrailBuffer)
+'''
+
+
+class Predictor(threading.Thread):
+	def __init__(self, system, source, horizon:float, dt:float, integrator:str="leapfrog", every:int=5,
+				 tolerance:float=1e-3, batch:int=200, period:float=0.1) -> None:
+		'''
+		˗ˋˏ ♡ ˎˊ˗
+		- A thread predicting the path of the bodies of "system", "horizon" simulated seconds ahead
+
+		:param system: the real System (only its masses, radii and revision are read, never its state)
+		:param source: a function giving the real state (time, positions, velocities), like PhysicsWorker.latest
+		:param horizon: simulated seconds predicted ahead of the real time
+		:param dt: the step of the prediction, coarser than the one of the real run
+		:param integrator: the integrator of the prediction
+		:param every: steps between two samples of the path
+		:param tolerance: largest accepted distance between the real and the predicted positions,
+			relative to the size of the system, before the prediction starts again
+		:param batch: steps at most between two publications of the path (the path grows by pieces)
+		:param period: real seconds between two checks once the path reaches the horizon
+		'''
+		super().__init__(name="prediction", daemon=True)
+		self.system = system
+		self.source = source
+		self.horizon = horizon
+		self.dt = dt
+		self.integrator = integrator
+		self.every = every
+		self.tolerance = tolerance
+		self.batch = batch
+		self.period = period
+		self.restarts = 0
+		self._ghost = None # the System integrated ahead
+		self._revision = None
+		self._times = []
+		self._positions = []
+		self._path = (np.zeros(0), np.zeros((0, len(system), 3))) # the latest published path
+		self._stopped = threading.Event()
+
+	def start(self):
+		super().start()
+		return self
+
+	def run(self) -> None:
+		while not self._stopped.is_set():
+			time_, positions, velocities = self.source()
+			if self._ghost is None or self._revision != self.system.revision or self._diverged(time_, positions):
+				self._restart(time_, positions, velocities)
+			else:
+				# the samples the real run left behind (the one just before it stays, the path starts with the bodies)
+				first = max(int(np.searchsorted(self._times, time_)) - 1, 0)
+				del self._times[:first], self._positions[:first]
+			done = self._extend(time_ + self.horizon)
+			self._path = (np.array(self._times), np.array(self._positions))
+			time.sleep(self.period if done else 0.0)
+
+	def _restart(self, time_:float, positions:np.ndarray, velocities:np.ndarray) -> None:
+		'''
+		- Throw the path away, and start a new one from the real state
+		'''
+		self._revision = self.system.revision
+		masses, radii = self.system.masses, self.system.radii
+		if len(masses) != len(positions):
+			self._ghost, self._times, self._positions = None, [], [] # the snapshots are not there yet
+			return
+		self._ghost = System([Body(mass, R, position, Vector(velocity)) for mass, R, position, velocity in zip(masses, radii, positions, velocities)],
+							 G=self.system.G, softening=self.system.softening, integrator=self.integrator, dt=self.dt)
+		self._ghost.time = time_
+		self._times, self._positions = [time_], [self._ghost.positions.copy()]
+		self.restarts += 1
+
+	def _extend(self, end:float) -> bool:
+		'''
+		- Integrate the path further, "batch" steps at most
+
+		:return: True if it reaches "end"
+		'''
+		ghost = self._ghost
+		if ghost is None:
+			return True
+		for _ in range(0, self.batch, self.every):
+			if ghost.time >= end:
+				return True
+			ghost.step(self.every)
+			self._times.append(ghost.time)
+			self._positions.append(ghost.positions.copy())
+		return ghost.time >= end
+
+	def _diverged(self, time_:float, positions:np.ndarray) -> bool:
+		'''
+		- Whether the real positions at "time_" are too far from the predicted ones (or out of the path)
+		'''
+		times = self._times
+		if len(times) < 2 or not times[0] <= time_ <= times[-1] or positions.shape != self._positions[0].shape:
+			return True
+		k = min(max(int(np.searchsorted(times, time_)), 1), len(times) - 1)
+		alpha = (time_ - times[k - 1]) / (times[k] - times[k - 1])
+		predicted = self._positions[k - 1] + alpha * (self._positions[k] - self._positions[k - 1])
+		size = np.ptp(positions, axis=0).max() or 1.0
+		return float(np.sqrt(((predicted - positions) ** 2).sum(axis=-1)).max()) > self.tolerance * size
+
+	def ordered(self) -> tuple:
+		'''
+		- The published path like TrailBuffer.ordered, farthest first: drawn by a TrailRenderer,
+			the ghost trails fade with the time ahead
+
+		:return: (times (count,), positions (count, bodies, 3))
+		'''
+		times, positions = self._path
+		return times[::-1], positions[::-1]
+
+	def stop(self, timeout:float=1.0) -> None:
+		self._stopped.set()
+		self.join(timeout)
+
+	def __str__(self) -> str:
+		return f"Predictor({len(self._path[0])} samples over {self.horizon:g} s, {self.restarts} restarts)"
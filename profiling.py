@@ -0,0 +1,177 @@
+import json
+import time
+import numpy as np
+
+'''
+Description:
+	Low-overhead instrumentation, cheap enough to stay on all the time.
+
+	with profiler.phase("physics"):     named phase timers, their last durations go into rolling windows
+		...                             (p50 / p99 / max computed only when asked for)
+	profiler.count("steps", 12)         counters, with their rate per second over the last seconds
+
+	Nothing is printed in the hot loop: the results go to a JSON file (dump) or to an on-screen overlay (overlay_lines).
+	A disabled Profiler hands out a shared do-nothing phase, so the instrumented code costs (almost) nothing.
+'''
+
+
+class _Phase:
+	'''
+	- One named timer, reused at every "with" (no allocation per measure)
+	'''
+	__slots__ = ("durations", "index", "count", "total", "_start")
+
+	def __init__(self, window:int) -> None:
+		self.durations = np.zeros(window)
+		self.index = 0
+		self.count = 0
+		self.total = 0.0
+		self._start = 0.0
+
+	def __enter__(self):
+		self._start = time.perf_counter()
+		return self
+
+	def __exit__(self, *exception) -> None:
+		self.add(time.perf_counter() - self._start)
+
+	def add(self, duration:float) -> None:
+		self.durations[self.index] = duration
+		self.index = (self.index + 1) % len(self.durations)
+		self.count += 1
+		self.total += duration
+
+	def window(self) -> np.ndarray:
+		return self.durations[:min(self.count, len(self.durations))]
+
+
+class _NoPhase:
+	__slots__ = ()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exception) -> None:
+		pass
+
+
+_NO_PHASE = _NoPhase()
+
+
+class _Counter:
+	'''
+	- A running total, with (wall time, total) marks to compute a recent rate
+	'''
+	__slots__ = ("total", "marks")
+
+	def __init__(self) -> None:
+		self.total = 0
+		self.marks = [(time.perf_counter(), 0)]
+
+	def rate(self, now:float, span:float) -> float:
+		if now - self.marks[-1][0] >= span / 8:
+			self.marks.append((now, self.total))
+			while len(self.marks) > 2 and now - self.marks[1][0] >= span:
+				self.marks.pop(0)
+		then, total = self.marks[0]
+		return (self.total - total) / (now - then) if now > then else 0.0
+
+
+class Profiler:
+	def __init__(self, enabled:bool=True, window:int=1024, rate_span:float=2.0) -> None:
+		'''
+		˗ˋˏ ♡ ˎˊ˗
+		- Collects phase timings and counters
+
+		:param enabled: False makes every method a no-op
+		:param window: number of last durations kept per phase for the percentiles
+		:param rate_span: seconds over which counters rates are computed
+		'''
+		self.enabled = enabled
+		self.window = window
+		self.rate_span = rate_span
+		self.phases = {}
+		self.counters = {}
+		self.started = time.perf_counter()
+		self._last_lap = self.started
+
+	def phase(self, name:str):
+		'''
+		˗ˋˏ ♡ ˎˊ˗
+		- Context manager timing the block under "name"
+		'''
+		if not self.enabled:
+			return _NO_PHASE
+		phase = self.phases.get(name)
+		if phase is None:
+			phase = self.phases[name] = _Phase(self.window)
+		return phase
+
+	def record(self, name:str, duration:float) -> None:
+		'''
+		- Add a duration measured somewhere else (another thread, a GPU, ...)
+		'''
+		if self.enabled:
+			self.phase(name).add(duration)
+
+	def lap(self, name:str=None) -> None:
+		'''
+		˗ˋˏ ♡ ˎˊ˗
+		- The time since the previous lap goes to the phase "name", handy to cut a long loop in phases
+			without indenting it; lap() with no name only restarts the clock
+		'''
+		if not self.enabled:
+			return
+		now = time.perf_counter()
+		if name is not None:
+			self.phase(name).add(now - self._last_lap)
+		self._last_lap = now
+
+	def count(self, name:str, amount:int=1) -> None:
+		if not self.enabled:
+			return
+		counter = self.counters.get(name)
+		if counter is None:
+			counter = self.counters[name] = _Counter()
+		counter.total += amount
+
+	def summary(self) -> dict:
+		'''
+		˗ˋˏ ♡ ˎˊ˗
+		- Everything measured so far, in milliseconds and per second
+		'''
+		now = time.perf_counter()
+		phases = {}
+		for name, phase in self.phases.items():
+			durations = phase.window()
+			if not len(durations):
+				continue
+			p50, p99 = np.percentile(durations, (50, 99))
+			phases[name] = {
+				"count": phase.count,
+				"mean_ms": 1000 * phase.total / phase.count,
+				"p50_ms": 1000 * p50,
+				"p99_ms": 1000 * p99,
+				"max_ms": 1000 * durations.max(),
+				"share": phase.total / (now - self.started),
+			}
+		counters = {name: {"total": counter.total, "per_second": counter.rate(now, self.rate_span)}
+					for name, counter in self.counters.items()}
+		return {"elapsed_s": now - self.started, "phases": phases, "counters": counters}
+
+	def overlay_lines(self) -> list:
+		'''
+		- Short lines of text for an on-screen overlay
+		'''
+		summary = self.summary()
+		lines = [f"{name}: p50 {phase['p50_ms']:.2f} ms  p99 {phase['p99_ms']:.2f} ms"
+				 for name, phase in summary["phases"].items()]
+		lines += [f"{name}: {counter['per_second']:.0f}/s" for name, counter in summary["counters"].items()]
+		return lines
+
+	def dump(self, path:str) -> None:
+		with open(path, "w") as file:
+			json.dump(self.summary(), file, indent=2)
+
+	def __str__(self) -> str:
+		return "\n".join(self.overlay_lines())
@@ -1,4 +1,5 @@
 import math
+import time
 import numpy as np
 
 screen = (800, 600)
@@ -29,6 +30,7 @@ class Camera:
         '''
         self.x, self.y, self.z = position
         self.yaw, self.pitch = rotation
+        self._view_key = None # (yaw, pitch) of the cached view matrix
 
     def move(self, position2=None, rotation2=None):
         '''
@@ -55,6 +57,43 @@ class Camera:
         self.y = position2[1]
         self.z = position2[2]
 
+    @property
+    def position(self) -> np.ndarray:
+        return np.array((self.x, self.y, self.z))
+
+    def _update_view(self):
+        '''
+        Recompute cos/sin of yaw and pitch and the view matrix, only if the rotation changed since last time.
+        '''
+        if self._view_key == (self.yaw, self.pitch):
+            return
+        cos_yaw, sin_yaw = math.cos(self.yaw), math.sin(self.yaw)
+        cos_pitch, sin_pitch = math.cos(self.pitch), math.sin(self.pitch)
+        self._trigonometry = (cos_yaw, sin_yaw, cos_pitch, sin_pitch)
+        # Rows give rotated_x, rotated_y, rotated_z : the same two rotations as raycast_transform (BUG included)
+        self._view = np.array([
+            [cos_yaw, 0, -sin_yaw],
+            [-sin_pitch * sin_yaw, cos_pitch, -sin_pitch * cos_yaw],
+            [cos_pitch * sin_yaw, sin_pitch, cos_pitch * cos_yaw],
+        ])
+        self._view_key = (self.yaw, self.pitch)
+
+    @property
+    def trigonometry(self) -> tuple:
+        '''
+        (cos(yaw), sin(yaw), cos(pitch), sin(pitch)), cached until the camera turns.
+        '''
+        self._update_view()
+        return self._trigonometry
+
+    @property
+    def view_matrix(self) -> np.ndarray:
+        '''
+        3x3 rotation from world (relative to the camera) to camera coordinates, cached until the camera turns.
+        '''
+        self._update_view()
+        return self._view
+
     def __str__(self) -> str:
         return f"Camera(\tposition : ({self.x}, {self.y}, {self.z}) | yaw : {self.yaw} | pitch : {self.pitch} )"
 
@@ -77,16 +116,16 @@ def raycast_transform(camera:Camera, point_pos:tuple, screen=screen) ->  tuple:
     dy = point_y - cam_y
     dz = point_z - cam_z
 
-    yaw = camera.yaw
-    pitch = camera.pitch
+    # cos and sin of yaw and pitch are only computed again when the camera turns
+    cos_yaw, sin_yaw, cos_pitch, sin_pitch = camera.trigonometry
 
     # Rotate the point around the Z-axis (yaw) to account for camera's left-right view # BUG
-    rotated_x = dx * math.cos(yaw) - dz * math.sin(yaw)
-    rotated_z = dx * math.sin(yaw) + dz * math.cos(yaw)
+    rotated_x = dx * cos_yaw - dz * sin_yaw
+    rotated_z = dx * sin_yaw + dz * cos_yaw
 
     # Rotate the point around the X-axis (pitch) to account for camera's up-down view
-    rotated_y = dy * math.cos(pitch) - rotated_z * math.sin(pitch)
-    rotated_z = dy * math.sin(pitch) + rotated_z * math.cos(pitch)
+    rotated_y = dy * cos_pitch - rotated_z * sin_pitch
+    rotated_z = dy * sin_pitch + rotated_z * cos_pitch
     
     # Project the 3D point onto 2D (perspective projection)
     if rotated_z <= 0:  # If the point is behind the camera, do not render it
@@ -102,6 +141,31 @@ def raycast_transform(camera:Camera, point_pos:tuple, screen=screen) ->  tuple:
     
     return (screen_x, screen_y)
 
+def project(camera:Camera, points:np.ndarray, screen=screen) -> tuple:
+    '''
+    ˗ˋˏ ♡ ˎˊ˗
+
+    Same as raycast_transform, but for a whole array of points in one go (no Python loop).
+
+    :param camera: An instance of the Camera class that contains the camera's position and rotation.
+    :param points: An array (N, 3) of 3D coordinates (any shape (..., 3) works).
+    :param screen: A tuple (width, height) representing the dimensions of the screen for projection.
+    :return: (coordinates (N, 2), visible (N,)) : the 2D screen coordinates, and False where the point is behind the camera
+             (the coordinates of hidden points are NaN).
+    '''
+    points = np.asarray(points, dtype=float)
+    rotated = (points - camera.position) @ camera.view_matrix.T
+    depth = rotated[..., 2]
+    visible = depth > 0
+
+    focal_length = 1.0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        projected = rotated[..., :2] / depth[..., np.newaxis] * focal_length
+    half = np.array((screen[0] // 2, screen[1] // 2))
+    coordinates = np.trunc(projected * half) + np.array(screen) / 2
+    coordinates[~visible] = np.nan
+    return coordinates, visible
+
 def adjusted_radius(radius, planet_position, player, base_distance=300):
     '''
     ˗ˋˏ ♡ ˎˊ˗
@@ -143,6 +207,8 @@ class _3d_axis():
         '''
         self.screen = screen
         self.camera = Camera((0,0,-2), (0,0))
+        self._key = None # angles of the last rendering
+        self._render = None
 
     def render(self, psy, theta, phi):
         '''
@@ -154,6 +220,9 @@ class _3d_axis():
         :param phi: Rotation around the z-axis (yaw). (눈_눈)
         :return: A tuple containing the 2D screen coordinates of the three axes.
         '''
+        # Nothing to compute again if the angles did not change since the last frame
+        if self._key == (psy, theta, phi):
+            return self._render
 
         # Define the initial unit vectors along the x, y, and z axes
         self.vecteur_x = np.array([1, 0, 0])
@@ -177,58 +246,18 @@ class _3d_axis():
             [0, 0, 1]
             ])
         
-        # Apply the rotations to the initial vectors
-        # Rotate x,y,z-axis by pitch
-        self.vecteur_x = np.dot(rotation_x, self.vecteur_x)
-        self.vecteur_y = np.dot(rotation_x, self.vecteur_y)
-        self.vecteur_z = np.dot(rotation_x, self.vecteur_z)
-
-        # Rotate x,y,z-axis by roll
-        self.vecteur_x = np.dot(rotation_y, self.vecteur_x)
-        self.vecteur_y = np.dot(rotation_y, self.vecteur_y)
-        self.vecteur_z = np.dot(rotation_y, self.vecteur_z)
-
-        # Rotate x,y,z-axis by yaw
-        self.vecteur_x = np.dot(rotation_z, self.vecteur_x)
-        self.vecteur_y = np.dot(rotation_z, self.vecteur_y)
-        self.vecteur_z = np.dot(rotation_z, self.vecteur_z)
-
-        # RENDERING: Transform the 3D vectors to 2D screen coordinates using raycasting
-        return (raycast_transform(self.camera, self.vecteur_x, self.screen),
-                raycast_transform(self.camera, self.vecteur_y, self.screen),
-                raycast_transform(self.camera, self.vecteur_z, self.screen)
-        )
+        # Apply the rotations to the initial vectors : pitch, then roll, then yaw
+        # One matrix for the three of them, its columns are the rotated x,y,z-axis
+        rotation = rotation_z @ rotation_y @ rotation_x
+        self.vecteur_x, self.vecteur_y, self.vecteur_z = rotation.T
+
+        # RENDERING: Transform the 3D vectors to 2D screen coordinates using raycasting (all three at once)
+        coordinates, visible = project(self.camera, rotation.T, self.screen)
+        self._render = tuple(tuple(point) if seen else None for point, seen in zip(coordinates.tolist(), visible))
+        self._key = (psy, theta, phi)
+        return self._render
     
 
-import time
-class Stopwatch:
-	def __init__(self) -> None:
-		'''
-		˗ˋˏ ♡ ˎˊ˗
-		- Stopwatch is used to measure time between one moment and another
-		- To use it, call "start" before the first moment then call stop after the second moment
-		- The unity "yearno" is 1/(2*10E6) second(s), it is used to measure fast computation time
-		- To desactive the print display, just give the "stop()" function a Boolean value "False"
-
-		 ∧,,,∧   ~ ┏━━━━━━━━━━━━━━━━━━━━━━━━┓
-		( ̳• · • ̳)  ~ ♡  You're purrfect   ♡
-		/       づ ~┗━━━━━━━━━━━━━━━━━━━━━━━━┛
-		'''
-	def start(self) -> None:
-		self.time_at_start = time.perf_counter()
-
-	def stop(self, debbug = True) -> None:
-		num = time.perf_counter()-self.time_at_start
-		scale_time = -int(math.floor(math.log10(abs(num)))) + 1
-		yearno = num/2E-06
-		if debbug:
-			print("Time passed:", round(num, scale_time), "second(s), or", round(yearno, 3), "yearno")
-
-
-stopwatch = Stopwatch()
-
-my_ax = _3d_axis()
-
 def test(a,b,c):
     '''
     This function visualizes three 3D vectors representing the axes in a 3D coordinate system.
@@ -238,10 +267,10 @@ def test(a,b,c):
     - b: Rotation angle around the y-axis (yaw).
     - c: Rotation angle around the z-axis (roll).
     '''
-    import matplotlib.pyplot as plt
-    import numpy as np
+    import matplotlib.pyplot as plt # only needed here, not by the simulation
 
     # Render the 3D axis with the given rotation angles
+    my_ax = _3d_axis()
     my_ax.render(a,b,c)
     vector1 = my_ax.vecteur_x
     vector2 = my_ax.vecteur_y
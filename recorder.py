@@ -0,0 +1,233 @@
+import os
+import struct
+import numpy as np
+from integrators import HermiteInterpolant
+
+'''
+Description:
+	Trajectories, for the screen and for the disk.
+
+	TrailBuffer : fixed-size ring buffer of the last positions, for the trails drawn on screen (no more list.pop(0))
+	Recorder    : streams decimated samples in chunks to a compact binary file, with a time index next to it
+	Replay      : memory-maps a recorded file and jumps to any simulated time without loading the whole run
+
+	File format (".traj"), little endian:
+		header (64 bytes) : magic b"3BTRAJ\0\0", version (uint32), bodies (uint32), float size (uint32), zeros
+		bodies            : masses (bodies,), radii (bodies,)  (float64)
+		records           : time (float64), positions (bodies, 3), velocities (bodies, 3)  (float32 or float64)
+	Time index (".traj.idx"): one (first time, last time, first record) triplet of float64 per chunk
+'''
+
+MAGIC = b"3BTRAJ\0\0"
+VERSION = 1
+HEADER = struct.Struct("<8sIII44x")
+
+
+def record_dtype(bodies:int, precision:str="f8") -> np.dtype:
+	'''
+	- The NumPy dtype of one record of a ".traj" file
+	'''
+	return np.dtype([
+		("time", "<f8"),
+		("positions", f"<{precision}", (bodies, 3)),
+		("velocities", f"<{precision}", (bodies, 3)),
+	])
+
+
+class TrailBuffer:
+	def __init__(self, capacity:int, bodies:int, interval:float=0.0) -> None:
+		'''
+		˗ˋˏ ♡ ˎˊ˗
+		- Keeps the last "capacity" positions of every body, the oldest ones are overwritten
+		- Appending is O(1), nothing is ever shifted
+
+		:param capacity: number of positions kept per body
+		:param bodies: number of bodies
+		:param interval: minimum simulated time between two kept positions
+		'''
+		self.capacity = capacity
+		self.interval = interval
+		self.last_time = -np.inf
+		self.positions = np.zeros((capacity, bodies, 3))
+		self.times = np.zeros(capacity)
+		self.head = 0 # where the next position goes
+		self.count = 0
+
+	def append(self, time:float, positions:np.ndarray) -> bool:
+		'''
+		- Add the positions, unless they come less than "interval" after the last ones
+
+		:return: True if they were kept
+		'''
+		if abs(time - self.last_time) < self.interval:
+			return False
+		if positions.shape != self.positions.shape[1:]:
+			# A body was added or removed, the old trail does not mean anything anymore
+			self.positions = np.zeros((self.capacity,) + positions.shape)
+			self.head = self.count = 0
+		self.positions[self.head] = positions
+		self.times[self.head] = time
+		self.head = (self.head + 1) % self.capacity
+		self.count = min(self.count + 1, self.capacity)
+		self.last_time = time
+		return True
+
+	def ordered(self) -> tuple:
+		'''
+		:return: (times (count,), positions (count, bodies, 3)), oldest first
+		'''
+		if self.count < self.capacity:
+			return self.times[:self.count], self.positions[:self.count]
+		order = np.roll(np.arange(self.capacity), -self.head)
+		return self.times[order], self.positions[order]
+
+	def clear(self) -> None:
+		self.head = self.count = 0
+		self.last_time = -np.inf
+
+	def __len__(self) -> int:
+		return self.count
+
+
+class Recorder:
+	def __init__(self, path:str, masses:np.ndarray, radii:np.ndarray, interval:float=0.0, chunk_size:int=4096, precision:str="f8") -> None:
+		'''
+		˗ˋˏ ♡ ˎˊ˗
+		- Writes samples to "path" as they come, one chunk at a time,
+			so a run of any length only needs one chunk in memory
+
+		:param path: the ".traj" file to create (the index goes to path + ".idx")
+		:param masses: the masses of the bodies
+		:param radii: the radii of the bodies
+		:param interval: minimum simulated time between two samples (decimation), 0 keeps everything
+		:param chunk_size: samples per chunk written at once
+		:param precision: "f8" or "f4" (half the size, ~7 significant digits)
+		'''
+		if precision not in ("f4", "f8"):
+			raise ValueError(f"precision must be 'f4' or 'f8', not {precision!r}")
+		bodies = len(masses)
+		self.path = path
+		self.interval = interval
+		self.dtype = record_dtype(bodies, precision)
+		self.chunk = np.empty(chunk_size, dtype=self.dtype)
+		self.filled = 0
+		self.written = 0
+		self.last_time = -np.inf
+		self.file = open(path, "wb")
+		self.file.write(HEADER.pack(MAGIC, VERSION, bodies, int(precision[1])))
+		self.file.write(np.asarray(masses, dtype="<f8").tobytes() + np.asarray(radii, dtype="<f8").tobytes())
+		self.index = open(path + ".idx", "wb")
+
+	def record(self, time:float, positions:np.ndarray, velocities:np.ndarray) -> bool:
+		'''
+		˗ˋˏ ♡ ˎˊ˗
+		- Add a sample, unless it comes less than "interval" after the last one
+
+		:return: True if the sample was kept
+		'''
+		if time - self.last_time < self.interval:
+			return False
+		sample = self.chunk[self.filled]
+		sample["time"] = time
+		sample["positions"] = positions
+		sample["velocities"] = velocities
+		self.filled += 1
+		self.last_time = time
+		if self.filled == len(self.chunk):
+			self.flush()
+		return True
+
+	def flush(self) -> None:
+		'''
+		- Write the samples of the current chunk and their entry of the time index
+		'''
+		if not self.filled:
+			return
+		chunk = self.chunk[:self.filled]
+		self.file.write(chunk.tobytes())
+		self.index.write(np.array([chunk["time"][0], chunk["time"][-1], self.written], dtype="<f8").tobytes())
+		self.written += self.filled
+		self.filled = 0
+
+	def close(self) -> None:
+		if self.file.closed:
+			return
+		self.flush()
+		self.file.close()
+		self.index.close()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exception) -> None:
+		self.close()
+
+	def __len__(self) -> int:
+		return self.written + self.filled
+
+
+class Replay:
+	def __init__(self, path:str) -> None:
+		'''
+		˗ˋˏ ♡ ˎˊ˗
+		- Opens a ".traj" file without reading it: the records are memory-mapped,
+			only the small time index is loaded
+
+		:param path: the ".traj" file written by a Recorder
+		'''
+		with open(path, "rb") as file:
+			magic, version, bodies, float_size = HEADER.unpack(file.read(HEADER.size))
+			if magic != MAGIC:
+				raise ValueError(f"{path} is not a trajectory file")
+			if version != VERSION:
+				raise ValueError(f"{path} has version {version}, only version {VERSION} is supported")
+			self.masses = np.fromfile(file, dtype="<f8", count=bodies)
+			self.radii = np.fromfile(file, dtype="<f8", count=bodies)
+		self.bodies = bodies
+		self.dtype = record_dtype(bodies, f"f{float_size}")
+		offset = HEADER.size + 2 * 8 * bodies
+		records = (os.path.getsize(path) - offset) // self.dtype.itemsize
+		self.records = np.memmap(path, dtype=self.dtype, mode="r", offset=offset, shape=(records,))
+		index = np.fromfile(path + ".idx", dtype="<f8").reshape(-1, 3)
+		self.chunk_start_times = index[:, 0]
+		self.chunk_starts = np.append(index[:, 2].astype(np.int64), records)
+
+	@property
+	def start_time(self) -> float:
+		return float(self.records[0]["time"])
+
+	@property
+	def end_time(self) -> float:
+		return float(self.records[-1]["time"])
+
+	def find(self, time:float) -> int:
+		'''
+		- Index of the last sample at or before "time", reading only one chunk of the file
+		'''
+		chunk = max(int(np.searchsorted(self.chunk_start_times, time, side="right")) - 1, 0)
+		start, end = self.chunk_starts[chunk], self.chunk_starts[chunk + 1]
+		times = self.records["time"][start:end]
+		return int(max(start + np.searchsorted(times, time, side="right") - 1, 0))
+
+	def state_at(self, time:float) -> tuple:
+		'''
+		˗ˋˏ ♡ ˎˊ˗
+		- Positions and velocities at any time, interpolated between the two samples around it
+		- Positions use a cubic Hermite interpolation (it knows the velocities at both ends), see integrators.HermiteInterpolant
+
+		:return: (positions (N, 3), velocities (N, 3)) as float64 arrays
+		'''
+		index = self.find(time)
+		a = self.records[index]
+		if index + 1 >= len(self.records) or time <= a["time"]:
+			return a["positions"].astype(float), a["velocities"].astype(float)
+		b = self.records[index + 1]
+		interpolant = HermiteInterpolant(float(a["time"]), a["positions"].astype(float), a["velocities"].astype(float),
+										 float(b["time"]), b["positions"].astype(float), b["velocities"].astype(float))
+		return interpolant(min(time, interpolant.t1))
+
+	def __len__(self) -> int:
+		return len(self.records)
+
+	def __str__(self) -> str:
+		return f"Replay({len(self)} samples of {self.bodies} bodies, from {self.start_time} to {self.end_time} s)"
@@ -0,0 +1,218 @@
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pygame
+import raycasting as rc
+import scenarios
+from recorder import TrailBuffer, Replay
+from trails import TrailRenderer
+from integrators import INTEGRATORS
+from kernels import BACKENDS, get_solver
+
+'''
+Description:
+	Offline rendering, for videos: every frame is drawn off screen, as slowly as it takes,
+	by a pool of processes, and written as an image sequence or a raw RGB stream.
+
+	The states come from a recorded run (--replay run.traj) or are simulated first (--scenario),
+	one per frame, at "--speed" simulated seconds per second of video.
+	The camera follows a path of keyframes (JSON), interpolated between them:
+
+		{"keyframes": [{"time": 0, "position": [17.7, -87, 76], "yaw": 0, "pitch": 2.3},
+		               {"time": 10, "position": [0, -120, 40], "yaw": 0.5, "pitch": 2.0}]}
+
+	python render.py --scenario figure-eight --dt 1e-3 --speed 1 --duration 12 --output frames/frame_%05d.png
+	python render.py --replay century.traj --speed 3e6 --duration 60 --output - | ffmpeg -f rawvideo -pix_fmt rgb24 -s 800x600 -r 30 -i - out.mp4
+'''
+
+DEFAULT_CAMERA = {"time": 0.0, "position": (17.7, -87, 76), "yaw": 0.0, "pitch": 2.3} # the one of main.py
+WORLD_AXIS_ENDS = np.array([(-100,.1,.1), (100,.1,.1), (.1,-100,.1), (.1,100,.1), (.1,.1,-50), (.1,.1,50)])
+
+
+class CameraPath:
+	def __init__(self, keyframes:list=(DEFAULT_CAMERA,)) -> None:
+		'''
+		˗ˋˏ ♡ ˎˊ˗
+		- A camera moving along keyframes, linearly interpolated (and still before the first / after the last)
+
+		:param keyframes: dictionaries with "time" (seconds of video), "position" (x, y, z), "yaw" and "pitch"
+		'''
+		keyframes = sorted(keyframes, key=lambda keyframe: keyframe["time"])
+		self.times = np.array([keyframe["time"] for keyframe in keyframes], dtype=float)
+		self.values = np.array([tuple(keyframe["position"]) + (keyframe["yaw"], keyframe["pitch"]) for keyframe in keyframes], dtype=float)
+
+	@classmethod
+	def from_json(cls, path:str):
+		with open(path) as file:
+			data = json.load(file)
+		return cls(data["keyframes"] if isinstance(data, dict) else data)
+
+	def at(self, time:float) -> rc.Camera:
+		x, y, z, yaw, pitch = (np.interp(time, self.times, column) for column in self.values.T)
+		return rc.Camera((x, y, z), (yaw, pitch))
+
+
+def simulated_states(system, times:np.ndarray) -> np.ndarray:
+	'''
+	- Positions of the bodies at every time, integrating the system up to each of them
+	'''
+	positions = np.empty((len(times), len(system), 3))
+	for frame, time_ in enumerate(times):
+		system.advance_to(time_)
+		positions[frame] = system.positions
+	return positions
+
+
+def replayed_states(replay:Replay, times:np.ndarray) -> np.ndarray:
+	return np.array([replay.state_at(time_)[0] for time_ in times])
+
+
+def draw_frame(surface, camera, positions:np.ndarray, radii:np.ndarray, trails:TrailBuffer, trail_renderer:TrailRenderer,
+			   scale:float, label=None) -> None:
+	'''
+	˗ˋˏ ♡ ˎˊ˗
+	- One frame, drawn like the window of main.py: bodies, world axes, trails (and a label)
+	'''
+	size = surface.get_size()
+	surface.fill((255, 255, 255))
+	axis_pos, axis_visible = rc.project(camera, WORLD_AXIS_ENDS, size)
+	for a, b, color in ((0, 1, (255, 100, 100)), (2, 3, (100, 255, 100)), (4, 5, (100, 100, 255))):
+		if axis_visible[a] and axis_visible[b]:
+			pygame.draw.line(surface, color, axis_pos[a], axis_pos[b])
+	trail_renderer.draw(surface, camera, trails, scale, size)
+	bodies_pos, bodies_visible = rc.project(camera, positions * scale, size)
+	for body_pos, visible, R in zip(bodies_pos.tolist(), bodies_visible, radii):
+		if visible:
+			pygame.draw.circle(surface, (0, 0, 0), body_pos, max(R * scale, 3))
+	if label:
+		surface.blit(label, (10, size[1] - 25))
+
+
+def _render_chunk(job:tuple) -> list:
+	'''
+	- Render frames [start, end) in a worker process: the states before "start" only feed the trails
+	'''
+	start, end, positions, times, history, radii, path, options = job
+	pygame.font.init()
+	font = pygame.font.Font(None, 24)
+	surface = pygame.Surface(options["size"])
+	trails = TrailBuffer(max(options["trail_length"], 1), positions.shape[1])
+	trail_renderer = TrailRenderer()
+	frames = []
+	for index in range(len(positions)):
+		trails.append(times[index], positions[index])
+		if index < history:
+			continue
+		frame = start + index - history
+		label = font.render(f"t = {times[index]:.6g}", True, (120, 120, 120))
+		draw_frame(surface, path.at(frame / options["fps"]), positions[index], radii, trails, trail_renderer, options["scale"], label)
+		if options["pattern"]:
+			pygame.image.save(surface, options["pattern"] % frame)
+			frames.append(None)
+		else:
+			frames.append(pygame.image.tobytes(surface, "RGB"))
+	return frames
+
+
+def render(positions:np.ndarray, times:np.ndarray, radii:np.ndarray, output:str, path:CameraPath=None, size:tuple=(800, 600),
+		   fps:float=30.0, scale:float=None, trail_length:int=300, workers:int=None, chunk_size:int=16) -> int:
+	'''
+	˗ˋˏ ♡ ˎˊ˗
+	- Render one frame per state and write them in order, chunks of frames going to a pool of processes
+
+	:param positions: (frames, bodies, 3) positions of every frame
+	:param times: (frames,) simulated time of every frame (shown on the frames)
+	:param output: an image pattern like "frames/frame_%05d.png", "-" for a raw RGB stream on stdout, or a ".raw" file
+	:param path: the camera path (default: the camera of main.py, still)
+	:param scale: factor from the unities of the positions to the ones of the camera, None to fit the run in view
+	:param trail_length: frames kept in the trails
+	:param workers: processes (None: one per core, 1: everything in this process)
+	:param chunk_size: frames per job
+	:return: the number of frames rendered
+	'''
+	path = CameraPath() if path is None else path
+	if scale is None:
+		scale = 50 / (np.abs(positions).max() or 1.0)
+	raw = output == "-" or output.endswith(".raw")
+	pattern = None if raw else output
+	if pattern:
+		if "%" not in pattern:
+			raise ValueError(f"The output {output!r} needs a frame number pattern like frame_%05d.png, or use '-' / .raw")
+		os.makedirs(os.path.dirname(pattern) or ".", exist_ok=True)
+	options = {"size": tuple(size), "fps": fps, "scale": scale, "trail_length": trail_length, "pattern": pattern}
+
+	jobs = []
+	for start in range(0, len(positions), chunk_size):
+		end = min(start + chunk_size, len(positions))
+		first = max(start - trail_length + 1, 0) # the trail of the first frame starts there
+		jobs.append((start, end, positions[first:end], times[first:end], start - first, radii, path, options))
+
+	stream = None
+	if raw:
+		stream = sys.stdout.buffer if output == "-" else open(output, "wb")
+
+	def write(results) -> None:
+		for frames in results: # in order, whatever the order they were done in
+			if stream:
+				for frame in frames:
+					stream.write(frame)
+
+	try:
+		if workers == 1:
+			write(map(_render_chunk, jobs))
+		else:
+			with ProcessPoolExecutor(max_workers=workers) as pool:
+				write(pool.map(_render_chunk, jobs))
+	finally:
+		if stream and stream is not sys.stdout.buffer:
+			stream.close()
+	return len(positions)
+
+
+def main(argv=None) -> int:
+	parser = argparse.ArgumentParser(description="Render a run to video frames, off screen, with a scripted camera.")
+	parser.add_argument("--replay", default=None, help="a .traj file recorded by simulate.py (instead of simulating)")
+	parser.add_argument("--scenario", default="earth-moon", help=f"one of {', '.join(scenarios.SCENARIOS)}, or a .json file")
+	parser.add_argument("--integrator", default="leapfrog", choices=sorted(INTEGRATORS))
+	parser.add_argument("--dt", type=float, default=50.0, help="timestep in scenario unities")
+	parser.add_argument("--backend", choices=BACKENDS, default="numpy")
+	parser.add_argument("--speed", type=float, required=True, help="simulated time per second of video")
+	parser.add_argument("--duration", type=float, required=True, help="seconds of video")
+	parser.add_argument("--fps", type=float, default=30.0)
+	parser.add_argument("--size", type=int, nargs=2, default=(800, 600), metavar=("WIDTH", "HEIGHT"))
+	parser.add_argument("--camera", default=None, help="a JSON file of camera keyframes (default: still, like main.py)")
+	parser.add_argument("--scale", type=float, default=None, help="scale of the positions (default: fit the run in view)")
+	parser.add_argument("--trail-length", type=int, default=300, help="frames kept in the trails")
+	parser.add_argument("--workers", type=int, default=None, help="processes (default: one per core)")
+	parser.add_argument("--output", default="frames/frame_%05d.png", help="image pattern, '-' for raw RGB on stdout, or a .raw file")
+	args = parser.parse_args(argv)
+
+	frames = int(round(args.duration * args.fps))
+	if args.replay:
+		replay = Replay(args.replay)
+		times = replay.start_time + np.arange(frames) * args.speed / args.fps
+		positions, radii = replayed_states(replay, np.minimum(times, replay.end_time)), replay.radii
+	else:
+		try:
+			system = scenarios.load(args.scenario, integrator=args.integrator, dt=args.dt, solver=get_solver(args.backend))
+		except ValueError as error:
+			parser.error(str(error))
+		times = system.time + np.arange(frames) * args.speed / args.fps
+		positions, radii = simulated_states(system, times), system.radii
+
+	start = time.perf_counter()
+	path = CameraPath.from_json(args.camera) if args.camera else CameraPath()
+	try:
+		render(positions, times, radii, args.output, path, args.size, args.fps, args.scale, args.trail_length, args.workers)
+	except ValueError as error:
+		parser.error(str(error))
+	print(f"{frames} frames rendered in {time.perf_counter() - start:.2f} s", file=sys.stderr)
+	return frames
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,105 @@
+import json
+from nbody import Body, System, Vector, G
+
+'''
+Description:
+	Ready-made initial conditions, by name, for the interactive window and the headless runs.
+	A scenario can also be a JSON file:
+	{
+		"G": 1.0,                                  (optional, SI value by default)
+		"softening": 0.0,                          (optional)
+		"bodies": [
+			{"mass": 1.0, "R": 0.01, "position": [x, y, z], "velocity": [vx, vy, vz]},
+			...
+		]
+	}
+'''
+
+
+def earth_moon(**options) -> System:
+	'''
+	˗ˋˏ ♡ ˎˊ˗
+	- The Earth and the Moon, SI unities (the data for the bodies are taken from the Internet)
+	'''
+	Earth = Body(5.972e24, 6_371_000, (0, 0, 0), Vector((0, 0, 0)))
+	Moon = Body(7.342e22, 1_737_000, (0, 384_400_000, 0), Vector((1023, 0, 0)))
+	return System([Earth, Moon], G=G, **options)
+
+
+def sun_earth_moon(**options) -> System:
+	'''
+	˗ˋˏ ♡ ˎˊ˗
+	- A real three-body problem at last ╮( ˘ ､ ˘ )╭ , SI unities
+	'''
+	Sun = Body(1.989e30, 696_340_000, (0, 0, 0), Vector((0, 0, 0)))
+	Earth = Body(5.972e24, 6_371_000, (149_597_870_700, 0, 0), Vector((0, 29_780, 0)))
+	Moon = Body(7.342e22, 1_737_000, (149_597_870_700 + 384_400_000, 0, 0), Vector((0, 29_780 + 1_022, 0)))
+	return System([Sun, Earth, Moon], G=G, **options)
+
+
+def figure_eight(**options) -> System:
+	'''
+	˗ˋˏ ♡ ˎˊ˗
+	- Three equal masses chasing each other on an "8" (Chenciner & Montgomery), G = 1
+	- Period ~ 6.3259
+	'''
+	velocity = (0.466203685, 0.43236573, 0)
+	bodies = [
+		Body(1, 0.01, (0.97000436, -0.24308753, 0), Vector(velocity)),
+		Body(1, 0.01, (-0.97000436, 0.24308753, 0), Vector(velocity)),
+		Body(1, 0.01, (0, 0, 0), Vector(velocity) * -2),
+	]
+	return System(bodies, G=1.0, **options)
+
+
+def pythagorean(**options) -> System:
+	'''
+	˗ˋˏ ♡ ˎˊ˗
+	- Burrau's problem: masses 3, 4, 5 at rest on the corners of a 3-4-5 triangle, G = 1
+	- Full of close encounters, then one body escapes around t ~ 60
+	'''
+	bodies = [
+		Body(3, 0.01, (1, 3, 0)),
+		Body(4, 0.01, (-2, -1, 0)),
+		Body(5, 0.01, (1, -1, 0)),
+	]
+	return System(bodies, G=1.0, **options)
+
+
+SCENARIOS = {
+	"earth-moon": earth_moon,
+	"sun-earth-moon": sun_earth_moon,
+	"figure-eight": figure_eight,
+	"pythagorean": pythagorean,
+}
+
+
+def from_json(path:str, **options) -> System:
+	'''
+	- Build a System from a JSON file (see the description at the top of this file)
+	'''
+	with open(path) as file:
+		data = json.load(file)
+	options.setdefault("softening", data.get("softening", 0.0))
+	bodies = [
+		Body(body["mass"], body.get("R", 0.0), body["position"], Vector(body.get("velocity", (0, 0, 0))))
+		for body in data["bodies"]
+	]
+	return System(bodies, G=data.get("G", G), **options)
+
+
+def load(scenario:str, **options) -> System:
+	'''
+	˗ˋˏ ♡ ˎˊ˗
+	- Return the System of a scenario, given by name or as a path to a JSON file
+
+	:param scenario: a name of SCENARIOS or a path ending with ".json"
+	:param options: forwarded to System (integrator, dt, timestep, solver, ...)
+	'''
+	if scenario.endswith(".json"):
+		return from_json(scenario, **options)
+	try:
+		build = SCENARIOS[scenario]
+	except KeyError:
+		raise ValueError(f"Unknown scenario {scenario!r}, choose one of: {', '.join(SCENARIOS)} or a .json file") from None
+	return build(**options)
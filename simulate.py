@@ -0,0 +1,323 @@
+import argparse
+import time
+from collections import Counter
+import numpy as np
+import scenarios
+import checkpoint
+from recorder import Recorder
+from integrators import INTEGRATORS
+from timestep import AdaptiveTimestep
+from kernels import BACKENDS, get_solver
+from monitor import ConservationMonitor, ACTIONS
+from units import Units
+from collisions import CollisionHandler, Collision, OUTCOMES
+from events import EventLocator, CloseApproach, Escape, PlaneCrossing
+
+'''
+Description:
+	Headless batch simulation: no pygame, no window, no event polling, just the physics at full speed.
+	The states are sampled every "--every" simulated seconds and written to disk at the end.
+
+	python simulate.py --scenario figure-eight --integrator yoshida4 --dt 0.001 --duration 63.259 --every 0.1 --output eight.npz
+	python simulate.py --scenario pythagorean --integrator leapfrog --adaptive encounter --eta 0.002 --duration 70 --every 0.05 --output pyth.npz
+
+	The output is a NumPy .npz archive with:
+		time (S,), positions (S, N, 3), velocities (S, N, 3), masses (N,), radii (N,), G, and the run options
+	or, when the output ends with ".traj", a file streamed chunk by chunk while the run goes on (see recorder.py),
+	for runs too long to be kept in memory:
+
+	python simulate.py --scenario earth-moon --dt 50 --duration 3.15e9 --every 3600 --output century.traj
+
+	Long runs can be cut in restartable pieces with checkpoints (see checkpoint.py):
+
+	python simulate.py --scenario pythagorean --dt 1e-3 --duration 30 --every 0.1 --checkpoint run.ckpt --checkpoint-every 5 --output part1.npz
+	python simulate.py --resume run.ckpt --duration 40 --every 0.1 --checkpoint run.ckpt --output part2.npz
+
+	The samples are taken at multiples of "--every" from time 0, so a resumed run takes exactly
+	the same steps as an uninterrupted one (bit for bit), as long as its checkpoint was taken at one of them.
+
+	With --collisions, touching bodies merge, bounce or stop the run (see collisions.py):
+	the samples keep one row per initial body, NaN for the bodies merged into another one.
+
+	With --telemetry PORT, snapshots of the run are served on a local socket while it goes on (see telemetry.py).
+
+	With --units nbody the run is integrated in N-body unities (G = 1, see units.py) and the samples
+	are converted back to the unities of the scenario when written: the options stay in scenario unities.
+
+	With --dense the steps are never shortened to land on the samples: the samples are interpolated
+	inside the steps instead (see integrators.HermiteInterpolant), so "--every" does not change the run.
+	With --close-approach, --escape-radius or --crossing, the events are located inside the steps
+	with their exact time (see events.py) and saved as event_time, event_name, event_bodies.
+'''
+
+
+def build_parser() -> argparse.ArgumentParser:
+	parser = argparse.ArgumentParser(description="Run a simulation without any rendering and save the trajectories.")
+	parser.add_argument("--scenario", default="earth-moon", help=f"one of {', '.join(scenarios.SCENARIOS)}, or a .json file")
+	parser.add_argument("--integrator", default="leapfrog", choices=sorted(INTEGRATORS))
+	parser.add_argument("--dt", type=float, default=50.0, help="timestep in scenario unities (the longest step when adaptive)")
+	parser.add_argument("--duration", type=float, required=True, help="simulated time to run")
+	parser.add_argument("--every", type=float, default=None, help="output cadence in simulated time (default: every dt)")
+	parser.add_argument("--adaptive", choices=("encounter", "error"), default=None, help="adaptive timestep method")
+	parser.add_argument("--eta", type=float, default=0.01, help="encounter method: fraction of the encounter time")
+	parser.add_argument("--tolerance", type=float, default=1e-10, help="error method: accepted relative error per step")
+	parser.add_argument("--backend", choices=BACKENDS, default="numpy", help="force and stepping kernels (numba falls back to numpy when missing)")
+	parser.add_argument("--softening", type=float, default=None, help="Plummer softening length")
+	parser.add_argument("--output", default="trajectory.npz", help="where to write the results (.npz, or .traj to stream)")
+	parser.add_argument("--precision", choices=("f8", "f4"), default="f8", help=".traj output: float size of the samples")
+	parser.add_argument("--monitor-every", type=int, default=None, help="steps between two checks of energy and momenta (default: no check)")
+	parser.add_argument("--drift-tolerance", type=float, default=1e-6, help="largest accepted relative drift of a conserved quantity")
+	parser.add_argument("--on-drift", choices=ACTIONS, default="warn", help="what to do when the drift goes beyond the tolerance")
+	parser.add_argument("--checkpoint", default=None, help="where to save the state of the run (at the end, and every --checkpoint-every)")
+	parser.add_argument("--checkpoint-every", type=float, default=None, help="simulated time between two checkpoints")
+	parser.add_argument("--resume", default=None, help="a checkpoint to start from (the scenario, integrator and step options are ignored; the monitor, collisions and events come from the options again)")
+	parser.add_argument("--collisions", choices=OUTCOMES, default=None, help="what happens when two bodies touch (default: they go through each other)")
+	parser.add_argument("--restitution", type=float, default=1.0, help="bounce: 1 for elastic bounces, 0 for bodies that stay in contact")
+	parser.add_argument("--telemetry", type=int, default=None, metavar="PORT", help="serve live snapshots on this local port (see telemetry.py)")
+	parser.add_argument("--telemetry-rate", type=float, default=10.0, help="snapshots per second at most")
+	parser.add_argument("--units", choices=("scenario", "nbody"), default="scenario", help="integrate in scenario unities or in N-body unities (G = 1)")
+	parser.add_argument("--dense", action="store_true", help="interpolate the samples inside the steps instead of shortening the steps")
+	parser.add_argument("--close-approach", type=float, default=None, metavar="DISTANCE", help="record the closest approaches of the pairs below this distance")
+	parser.add_argument("--escape-radius", type=float, default=None, help="record the bodies going beyond this distance from the others")
+	parser.add_argument("--crossing", action="store_true", help="record the bodies crossing the z = 0 plane")
+	parser.add_argument("--quiet", action="store_true", help="do not print the summary")
+	return parser
+
+
+def make_system(args):
+	'''
+	- The System described by the command line options
+	'''
+	if args.resume:
+		system = checkpoint.load(args.resume)[0]
+	else:
+		options = {"integrator": args.integrator, "dt": args.dt, "solver": get_solver(args.backend)}
+		if args.adaptive:
+			options["timestep"] = AdaptiveTimestep(args.adaptive, eta=args.eta, tolerance=args.tolerance, dt_max=args.dt)
+		if args.softening is not None:
+			options["softening"] = args.softening
+		system = scenarios.load(args.scenario, **options)
+	if args.collisions:
+		system.collisions = CollisionHandler(args.collisions, args.restitution)
+	if args.monitor_every:
+		system.monitor = ConservationMonitor(args.monitor_every, args.drift_tolerance, args.on_drift)
+	return system
+
+
+def sample_times(start:float, duration:float, every:float) -> np.ndarray:
+	'''
+	- The output times after "start": the multiples of "every" before start + duration, then start + duration
+	- They do not depend on "start", so a resumed run stops at the same times as the run it continues
+	- An end within rounding of a multiple of "every" is put on it, on the grid of the run it continues
+	'''
+	end = start + duration
+	if abs(end / every - round(end / every)) < 1e-9:
+		end = every * round(end / every)
+	times = every * np.arange(np.floor(start / every + 1e-9) + 1, np.ceil(end / every - 1e-9))
+	return np.append(times[times < end], end)
+
+
+def state(system, units:Units=None, bodies:list=None, at:float=None) -> tuple:
+	'''
+	- (time, positions, velocities) of the system, converted to physical unities if it runs in "units"
+	- With "bodies" (the ones at the start of the run): one row per body, NaN for the bodies merged since
+	- With "at": the state interpolated at that time of the last step (the current one if the bodies changed)
+	'''
+	time_, positions, velocities = system.time, system.positions, system.velocities
+	interpolant = None if at is None else system.interpolant()
+	if interpolant is not None:
+		time_ = at
+		positions, velocities = interpolant(at)
+	if bodies is not None and len(bodies) != len(system):
+		rows = np.array([body._index if body.system is system else -1 for body in bodies])
+		positions = np.where(rows[:, np.newaxis] >= 0, positions[rows], np.nan)
+		velocities = np.where(rows[:, np.newaxis] >= 0, velocities[rows], np.nan)
+	if units is None:
+		return time_, positions, velocities
+	return (units.to_physical(time_, "time"), units.to_physical(positions, "length"),
+			units.to_physical(velocities, "velocity"))
+
+
+def advance(system, target:float) -> tuple:
+	'''
+	- system.advance_to(target), unless a collision with the "stop" outcome ends the run on the way
+	- A dense system (system.dense) does not shorten its last step, see state
+
+	:return: (steps taken, True if the run was stopped)
+	'''
+	steps = system.steps
+	try:
+		return system.advance_to(target, land=not system.dense), False
+	except Collision:
+		return system.steps - steps, True # the handler keeps the report, the state is the one of the collision
+
+
+def run(system, duration:float, every:float, on_sample=None, units:Units=None) -> dict:
+	'''
+	˗ˋˏ ♡ ˎˊ˗
+	- Advance the system for "duration", sampling its state every "every"
+
+	:param on_sample: called with the system after every sample (e.g. to save checkpoints)
+	:param units: the unities the system runs in (duration and every are in them too), the samples are converted back
+	:return: a dictionary of arrays, ready for np.savez
+	'''
+	targets = sample_times(system.time, duration, every)
+	times = np.empty(len(targets) + 1)
+	positions = np.empty((len(targets) + 1, len(system), 3))
+	velocities = np.empty((len(targets) + 1, len(system), 3))
+	bodies = list(system.bodies)
+	physical = system if units is None else units.to_physical(system)
+	times[0], positions[0], velocities[0] = state(system, units, bodies)
+
+	steps, samples = 0, len(times)
+	for sample, target in enumerate(targets, 1):
+		taken, stopped = advance(system, target)
+		steps += taken
+		at = target if system.dense and not stopped else None
+		times[sample], positions[sample], velocities[sample] = state(system, units, bodies, at)
+		if on_sample:
+			on_sample(system)
+		if stopped:
+			samples = sample + 1
+			break
+
+	results = {
+		"time": times[:samples],
+		"positions": positions[:samples],
+		"velocities": velocities[:samples],
+		"masses": physical.masses,
+		"radii": physical.radii,
+		"G": physical.G,
+		"steps": steps,
+	}
+	if system.collisions:
+		# (time, i, j) of every collision, i and j the rows of the bodies at that time
+		events = np.array(system.collisions.events, dtype=float).reshape(-1, 3)
+		if units:
+			events[:, 0] = units.to_physical(events[:, 0], "time")
+		results["collisions"] = events
+	if system.events:
+		found = system.events.found
+		# the rows of the bodies are the ones at the time of the event, -1 when there is no second body
+		results["event_time"] = np.array([report["time"] for report in found], dtype=float)
+		results["event_name"] = np.array([report["event"] for report in found], dtype=str)
+		results["event_bodies"] = np.array([(list(report["bodies"]) + [-1])[:2] for report in found], dtype=int).reshape(-1, 2)
+		if units:
+			results["event_time"] = units.to_physical(results["event_time"], "time")
+	return results
+
+
+def stream(system, duration:float, every:float, recorder:Recorder, on_sample=None, units:Units=None) -> int:
+	'''
+	˗ˋˏ ♡ ˎˊ˗
+	- Same as run, but every sample goes straight to the recorder instead of memory
+
+	:return: the number of steps taken
+	'''
+	bodies = list(system.bodies)
+	recorder.record(*state(system, units, bodies))
+	steps = 0
+	for target in sample_times(system.time, duration, every):
+		taken, stopped = advance(system, target)
+		steps += taken
+		recorder.record(*state(system, units, bodies, target if system.dense and not stopped else None))
+		if on_sample:
+			on_sample(system)
+		if stopped:
+			break
+	return steps
+
+
+def checkpointer(path:str, every:float, start:float):
+	'''
+	- A function for the on_sample of run and stream, saving a checkpoint to "path"
+		at the first sample after every "every" simulated seconds
+	'''
+	next_time = [start + every]
+
+	def on_sample(system) -> None:
+		if system.time >= next_time[0]:
+			checkpoint.save(path, system)
+			next_time[0] = system.time + every
+	return on_sample
+
+
+def main(argv=None) -> dict:
+	parser = build_parser()
+	args = parser.parse_args(argv)
+	if args.units == "nbody" and (args.checkpoint or args.resume):
+		parser.error("checkpoints are in scenario unities, --checkpoint and --resume need --units scenario")
+	if args.dense and args.checkpoint:
+		parser.error("a dense run does not stop on its samples, --checkpoint needs steps landing on them")
+	try:
+		system = make_system(args)
+	except ValueError as error:
+		parser.error(str(error))
+
+	duration, every = args.duration, args.every or args.dt
+	units = None
+	if args.units == "nbody":
+		units = Units.natural(system)
+		system = units.to_internal(system)
+		duration, every = units.to_internal(duration, "time"), units.to_internal(every, "time")
+	system.dense = args.dense
+	events = []
+	if args.close_approach is not None:
+		events.append(CloseApproach(below=args.close_approach if units is None else units.to_internal(args.close_approach, "length")))
+	if args.escape_radius is not None:
+		events.append(Escape(args.escape_radius if units is None else units.to_internal(args.escape_radius, "length")))
+	if args.crossing:
+		events.append(PlaneCrossing())
+	if events:
+		system.events = EventLocator(events)
+
+	callbacks = []
+	if args.checkpoint and args.checkpoint_every:
+		callbacks.append(checkpointer(args.checkpoint, args.checkpoint_every, system.time))
+	telemetry = None
+	if args.telemetry is not None:
+		from telemetry import TelemetryServer # asyncio is only imported by the runs serving telemetry
+		telemetry = TelemetryServer(port=args.telemetry, rate=args.telemetry_rate, units=units).start()
+		callbacks.append(telemetry.publish)
+		if not args.quiet:
+			print(f"telemetry on 127.0.0.1:{telemetry.port}")
+
+	def on_sample(system) -> None:
+		for callback in callbacks:
+			callback(system)
+
+	start = time.perf_counter()
+	try:
+		if args.output.endswith(".traj"):
+			physical = system if units is None else units.to_physical(system)
+			with Recorder(args.output, physical.masses, physical.radii, precision=args.precision) as recorder:
+				results = {"steps": stream(system, duration, every, recorder, on_sample, units)}
+			samples = len(recorder)
+		else:
+			results = run(system, duration, every, on_sample, units)
+			samples = len(results["time"])
+			np.savez(args.output, **results, scenario=args.scenario, integrator=args.integrator, dt=args.dt,
+					 adaptive=str(args.adaptive), softening=system.softening)
+	finally:
+		if telemetry:
+			telemetry.stop()
+	wall_time = time.perf_counter() - start
+	if args.checkpoint:
+		checkpoint.save(args.checkpoint, system)
+
+	if not args.quiet:
+		print(f"{len(system)} bodies, {results['steps']} steps in {wall_time:.3f} s "
+			  f"({results['steps'] / max(wall_time, 1e-12):.0f} steps/s), {samples} samples written to {args.output}")
+		if system.monitor:
+			print("largest drifts: " + ", ".join(f"{name} {drift:.2e}" for name, drift in system.monitor.worst.items())
+				  + f" ({system.monitor.checks} checks, {system.monitor.adjustments} step adjustments)")
+		if system.collisions:
+			print(f"{len(system.collisions.events)} collisions ({system.collisions.outcome})")
+		if system.events:
+			counts = Counter(report["event"] for report in system.events.found)
+			print(f"{len(system.events.found)} events: " + ", ".join(f"{name} {count}" for name, count in counts.items()))
+	return results
+
+
+if __name__ == "__main__":
+	main()
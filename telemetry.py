@@ -0,0 +1,247 @@
+import argparse
+import asyncio
+import socket
+import struct
+import threading
+import time
+import numpy as np
+from nbody import kinetic_energy, potential_energy
+from monitor import momenta
+
+'''
+Description:
+	Live telemetry of a run over a local TCP socket, for external viewers and dashboards.
+
+	The simulation calls publish(system) as often as it likes: at most "rate" times per second a snapshot is encoded
+	(a copy of the state, so the System can move on at once) and handed to an asyncio server running in its own thread.
+	Every client gets the latest snapshot only: a slow client skips the ones it had no time for,
+	and nothing it does can make publish wait (latest-value backpressure).
+
+	Snapshot, little endian:
+		header (128 bytes) : magic b"3BTL", version (uint16), float size (uint16), bodies (uint32), sequence (uint64),
+		                     time, wall time, energy, momentum (3), angular momentum (3), steps per second,
+		                     simulated seconds per second (float64), steps (uint64), zeros
+		body arrays        : positions (bodies, 3), velocities (bodies, 3)  (float32 or float64)
+
+	python simulate.py --scenario earth-moon --dt 50 --duration 3.15e9 --every 3600 --output century.traj --telemetry 8765
+	python telemetry.py --port 8765       (prints the snapshots, see read_snapshots for your own scripts)
+'''
+
+MAGIC = b"3BTL"
+VERSION = 1
+HEADER = struct.Struct("<4sHHIQ11dQ12x")
+
+
+def encode(system, sequence:int=0, steps:int=0, steps_per_second:float=0.0, speed:float=0.0,
+		   precision:str="f4", conserved:bool=True, units=None) -> bytes:
+	'''
+	˗ˋˏ ♡ ˎˊ˗
+	- One snapshot of "system" as bytes (see the format above)
+
+	:param conserved: measure the energy and momenta (NaN otherwise), the energy costs O(N²) without a monitor
+	:param units: the units.Units the system runs in, the snapshot is converted back to physical unities
+	'''
+	positions, velocities, masses = system.positions, system.velocities, system.masses
+	energy, momentum, angular_momentum = np.nan, np.full(3, np.nan), np.full(3, np.nan)
+	if conserved:
+		if system.monitor:
+			energy, momentum, angular_momentum = system.monitor.measure(system)[:3]
+		else:
+			energy = float(kinetic_energy(velocities, masses) + potential_energy(positions, masses, system.G, system.softening))
+			momentum, angular_momentum = momenta(positions, velocities, masses)
+	time_ = system.time
+	if units is not None:
+		momentum_unity = units.mass * units.velocity
+		time_, speed = time_ * units.time, speed * units.time
+		positions, velocities = positions * units.length, velocities * units.velocity
+		energy, momentum = energy * momentum_unity * units.velocity, np.multiply(momentum, momentum_unity)
+		angular_momentum = np.multiply(angular_momentum, momentum_unity * units.length)
+	header = HEADER.pack(MAGIC, VERSION, int(precision[1]), len(masses), sequence, time_, time.time(), energy,
+						 *momentum, *angular_momentum, steps_per_second, speed, steps)
+	return header + np.asarray(positions, dtype=f"<{precision}").tobytes() + np.asarray(velocities, dtype=f"<{precision}").tobytes()
+
+
+def decode(header:bytes, arrays:bytes=None) -> dict:
+	'''
+	˗ˋˏ ♡ ˎˊ˗
+	- A snapshot as a dictionary; with the header alone, "size" tells how many bytes of arrays follow
+	'''
+	magic, version, float_size, bodies, sequence, time_, wall_time, energy, *values = HEADER.unpack(header[:HEADER.size])
+	if magic != MAGIC or version != VERSION:
+		raise ValueError(f"Not a version {VERSION} telemetry snapshot")
+	snapshot = {
+		"sequence": sequence,
+		"time": time_,
+		"wall_time": wall_time,
+		"energy": energy,
+		"momentum": np.array(values[0:3]),
+		"angular_momentum": np.array(values[3:6]),
+		"steps_per_second": values[6],
+		"speed": values[7],
+		"steps": values[8],
+		"size": 2 * bodies * 3 * float_size,
+	}
+	if arrays is not None:
+		state = np.frombuffer(arrays, dtype=f"<f{float_size}").reshape(2, bodies, 3)
+		snapshot["positions"], snapshot["velocities"] = state
+	return snapshot
+
+
+class TelemetryServer:
+	def __init__(self, host:str="127.0.0.1", port:int=8765, rate:float=30.0, precision:str="f4", conserved:bool=True,
+				 units=None) -> None:
+		'''
+		˗ˋˏ ♡ ˎˊ˗
+		- Publishes snapshots of a System to every connected client
+
+		:param host: the interface to listen on, local only by default
+		:param port: the TCP port, 0 for any free one (see self.port once started)
+		:param rate: snapshots per second at most, publish does nothing in between
+		:param precision: "f4" or "f8", float size of the positions and velocities
+		:param conserved: send the energy and momenta, see encode
+		:param units: the units.Units of the system, if it does not run in physical unities
+		'''
+		if precision not in ("f4", "f8"):
+			raise ValueError(f"precision must be 'f4' or 'f8', not {precision!r}")
+		self.host = host
+		self.port = port
+		self.rate = rate
+		self.precision = precision
+		self.conserved = conserved
+		self.units = units
+		self.sequence = 0
+		self.published = 0
+		self.latest = None
+		self._last = (-np.inf, 0.0, 0) # wall time, simulated time and steps of the last snapshot
+		self._clients = set() # one asyncio.Event per client, set when a new snapshot is there
+		self._loop = None
+		self._server = None
+		self._ready = threading.Event()
+		self._thread = threading.Thread(target=self._serve, name="telemetry", daemon=True)
+
+	def start(self):
+		self._thread.start()
+		self._ready.wait()
+		return self
+
+	def _serve(self) -> None:
+		self._loop = asyncio.new_event_loop()
+		asyncio.set_event_loop(self._loop)
+		self._server = self._loop.run_until_complete(asyncio.start_server(self._client, self.host, self.port))
+		self.port = self._server.sockets[0].getsockname()[1]
+		self._ready.set()
+		self._loop.run_forever()
+		tasks = asyncio.all_tasks(self._loop) # the clients still connected
+		for task in tasks:
+			task.cancel()
+		self._loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+		self._server.close()
+		self._loop.run_until_complete(self._server.wait_closed())
+		self._loop.close()
+
+	async def _client(self, reader, writer) -> None:
+		'''
+		- Sends the latest snapshot whenever there is a new one and the last one was written out
+		'''
+		new = asyncio.Event()
+		if self.latest is not None:
+			new.set()
+		self._clients.add(new)
+		try:
+			while True:
+				await new.wait()
+				new.clear()
+				writer.write(self.latest)
+				await writer.drain() # a slow client waits here, alone, and misses the snapshots in between
+		except (ConnectionError, asyncio.CancelledError):
+			pass
+		finally:
+			self._clients.discard(new)
+			writer.close()
+
+	def _notify(self, snapshot:bytes) -> None:
+		self.latest = snapshot
+		for new in self._clients:
+			new.set()
+
+	@property
+	def clients(self) -> int:
+		return len(self._clients)
+
+	def publish(self, system, steps:int=None) -> bool:
+		'''
+		˗ˋˏ ♡ ˎˊ˗
+		- Called by the simulation after its steps: never blocks, and does nothing between two snapshots
+
+		:param steps: steps taken since the start (default: system.steps), for the step rate
+		:return: True if a snapshot was taken
+		'''
+		now = time.perf_counter()
+		last_wall, last_time, last_steps = self._last
+		if now - last_wall < 1 / self.rate:
+			return False
+		steps = system.steps if steps is None else steps
+		elapsed = now - last_wall
+		steps_per_second = (steps - last_steps) / elapsed if np.isfinite(elapsed) else 0.0
+		speed = (system.time - last_time) / elapsed if np.isfinite(elapsed) else 0.0
+		self._last = (now, system.time, steps)
+		if not self._clients:
+			return False # nobody to send it to, not even encoded
+		snapshot = encode(system, self.sequence, steps, steps_per_second, speed, self.precision, self.conserved, self.units)
+		self.sequence += 1
+		self.published += 1
+		self._loop.call_soon_threadsafe(self._notify, snapshot)
+		return True
+
+	def stop(self) -> None:
+		if self._loop is not None and self._loop.is_running():
+			self._loop.call_soon_threadsafe(self._loop.stop)
+			self._thread.join(timeout=1.0)
+
+	def __enter__(self):
+		return self.start()
+
+	def __exit__(self, *exception) -> None:
+		self.stop()
+
+	def __str__(self) -> str:
+		return f"TelemetryServer({self.host}:{self.port}, {self.clients} clients, {self.published} snapshots)"
+
+
+def _read_exactly(connection, size:int) -> bytes:
+	data = bytearray()
+	while len(data) < size:
+		chunk = connection.recv(size - len(data))
+		if not chunk:
+			raise ConnectionError("The telemetry server closed the connection")
+		data += chunk
+	return bytes(data)
+
+
+def read_snapshots(host:str="127.0.0.1", port:int=8765):
+	'''
+	˗ˋˏ ♡ ˎˊ˗
+	- A blocking client, for scripts: yields the snapshots (see decode) as they come, until the server goes away
+	'''
+	with socket.create_connection((host, port)) as connection:
+		try:
+			while True:
+				header = _read_exactly(connection, HEADER.size)
+				snapshot = decode(header)
+				yield decode(header, _read_exactly(connection, snapshot["size"]))
+		except ConnectionError:
+			return
+
+
+def main(argv=None) -> None:
+	parser = argparse.ArgumentParser(description="Print the telemetry of a running simulation.")
+	parser.add_argument("--host", default="127.0.0.1")
+	parser.add_argument("--port", type=int, default=8765)
+	args = parser.parse_args(argv)
+	for snapshot in read_snapshots(args.host, args.port):
+		print(f"#{snapshot['sequence']} t = {snapshot['time']:.6g}  E = {snapshot['energy']:.9g}  "
+			  f"{snapshot['steps_per_second']:.0f} steps/s  {snapshot['speed']:.3g} s/s  {len(snapshot['positions'])} bodies")
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,144 @@
+import numpy as np
+
+'''
+Description:
+	Adaptive timestep controllers, used by System.advance.
+	Most of a three-body run is quiet cruising where big steps are fine,
+	and then two bodies pass close to each other and need tiny steps for a little while.
+
+	encounter : dt = eta * (shortest free-fall or fly-by time over every pair of bodies)
+	error     : step doubling, one step of dt against two steps of dt/2, and dt follows the error
+'''
+
+
+def encounter_timescale(positions:np.ndarray, velocities:np.ndarray, masses:np.ndarray, G:float, softening:float=0.0) -> float:
+	'''
+	˗ˋˏ ♡ ˎˊ˗
+	- Shortest characteristic time of every pair of bodies:
+		the free-fall time sqrt(r³ / G(mi+mj)) and the fly-by time r / |vi-vj|
+	- It goes down like r^(3/2) during a close approach, which is what we want to follow
+
+	:return: the timescale in seconds (inf for less than two bodies)
+	'''
+	n = len(masses)
+	if n < 2:
+		return np.inf
+	i, j = np.triu_indices(n, 1)
+	separation = positions[j] - positions[i]
+	distance2 = (separation * separation).sum(axis=-1) + softening * softening
+	distance = np.sqrt(distance2)
+	relative_velocity = velocities[j] - velocities[i]
+	speed = np.sqrt((relative_velocity * relative_velocity).sum(axis=-1))
+
+	with np.errstate(divide="ignore", invalid="ignore"): # coinciding bodies: 0/0
+		free_fall = np.sqrt(distance2 * distance / (G * (masses[i] + masses[j])))
+		fly_by = distance / speed
+	return float(np.nan_to_num(np.fmin(free_fall, fly_by), nan=np.inf).min()) # 0/0: no attraction or no relative motion
+
+
+class AdaptiveTimestep:
+	def __init__(self, method:str="encounter", eta:float=0.01, tolerance:float=1e-10,
+			  dt_min:float=0.0, dt_max:float=np.inf, safety:float=0.9) -> None:
+		'''
+		˗ˋˏ ♡ ˎˊ˗
+		- Chooses the size of every step of System.advance
+
+		:param method: "encounter" or "error"
+		:param eta: fraction of the encounter timescale used as dt (encounter method)
+		:param tolerance: accepted relative error per step (error method)
+		:param dt_min: smallest allowed step, the run never stalls below it
+		:param dt_max: biggest allowed step
+		:param safety: safety factor applied when the error method grows or shrinks dt
+		'''
+		if method not in ("encounter", "error"):
+			raise ValueError(f"Unknown timestep method {method!r}, choose 'encounter' or 'error'")
+		self.method = method
+		self.eta = eta
+		self.tolerance = tolerance
+		self.dt_min = dt_min
+		self.dt_max = dt_max
+		self.safety = safety
+		self.dt = None # last accepted step, the error method starts from it
+		self.rejected = 0
+
+	def clip(self, dt:float) -> float:
+		return min(max(dt, self.dt_min), self.dt_max)
+
+	def step(self, system, dt_limit:float=np.inf) -> float:
+		'''
+		˗ˋˏ ♡ ˎˊ˗
+		- Make one adaptive step of the system, never longer than dt_limit
+
+		:return: the step actually taken
+		'''
+		if self.method == "encounter":
+			tau = encounter_timescale(system.positions, system.velocities, system.masses, system.G, system.softening)
+			dt = self.clip(self.eta * tau)
+			if not np.isfinite(dt): # one body or no pair: nothing to follow, the longest finite step
+				dt = self.dt_max if np.isfinite(self.dt_max) else (self.dt or system.dt)
+			elif dt <= 0: # coinciding bodies (tau = 0) and no dt_min: the usual step, never a stall
+				dt = self.dt or system.dt
+			dt = min(dt, dt_limit)
+			system.step(1, dt)
+			return dt
+		return self._error_step(system, dt_limit)
+
+	def _error_step(self, system, dt_limit:float) -> float:
+		'''
+		- Step doubling: the difference between one step and two half steps estimates the error
+		- A rejected step is tried again with a smaller dt, down to dt_min
+		'''
+		integrator = system.integrator
+		dt = self.clip(self.dt if self.dt else system.dt)
+		while True:
+			dt_try = min(dt, dt_limit)
+			x_big, v_big = system.positions.copy(), system.velocities.copy()
+			integrator.reset()
+			integrator.step(x_big, v_big, dt_try, system.accelerations)
+
+			x_small, v_small = system.positions.copy(), system.velocities.copy()
+			integrator.reset()
+			integrator.step(x_small, v_small, dt_try / 2, system.accelerations)
+			integrator.step(x_small, v_small, dt_try / 2, system.accelerations)
+
+			error = self._error(system, x_big - x_small, v_big - v_small)
+			if error == 0:
+				factor = 5.0
+			else:
+				factor = min(5.0, max(0.2, self.safety * (self.tolerance / error) ** (1 / (integrator.order + 1))))
+			if error <= self.tolerance or dt_try <= self.dt_min:
+				break
+			self.rejected += 1
+			dt = self.clip(dt_try * factor)
+
+		# The two half steps are the more accurate result, keep them
+		integrator.reset()
+		if system.tracers:
+			system.step(2, dt_try / 2) # made again with the tracers, they need the path of the bodies
+		else:
+			system.positions[...] = x_small
+			system.velocities[...] = v_small
+			system.time += dt_try
+		if dt_try < dt_limit:
+			self.dt = self.clip(dt_try * factor)
+		return dt_try
+
+	@staticmethod
+	def _error(system, position_error:np.ndarray, velocity_error:np.ndarray) -> float:
+		'''
+		- Positions errors are compared to the smallest separation, velocities errors to the biggest speed,
+			so the tolerance means the same thing whatever the unities
+		'''
+		if len(system.masses) < 2:
+			return 0.0
+		i, j = np.triu_indices(len(system.masses), 1)
+		separation = system.positions[j] - system.positions[i]
+		length = np.sqrt((separation * separation).sum(axis=-1).min())
+		speed = np.sqrt((system.velocities * system.velocities).sum(axis=-1).max())
+		error = np.sqrt((position_error * position_error).sum(axis=-1).max()) / length
+		if speed:
+			error = max(error, np.sqrt((velocity_error * velocity_error).sum(axis=-1).max()) / speed)
+		return float(error)
+
+	def __str__(self) -> str:
+		return f"AdaptiveTimestep({self.method}, eta = {self.eta}, tolerance = {self.tolerance})"
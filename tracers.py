@@ -0,0 +1,127 @@
+import numpy as np
+
+'''
+Description:
+	Test particles (tracers) for the restricted N-body problem: debris, spacecraft candidates...
+	They feel the massive bodies of a System but pull on nothing, so thousands of them cost
+	O(tracers × massive) per force evaluation instead of O((massive + tracers)²).
+
+	They step with the bodies, in the same integrator call: the massive bodies come first in the arrays,
+	their accelerations come from the force solver of the System as usual (bit for bit the same run),
+	and the ones of the tracers from the field of the massive bodies only.
+	The arrays of the System and of the tracers are views on one buffer holding both, so a step copies nothing
+	(the buffer is only built again when the bodies or the tracers are replaced, added, removed...).
+
+	system.tracers = TestParticles.ring(system, 0, 20_000, inner=1.2e8, outer=3.5e8)
+	system.advance(3600)       (the tracers move too)
+'''
+
+
+def field_accelerations(points:np.ndarray, sources:np.ndarray, masses:np.ndarray, G:float, softening:float=0.0) -> np.ndarray:
+	'''
+	˗ˋˏ ♡ ˎˊ˗
+	- Acceleration of massless points in the field of the sources, one massive body at a time:
+		O(points × sources), and no (points, sources, 3) temporary
+
+	:param points: (T, 3) positions of the test particles
+	:param sources: (N, 3) positions of the massive bodies
+	:param masses: (N,) their masses
+	'''
+	accelerations = np.zeros_like(points)
+	for source, mass in zip(sources, masses):
+		separation = source - points
+		distance2 = np.einsum("ij,ij->i", separation, separation) + softening * softening
+		with np.errstate(divide="ignore", invalid="ignore"):
+			inverse3 = np.where(distance2 > 0, mass / (distance2 * np.sqrt(distance2)), 0.0)
+		accelerations += inverse3[:, np.newaxis] * separation
+	return G * accelerations
+
+
+class TestParticles:
+	def __init__(self, positions:np.ndarray=np.zeros((0, 3)), velocities:np.ndarray=np.zeros((0, 3))) -> None:
+		'''
+		˗ˋˏ ♡ ˎˊ˗
+		- A population of massless particles, for System.tracers
+
+		:param positions: (T, 3) positions
+		:param velocities: (T, 3) velocities
+		'''
+		self.positions = np.array(positions, dtype=float).reshape(-1, 3)
+		self.velocities = np.array(velocities, dtype=float).reshape(-1, 3)
+		self.integrator = None # of the same kind as the one of the System, for the bodies and the tracers together
+		self._revision = None
+		self._positions = None # the buffers of the bodies and the tracers, see _attach
+		self._velocities = None
+
+	@classmethod
+	def ring(cls, system, body:int, count:int, inner:float, outer:float, thickness:float=0.0, seed:int=None):
+		'''
+		˗ˋˏ ♡ ˎˊ˗
+		- "count" particles on circular orbits around one body of "system", in its xy plane
+
+		:param body: the index of the body in the system
+		:param inner: the smallest orbit radius
+		:param outer: the largest one
+		:param thickness: standard deviation of the heights above the plane
+		:param seed: of the random generator
+		'''
+		rng = np.random.default_rng(seed)
+		radius = np.sqrt(rng.uniform(inner * inner, outer * outer, count)) # evenly spread over the area
+		angle = rng.uniform(0, 2 * np.pi, count)
+		direction = np.stack((np.cos(angle), np.sin(angle), np.zeros(count)), axis=1)
+		tangent = np.stack((-np.sin(angle), np.cos(angle), np.zeros(count)), axis=1)
+		positions = system.positions[body] + radius[:, np.newaxis] * direction
+		positions[:, 2] += rng.normal(scale=thickness, size=count) if thickness else 0.0
+		speed = np.sqrt(system.G * system.masses[body] / radius)
+		return cls(positions, system.velocities[body] + speed[:, np.newaxis] * tangent)
+
+	def add(self, positions:np.ndarray, velocities:np.ndarray) -> None:
+		self.positions = np.vstack((self.positions, np.asarray(positions, dtype=float).reshape(-1, 3)))
+		self.velocities = np.vstack((self.velocities, np.asarray(velocities, dtype=float).reshape(-1, 3)))
+
+	def __len__(self) -> int:
+		return len(self.positions)
+
+	def _attached(self, system) -> bool:
+		buffers = self._positions, self._velocities
+		return buffers[0] is not None and all(array.base is buffer for array, buffer in zip(
+			(system.positions, system.velocities, self.positions, self.velocities), buffers * 2))
+
+	def _attach(self, system) -> None:
+		'''
+		- Copy the bodies (in front) and the tracers into one buffer, in the float type of the System,
+			and make the arrays of both views on it
+		'''
+		massive = len(system)
+		dtype = system.positions.dtype
+		self._positions = np.concatenate((system.positions, self.positions.astype(dtype, copy=False)))
+		self._velocities = np.concatenate((system.velocities, self.velocities.astype(dtype, copy=False)))
+		system.positions, system.velocities = self._positions[:massive], self._velocities[:massive]
+		self.positions, self.velocities = self._positions[massive:], self._velocities[massive:]
+		self.integrator.reset()
+
+	def step(self, system, n:int, dt:float) -> None:
+		'''
+		˗ˋˏ ♡ ˎˊ˗
+		- Called by System.step: "n" steps of the bodies of "system" and of the tracers together
+		'''
+		massive = len(system)
+		if type(self.integrator) is not type(system.integrator):
+			self.integrator = type(system.integrator)()
+		if self._revision != system.revision: # a body changed, the cached accelerations are wrong
+			self.integrator.reset()
+			self._revision = system.revision
+		if not self._attached(system):
+			self._attach(system)
+		masses, G, softening = system.masses, system.G, system.softening
+
+		def accelerations(state:np.ndarray) -> np.ndarray:
+			sources = state[:massive]
+			return np.concatenate((system.solver.accelerations(sources, masses, G, softening),
+								   field_accelerations(state[massive:], sources, masses, G, softening)))
+
+		for _ in range(n):
+			self.integrator.step(self._positions, self._velocities, dt, accelerations)
+
+	def __str__(self) -> str:
+		return f"TestParticles({len(self)} tracers)"
@@ -0,0 +1,154 @@
+import numpy as np
+import pygame
+import raycasting as rc
+
+'''
+Description:
+	Trajectories drawn as polylines: a few draw calls per body, whatever the length of the trail.
+
+	1. the whole TrailBuffer (every sample of every body) is projected in one call
+	2. each trail is cut where it goes behind the camera, and in a few pieces by age (for the fading)
+	3. points on the same pixel as the previous one, and points on an almost straight line, are dropped
+	4. every piece is one pygame.draw.lines, its colour fading to the background with age
+
+	draw_points draws clouds of points the same way (one projection), written straight into the pixels (tracers.py).
+'''
+
+# Screen coordinates are clipped to this, far points (almost behind the camera) would overflow pygame
+LIMIT = 32_000
+
+
+def decimate(points:np.ndarray, tolerance:float=0.5, passes:int=3) -> np.ndarray:
+	'''
+	˗ˋˏ ♡ ˎˊ˗
+	- Level of detail of a polyline on screen, without a Python loop over the points
+	- Consecutive points on the same pixel are merged, then every pass drops every other point
+		lying closer than "tolerance" pixels to the line between its neighbours, and between them
+		(never two neighbours at once, so the line never moves by more than passes * tolerance)
+
+	:param points: (N, 2) screen coordinates
+	:return: the indices of the points kept, the first and the last always are
+	'''
+	kept = np.arange(len(points))
+	x, y = points[:, 0], points[:, 1]
+	if len(points) > 2:
+		moved = np.concatenate(((True,), (x[1:] != x[:-1]) | (y[1:] != y[:-1])))
+		moved[-1] = True
+		kept = kept[moved]
+	for _ in range(passes):
+		if len(kept) < 3:
+			break
+		kx, ky = x[kept], y[kept]
+		chord_x, chord_y = kx[2:] - kx[:-2], ky[2:] - ky[:-2]
+		offset_x, offset_y = kx[1:-1] - kx[:-2], ky[1:-1] - ky[:-2]
+		length2 = chord_x * chord_x + chord_y * chord_y
+		cross = chord_x * offset_y - chord_y * offset_x
+		along = chord_x * offset_x + chord_y * offset_y
+		# close to the line, and between the neighbours (not a turn back)
+		straight = (cross * cross <= tolerance * tolerance * length2) & (along >= 0) & (along <= length2) & (length2 > 0)
+		straight[1::2] = False # only every other point in one pass
+		if not straight.any():
+			break
+		kept = kept[np.concatenate(((True,), ~straight, (True,)))]
+	return kept
+
+
+def draw_points(surface, camera, positions:np.ndarray, scale:float=1.0, color:tuple=(150, 150, 150), screen=None):
+	'''
+	˗ˋˏ ♡ ˎˊ˗
+	- One pixel per point, for tens of thousands of points: one projection, one write of the pixels
+
+	:param positions: (T, 3) positions, in the unities of the bodies
+	:param scale: applied to the positions before projection (the scale of main.py)
+	:param screen: (width, height) of the projection, default: the size of "surface"
+	:return: the rectangle around the points drawn (for pygame.display.update), or None
+	'''
+	if not len(positions):
+		return None
+	width, height = surface.get_size()
+	coordinates, visible = rc.project(camera, positions * scale, surface.get_size() if screen is None else screen)
+	x, y = coordinates[visible].T
+	inside = (x >= 0) & (x < width) & (y >= 0) & (y < height)
+	x, y = x[inside].astype(int), y[inside].astype(int)
+	if not len(x):
+		return None
+	pixels = pygame.surfarray.pixels2d(surface)
+	pixels[x, y] = surface.map_rgb(color)
+	del pixels # unlocks the surface
+	return pygame.Rect(x.min(), y.min(), x.max() - x.min() + 1, y.max() - y.min() + 1)
+
+
+class TrailRenderer:
+	def __init__(self, color:tuple=(0, 255, 0), background:tuple=(255, 255, 255), pieces:int=6,
+			  fade:float=0.85, tolerance:float=0.5, width:int=1) -> None:
+		'''
+		˗ˋˏ ♡ ˎˊ˗
+		- Draws the trails of a recorder.TrailBuffer
+
+		:param color: colour of the newest part of the trails
+		:param background: colour the oldest part fades to
+		:param pieces: number of pieces of a trail, each with its own shade (1 = no fading)
+		:param fade: how far the oldest piece goes towards the background (0 = no fading, 1 = invisible)
+		:param tolerance: decimation tolerance in pixels, see decimate
+		:param width: line width in pixels
+		'''
+		self.pieces = pieces
+		self.tolerance = tolerance
+		self.width = width
+		self.shades = [tuple(int(round(c + (b - c) * fade * age)) for c, b in zip(color, background))
+					   for age in np.linspace(1, 0, pieces)] # oldest first
+		self.points_drawn = 0
+		self.draw_calls = 0
+		self.rects = []
+
+	def draw(self, surface, camera, trails, scale:float=1.0, screen=None) -> list:
+		'''
+		˗ˋˏ ♡ ˎˊ˗
+		- Project and draw every trail of "trails" (a TrailBuffer) as seen by "camera"
+
+		:param scale: applied to the positions before projection (the scale of main.py)
+		:param screen: (width, height) of the projection, default: the size of "surface"
+		:return: the rectangles drawn (for pygame.display.update)
+		'''
+		self.points_drawn = self.draw_calls = 0
+		self.rects = []
+		positions = trails.ordered()[1] # (samples, bodies, 3)
+		samples = len(positions)
+		if samples < 2:
+			return self.rects
+		screen = surface.get_size() if screen is None else screen
+		coordinates, visible = rc.project(camera, positions * scale, screen)
+		np.clip(coordinates, -LIMIT, LIMIT, out=coordinates)
+
+		# age pieces, as ranges of samples sharing their ends (no gap between them)
+		bounds = np.linspace(0, samples - 1, self.pieces + 1).round().astype(int)
+		for body in range(positions.shape[1]):
+			points, shown = coordinates[:, body], visible[:, body]
+			if shown.all():
+				runs = [0]
+				ends = [samples]
+			else:
+				edges = np.flatnonzero(np.diff(shown.astype(np.int8))) + 1
+				starts = np.concatenate(((0,), edges))
+				ends = np.concatenate((edges, (samples,)))
+				runs = starts[shown[starts]]
+				ends = ends[shown[starts]]
+			for start, end in zip(runs, ends):
+				self._draw_run(surface, points, start + decimate(points[start:end], self.tolerance), bounds)
+		return self.rects
+
+	def _draw_run(self, surface, points:np.ndarray, kept:np.ndarray, bounds:np.ndarray) -> None:
+		'''
+		- One polyline per age piece of a run of visible points, with the points kept by decimate
+		'''
+		if len(kept) < 2:
+			return
+		# the piece of every kept point, the last point of a piece starts the next one too
+		cuts = np.searchsorted(kept, bounds[1:-1], side="left")
+		for shade, start, end in zip(self.shades, np.concatenate(((0,), cuts)), np.concatenate((cuts, (len(kept),)))):
+			line = kept[max(start - 1, 0):end]
+			if len(line) < 2:
+				continue
+			self.rects.append(pygame.draw.lines(surface, shade, False, points[line].tolist(), self.width))
+			self.points_drawn += len(line)
+			self.draw_calls += 1
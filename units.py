@@ -0,0 +1,91 @@
+import numpy as np
+from nbody import Body, System, Vector, G
+
+'''
+Description:
+	N-body unities: G = 1, lengths in unities of the size of the system, masses in unities of its total mass,
+	and the time unity that follows, sqrt(length³ / (G mass)) (an orbital period is then ~2π).
+
+	Inside, every number is close to 1 (no more 1e24 kg, 4e8 m and 6.7e-11 together), which is what
+	float32 needs and what keeps float64 far from its limits. The conversion happens at the boundaries only:
+	the System is converted before the run, and the samples are converted back when written.
+
+	units = Units.natural(system)          the unities of a system (of any G: SI, or already 1)
+	inside = units.to_internal(system)     a copy of the system in N-body unities
+	x = units.to_physical(inside.positions, "length")
+'''
+
+DIMENSIONS = ("length", "mass", "time", "velocity")
+
+
+class Units:
+	def __init__(self, length:float, mass:float, G:float=G) -> None:
+		'''
+		˗ˋˏ ♡ ˎˊ˗
+		- A system of unities where the gravitational constant is 1
+
+		:param length: the length unity, in the physical unity (e.g. meters)
+		:param mass: the mass unity, in the physical unity (e.g. kilograms)
+		:param G: the gravitational constant in the physical unities
+		'''
+		self.length = float(length)
+		self.mass = float(mass)
+		self.G = float(G)
+		self.time = float(np.sqrt(self.length ** 3 / (self.G * self.mass)))
+		self.velocity = self.length / self.time
+
+	@classmethod
+	def natural(cls, system:System):
+		'''
+		- The unities of a system: its total mass, and its largest distance to the centre of mass
+		'''
+		mass = float(system.masses.sum()) or 1.0
+		center = (system.masses[:, np.newaxis] * system.positions).sum(axis=0) / mass
+		length = float(np.sqrt(((system.positions - center) ** 2).sum(axis=-1)).max(initial=0.0)) or 1.0
+		return cls(length, mass, system.G)
+
+	def factor(self, dimension:str) -> float:
+		'''
+		- How many physical unities in one internal unity of "dimension"
+		'''
+		if dimension not in DIMENSIONS:
+			raise ValueError(f"Unknown dimension {dimension!r}, choose one of: {', '.join(DIMENSIONS)}")
+		return getattr(self, dimension)
+
+	def to_internal(self, value, dimension:str=None):
+		'''
+		˗ˋˏ ♡ ˎˊ˗
+		- A physical value (or array) in internal unities, or a System (copied) in internal unities
+		'''
+		if isinstance(value, System):
+			return self._convert(value, self.to_internal, 1.0)
+		return value / self.factor(dimension)
+
+	def to_physical(self, value, dimension:str=None):
+		'''
+		˗ˋˏ ♡ ˎˊ˗
+		- An internal value (or array) in physical unities, or a System (copied) in physical unities
+		'''
+		if isinstance(value, System):
+			return self._convert(value, self.to_physical, self.G)
+		return value * self.factor(dimension)
+
+	def _convert(self, system:System, convert, G:float) -> System:
+		'''
+		- A copy of "system" with every value converted: bodies, time, dt, softening, adaptive timestep bounds
+		- The solver, the monitor and the collision handler are shared with the copy
+		'''
+		timestep = system.timestep
+		if timestep is not None:
+			timestep = type(timestep)(timestep.method, eta=timestep.eta, tolerance=timestep.tolerance,
+									  dt_min=convert(timestep.dt_min, "time"), dt_max=convert(timestep.dt_max, "time"), safety=timestep.safety)
+		bodies = [Body(convert(mass, "mass"), convert(R, "length"), convert(position, "length"), Vector(convert(velocity, "velocity")))
+				  for mass, R, position, velocity in zip(system.masses, system.radii, system.positions, system.velocities)]
+		converted = System(bodies, G=G, softening=convert(system.softening, "length"), integrator=system.integrator.name,
+						   dt=convert(system.dt, "time"), timestep=timestep, solver=system.solver,
+						   monitor=system.monitor, collisions=system.collisions)
+		converted.time = convert(system.time, "time")
+		return converted
+
+	def __str__(self) -> str:
+		return f"Units(length = {self.length:g}, mass = {self.mass:g}, time = {self.time:g}, velocity = {self.velocity:g})"